@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 
@@ -10,3 +11,66 @@ class StandardModel(models.Model):
     class Meta:
         abstract = True
         ordering = ['created_at']
+
+
+class HistorialConCambios(models.Model):
+    """
+    Base de los modelos históricos (HistoricalRecords(bases=[HistorialConCambios])): guarda los campos que
+    cambió cada actualización, {campo: [antes, después]}, calculados al escribir el registro (kardex.historial).
+    """
+    history_cambios = models.JSONField(null=True, blank=True, editable=False, encoder=DjangoJSONEncoder,
+                                       verbose_name='Cambios')
+
+    class Meta:
+        abstract = True
+
+
+class ConValoresCargados:
+    """
+    Mixin de modelo: guarda una copia de los valores leídos de la base de datos (y de los guardados) por attname,
+    para saber qué campos cambiaron sin volver a consultar la fila: validaciones, history_cambios
+    (kardex.historial) y conteos del dashboard (kardex.signals). Los campos diferidos no se copian.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.guardar_valores_cargados()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.guardar_valores_cargados()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.guardar_valores_cargados(kwargs.get('update_fields'))
+
+    def guardar_valores_cargados(self, campos=None):
+        # Con `campos` (update_fields) solo se actualizan esos: el resto no se escribió
+        fields = [self._meta.get_field(c) for c in campos] if campos is not None else self._meta.concrete_fields
+        valores = {f.attname: getattr(self, f.attname) for f in fields if f.attname in self.__dict__}
+        if campos is None or getattr(self, '_valores_cargados', None) is None:
+            self._valores_cargados = valores
+        else:
+            self._valores_cargados.update(valores)
+
+    def valor_cargado(self, attname):
+        """
+        Valor del campo al cargar o guardar por última vez (None si no se conoce).
+        """
+        return (getattr(self, '_valores_cargados', None) or {}).get(attname)
+
+    def campos_modificados(self, campos=None):
+        """
+        Campos (por nombre) cuyo valor difiere del cargado desde la base de datos, sin volver a consultarla.
+        En una instancia nueva o sin valores cargados se consideran todos modificados.
+        """
+        cargados = getattr(self, '_valores_cargados', None)
+        fields = [self._meta.get_field(c) for c in campos] if campos else self._meta.concrete_fields
+        if self._state.adding or cargados is None:
+            return [f.name for f in fields]
+        return [
+            f.name for f in fields
+            if f.attname not in cargados or cargados[f.attname] != getattr(self, f.attname)
+        ]
@@ -0,0 +1,46 @@
+import os
+import tempfile
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Tiempo por defecto de las entradas (segundos). Los datos versionados (conteos, catálogos) se invalidan
+# por versión, así que el TTL solo acota cuánto se retiene una entrada que ya nadie consulta.
+CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', 300))
+
+# Desarrollo / pruebas: memoria del proceso (cada worker tiene su propia caché)
+LOCMEM = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'kardex',
+        'TIMEOUT': CACHE_TIMEOUT,
+    }
+}
+
+# Compartida entre workers del mismo servidor, sin servicios adicionales
+FILE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION') or str(Path(tempfile.gettempdir()) / 'kardex_cache'),
+        'TIMEOUT': CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
+# Compartida entre servidores (Redis o compatible); requiere el paquete redis
+REDIS = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_LOCATION') or 'redis://127.0.0.1:6379/1',
+        'KEY_PREFIX': 'kardex',
+        'TIMEOUT': CACHE_TIMEOUT,
+    }
+}
+
+CACHES_DISPONIBLES = {
+    'locmem': LOCMEM,
+    'file': FILE,
+    'redis': REDIS,
+}
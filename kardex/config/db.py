@@ -1,12 +1,56 @@
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+
+def _entero_env(nombre, defecto, minimo=0):
+    valor = os.getenv(nombre)
+    if valor in (None, ''):
+        return defecto
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ImproperlyConfigured(f'{nombre} debe ser un número entero (valor actual: "{valor}").')
+    if numero < minimo:
+        raise ImproperlyConfigured(f'{nombre} debe ser mayor o igual a {minimo} (valor actual: {numero}).')
+    return numero
+
+
+def _booleano_env(nombre, defecto):
+    valor = os.getenv(nombre)
+    if valor in (None, ''):
+        return defecto
+    valor = valor.strip().lower()
+    if valor in ('1', 'true', 'si', 'sí', 'yes', 'on'):
+        return True
+    if valor in ('0', 'false', 'no', 'off'):
+        return False
+    raise ImproperlyConfigured(f'{nombre} debe ser un booleano (true/false), no "{valor}".')
+
+
+# Reutilización de conexiones
+# https://docs.djangoproject.com/en/5.2/ref/databases/#persistent-connections
+# DB_CONN_MAX_AGE: segundos que una conexión se mantiene abierta entre requests (0 = una conexión por
+# request, -1 = sin límite). Debe ser menor que el wait_timeout del servidor MySQL.
+# DB_CONN_HEALTH_CHECKS: antes de reutilizar una conexión se verifica que siga viva.
+_conn_max_age = _entero_env('DB_CONN_MAX_AGE', 60, minimo=-1)
+CONN_MAX_AGE = None if _conn_max_age == -1 else _conn_max_age
+CONN_HEALTH_CHECKS = _booleano_env('DB_CONN_HEALTH_CHECKS', True)
+
+# DB_POOL: usa el pool de conexiones del driver en lugar de conexiones persistentes por hilo.
+# Solo PostgreSQL (psycopg 3) lo soporta en Django; DB_POOL_MIN/DB_POOL_MAX acotan su tamaño.
+DB_POOL = _booleano_env('DB_POOL', False)
+DB_POOL_MIN = _entero_env('DB_POOL_MIN', 2, minimo=0)
+DB_POOL_MAX = _entero_env('DB_POOL_MAX', 10, minimo=1)
+if DB_POOL and DB_POOL_MIN > DB_POOL_MAX:
+    raise ImproperlyConfigured(f'DB_POOL_MIN ({DB_POOL_MIN}) no puede ser mayor que DB_POOL_MAX ({DB_POOL_MAX}).')
+
 SQLITE = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -16,12 +60,16 @@ SQLITE = {
 
 POSTGRESQL = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('DB_USER'),
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': 'localhost',
-        'PORT': '5432'
+        'PORT': '5432',
+        # Con pool, Django exige CONN_MAX_AGE = 0: el pool decide cuándo cerrar
+        'CONN_MAX_AGE': 0 if DB_POOL else CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': CONN_HEALTH_CHECKS,
+        'OPTIONS': {'pool': {'min_size': DB_POOL_MIN, 'max_size': DB_POOL_MAX}} if DB_POOL else {},
     }
 }
 
@@ -33,5 +81,8 @@ MYSQL = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_IP'),
         'PORT': os.getenv('DB_PORT'),
+        # El backend MySQL no tiene pool: cada hilo del servidor mantiene su conexión persistente
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': CONN_HEALTH_CHECKS,
     }
 }
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 import os
 from pathlib import Path
 
+from .cache import CACHES_DISPONIBLES
 from .db import MYSQL
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -109,6 +110,20 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 DATABASES = MYSQL
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# CACHE_BACKEND: 'locmem' (desarrollo y pruebas), 'file' o 'redis' (compartida entre workers)
+
+CACHES = CACHES_DISPONIBLES[os.getenv('CACHE_BACKEND', 'locmem')]
+
+# Exportaciones en segundo plano (reports.TrabajoExportacion, worker: manage.py procesar_exportaciones)
+# EXPORT_DIR: carpeta de los archivos generados. Una exportación igual a otra pedida hace menos de
+# EXPORT_DEDUP_MINUTOS reutiliza esa; los archivos se eliminan pasadas EXPORT_RETENCION_HORAS.
+
+EXPORTACIONES_DIR = Path(os.getenv('EXPORT_DIR') or BASE_DIR / 'exportaciones')
+EXPORTACIONES_DEDUP_MINUTOS = int(os.getenv('EXPORT_DEDUP_MINUTOS', 15))
+EXPORTACIONES_RETENCION_HORAS = int(os.getenv('EXPORT_RETENCION_HORAS', 24))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -75,6 +75,26 @@ def validate_email(email):
     return email
 
 
+def normalize_rut(rut) -> str:
+    """
+    Forma canónica de un RUT para comparar y buscar: sin puntos, guiones ni espacios, en mayúsculas
+    y sin ceros a la izquierda del cuerpo ('09.876.543-k' -> '9876543K'). Devuelve '' si no hay RUT.
+    """
+    if rut is None:
+        return ""
+    if isinstance(rut, float):
+        if rut != rut:  # NaN (celdas vacías de pandas)
+            return ""
+        rut = int(rut)
+    rut = "".join(ch for ch in str(rut).upper() if ch.isalnum())
+    if not rut or rut == "NAN":
+        return ""
+    body, dv = rut[:-1], rut[-1]
+    if body.isdigit():
+        body = body.lstrip("0")
+    return f"{body}{dv}"
+
+
 def validate_rut(rut: str) -> bool:
     """Valida un RUT chileno en formato con o sin puntos y guión."""
     if not rut:
@@ -6,4 +6,5 @@ class KardexConfig(AppConfig):
     name = 'kardex'
 
     def ready(self):
+        import kardex.checks  # noqa
         import kardex.signals  # noqa
@@ -0,0 +1,142 @@
+"""
+Búsqueda de pacientes sobre el índice `PacienteBusqueda`.
+
+Cada paciente se descompone en términos normalizados (sin tildes, mayúsculas, RUT sin puntos ni guion)
+y la búsqueda exige que cada palabra ingresada sea prefijo de algún término del paciente. Así se
+evita el OR de `__icontains` sobre `kardex_paciente`, que obliga a recorrer la tabla completa.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+
+from kardex.choices import ESTADO_CIVIL
+from kardex.models import Comuna, Paciente, PacienteBusqueda, Prevision
+
+# Campos del paciente que alimentan el índice
+CAMPOS_INDEXADOS = [
+    'rut', 'codigo', 'nip', 'pasaporte', 'rut_madre', 'rut_responsable_temporal',
+    'nombre', 'apellido_paterno', 'apellido_materno', 'nombre_social',
+]
+
+SEXO_VALORES = ['MASCULINO', 'FEMENINO']
+
+LARGO_TERMINO = 100
+TAMANO_LOTE = 2000
+
+# Une los tramos de un RUT/código ('12.345.678-K' -> '12345678K') antes de separar en palabras
+_SEPARADORES_RUT = re.compile(r'(?<=[0-9])[.\-](?=[0-9K])')
+_NO_ALFANUMERICO = re.compile(r'[^0-9A-Z]+')
+
+
+def normalizar_texto(valor):
+    """
+    Quita tildes, pasa a mayúsculas y une los separadores de RUT.
+    """
+    if not valor:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(valor))
+    texto = ''.join(ch for ch in texto if not unicodedata.combining(ch)).upper()
+    return _SEPARADORES_RUT.sub('', texto)
+
+
+def tokenizar(valor):
+    """
+    Palabras normalizadas de un texto, sin repetir y respetando el orden.
+    """
+    palabras = _NO_ALFANUMERICO.split(normalizar_texto(valor))
+    return list(dict.fromkeys(p[:LARGO_TERMINO] for p in palabras if p))
+
+
+def terminos_paciente(paciente):
+    terminos = set()
+    for campo in CAMPOS_INDEXADOS:
+        terminos.update(tokenizar(getattr(paciente, campo, None)))
+    # RUT sin dígito verificador, para buscar solo por el cuerpo
+    rut = _NO_ALFANUMERICO.sub('', normalizar_texto(paciente.rut))
+    if len(rut) > 1:
+        terminos.add(rut[:-1])
+    return terminos
+
+
+def indexar_pacientes(pacientes):
+    """
+    Regenera los términos de los pacientes dados (reemplaza los existentes).
+    """
+    pacientes = [p for p in pacientes if p.pk]
+    if not pacientes:
+        return 0
+    PacienteBusqueda.objects.filter(paciente_id__in=[p.pk for p in pacientes]).delete()
+    registros = [
+        PacienteBusqueda(paciente_id=p.pk, termino=termino)
+        for p in pacientes
+        for termino in terminos_paciente(p)
+    ]
+    PacienteBusqueda.objects.bulk_create(registros, batch_size=TAMANO_LOTE)
+    return len(registros)
+
+
+def reindexar_todos(tamano_lote=TAMANO_LOTE, desde_id=0):
+    """
+    Recorre todos los pacientes por rangos de id e indexa por lotes. Devuelve (pacientes, términos).
+    """
+    campos = ['id'] + CAMPOS_INDEXADOS
+    total_pacientes = total_terminos = 0
+    ultimo_id = desde_id
+    while True:
+        lote = list(Paciente.objects.filter(id__gt=ultimo_id).order_by('id').only(*campos)[:tamano_lote])
+        if not lote:
+            break
+        total_terminos += indexar_pacientes(lote)
+        total_pacientes += len(lote)
+        ultimo_id = lote[-1].id
+    return total_pacientes, total_terminos
+
+
+def _lookup_prefijo():
+    # En MySQL LIKE BINARY (startswith) no aprovecha el índice con collation *_ci; los términos ya
+    # están en mayúsculas, así que istartswith es equivalente y sí usa el índice.
+    return 'termino__istartswith' if connection.vendor == 'mysql' else 'termino__startswith'
+
+
+def q_busqueda_pacientes(texto, incluir_catalogos=False):
+    """
+    Q para filtrar `Paciente` con el índice: cada palabra debe ser prefijo de un término del paciente.
+    Con `incluir_catalogos` también coincide por comuna, previsión, sexo o estado civil.
+    """
+    palabras = tokenizar(texto)
+    if not palabras:
+        return Q()
+
+    lookup = _lookup_prefijo()
+    q = Q()
+    for palabra in palabras:
+        q &= Q(pk__in=PacienteBusqueda.objects.filter(**{lookup: palabra}).values('paciente_id'))
+
+    if incluir_catalogos:
+        frase = ' '.join(palabras)
+        # Catálogos pequeños: se resuelven a ids/valores en memoria y se filtra por columnas indexadas
+        comunas = [c.pk for c in Comuna.objects.only('nombre') if normalizar_texto(c.nombre).startswith(frase)]
+        previsiones = [p.pk for p in Prevision.objects.only('nombre') if
+                       normalizar_texto(p.nombre).startswith(frase)]
+        sexos = [s for s in SEXO_VALORES if s.startswith(frase)]
+        estados = [e for e, _ in ESTADO_CIVIL if normalizar_texto(e).startswith(frase)]
+        if comunas:
+            q |= Q(comuna_id__in=comunas)
+        if previsiones:
+            q |= Q(prevision_id__in=previsiones)
+        if sexos:
+            q |= Q(sexo__in=sexos)
+        if estados:
+            q |= Q(estado_civil__in=estados)
+    return q
+
+
+def buscar_pacientes(qs, texto, incluir_catalogos=False):
+    """
+    Aplica la búsqueda indexada sobre un queryset de `Paciente`.
+    """
+    if not texto or not texto.strip():
+        return qs
+    return qs.filter(q_busqueda_pacientes(texto, incluir_catalogos=incluir_catalogos))
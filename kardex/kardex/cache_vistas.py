@@ -0,0 +1,93 @@
+"""
+Caché de respuestas de vistas (exportaciones) y versiones de datos (catálogos, conteos de DataTableMixin).
+
+Las claves se arman con la huella del usuario (establecimiento + conjunto de permisos), de modo que
+usuarios con el mismo alcance comparten la entrada y nadie recibe datos de otro establecimiento.
+Los datos que dependen de modelos se guardan bajo la versión de esos modelos (ver version_modelo),
+que sube al guardar/eliminar registros: no hace falta borrar entradas a mano.
+"""
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import StreamingHttpResponse, FileResponse
+
+CACHE_VISTA_KEY = 'kardex:vista:{prefijo}:{firma}'
+
+
+def obtener_version(clave):
+    """
+    Versión guardada bajo `clave` (1 si aún no existe). Sin expiración.
+    """
+    return cache.get_or_set(clave, 1, None)
+
+
+def subir_version(clave):
+    """
+    Sube la versión guardada bajo `clave`; las entradas armadas con la versión anterior quedan huérfanas.
+    """
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 2, None)
+
+
+def version_modelo(model):
+    """
+    Versión de los datos de un modelo: la del catálogo para comunas, previsiones, sectores, servicios y
+    profesionales; para el resto, la de los conteos de DataTableMixin.
+    """
+    from kardex.catalogos import es_catalogo, version_catalogo
+    from kardex.mixin import get_datatable_count_version
+
+    if es_catalogo(model):
+        return version_catalogo(model)
+    return get_datatable_count_version(model)
+
+
+def huella_usuario(user):
+    """
+    Identifica el alcance del usuario: establecimiento y conjunto de permisos (no el usuario en sí).
+    """
+    if user is None or not user.is_authenticated:
+        return 'anonimo'
+    permisos = '*' if user.is_superuser else ','.join(sorted(user.get_all_permissions()))
+    firma = hashlib.md5(permisos.encode('utf-8')).hexdigest()[:16]
+    return f"est{getattr(user, 'establecimiento_id', None) or 0}:{firma}"
+
+
+def _firma(*partes):
+    return hashlib.md5('|'.join(map(str, partes)).encode('utf-8')).hexdigest()
+
+
+def _versiones(modelos):
+    return [f'{m._meta.label_lower}={version_modelo(m)}' for m in modelos]
+
+
+def cache_respuesta(timeout=300, prefijo=None, modelos=()):
+    """
+    Decorador para vistas basadas en funciones. Cachea respuestas GET 200 no streaming, por ruta completa
+    + huella del usuario + versión de `modelos`.
+    """
+    def decorador(vista):
+        nombre = prefijo or f'{vista.__module__}.{vista.__qualname__}'
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return vista(request, *args, **kwargs)
+            firma = _firma(request.get_full_path(), huella_usuario(getattr(request, 'user', None)),
+                           *_versiones(modelos))
+            key = CACHE_VISTA_KEY.format(prefijo=nombre, firma=firma)
+            response = cache.get(key)
+            if response is None:
+                response = vista(request, *args, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    response = response.render()
+                if response.status_code == 200 and not isinstance(response, (StreamingHttpResponse, FileResponse)):
+                    cache.set(key, response, timeout)
+            return response
+
+        return envoltura
+
+    return decorador
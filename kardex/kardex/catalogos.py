@@ -0,0 +1,154 @@
+"""
+Caché de catálogos (comunas, previsiones, sectores, servicios clínicos, profesionales).
+
+Son tablas que cambian pocas veces al mes pero se leen en cada formulario y en los selects de la API.
+Cada modelo tiene una versión en caché que sube al guardar/eliminar un registro (ver kardex.signals);
+los datos se guardan bajo la versión y la firma de la consulta, por lo que una consulta filtrada por
+establecimiento queda en su propia entrada y todas se invalidan juntas con el modelo.
+"""
+import hashlib
+
+from django import forms
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.forms.models import ModelChoiceIterator, ModelChoiceIteratorValue
+from django.utils.cache import patch_cache_control
+from rest_framework import status
+from rest_framework.response import Response
+
+from kardex.cache_vistas import obtener_version, subir_version
+
+MODELOS_CATALOGO = (
+    'kardex.comuna',
+    'kardex.prevision',
+    'kardex.sector',
+    'kardex.servicioclinico',
+    'kardex.profesional',
+)
+
+CATALOGO_VERSION_KEY = 'kardex:catalogo:version:{label}'
+CATALOGO_DATOS_KEY = 'kardex:catalogo:{label}:v{version}:{firma}'
+CATALOGO_TIMEOUT = 60 * 60 * 24  # segundos; la invalidación real es por versión
+
+
+def cache_compartida():
+    """
+    True si la caché por defecto es visible para todos los procesos (archivo, Redis). Con locmem cada worker
+    tiene sus propias versiones y no ve las invalidaciones de los demás.
+    """
+    return settings.CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def timeout_catalogo():
+    # Sin caché compartida el TTL de la caché (CACHE_TIMEOUT) acota cuánto tiempo otro worker ve datos viejos
+    if cache_compartida():
+        return CATALOGO_TIMEOUT
+    return settings.CACHES['default'].get('TIMEOUT', 300)
+
+
+def es_catalogo(model):
+    return model._meta.label_lower in MODELOS_CATALOGO
+
+
+def version_catalogo(model):
+    """
+    Versión actual del catálogo del modelo (cambia al guardar/eliminar registros).
+    """
+    return obtener_version(CATALOGO_VERSION_KEY.format(label=model._meta.label_lower))
+
+
+def invalidar_catalogo(model):
+    """
+    Invalida todas las entradas cacheadas del catálogo subiendo su versión.
+    """
+    subir_version(CATALOGO_VERSION_KEY.format(label=model._meta.label_lower))
+
+
+def clave_catalogo(queryset, *extra):
+    """
+    Clave de caché para una consulta del catálogo: versión del modelo + SQL (incluye establecimiento y filtros).
+    """
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        sql = 'vacio'
+    firma = hashlib.md5('|'.join([sql, *map(str, extra)]).encode('utf-8')).hexdigest()
+    return CATALOGO_DATOS_KEY.format(
+        label=queryset.model._meta.label_lower,
+        version=version_catalogo(queryset.model),
+        firma=firma,
+    )
+
+
+def obtener_catalogo(queryset, construir, *extra):
+    """
+    Devuelve construir(queryset) desde la caché, calculándolo solo si la versión del catálogo cambió.
+    """
+    key = clave_catalogo(queryset, *extra)
+    datos = cache.get(key)
+    if datos is None:
+        datos = construir(queryset)
+        cache.set(key, datos, timeout_catalogo())
+    return datos
+
+
+class CatalogoModelChoiceIterator(ModelChoiceIterator):
+    """
+    Opciones del select desde la caché del catálogo en vez de recorrer el queryset en cada render.
+    """
+
+    def opciones(self):
+        field = self.field
+        return obtener_catalogo(
+            self.queryset,
+            lambda qs: [(obj.pk, field.label_from_instance(obj)) for obj in qs],
+            type(field).__qualname__,
+        )
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for pk, label in self.opciones():
+            yield ModelChoiceIteratorValue(pk, None), label
+
+    def __len__(self):
+        return len(self.opciones()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.opciones())
+
+
+class CatalogoModelChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField para catálogos: las opciones salen de la caché; la validación del valor enviado
+    sigue consultando la base de datos.
+    """
+    iterator = CatalogoModelChoiceIterator
+
+
+class CatalogoCacheMixin:
+    """
+    Para ViewSets de solo lectura de catálogos: el listado se cachea por versión del catálogo y se
+    responde con ETag; si el cliente envía If-None-Match con la misma versión se devuelve 304.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        # La ruta completa incluye paginación y búsqueda
+        key = clave_catalogo(queryset, request.get_full_path())
+        etag = f'"{hashlib.md5(key.encode("utf-8")).hexdigest()}"'
+
+        if etag in [e.strip() for e in request.headers.get('If-None-Match', '').split(',')]:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(key)
+            if data is None:
+                data = super().list(request, *args, **kwargs).data
+                cache.set(key, data, timeout_catalogo())
+            response = Response(data)
+
+        response['ETag'] = etag
+        # El navegador debe revalidar siempre (el catálogo puede cambiar en cualquier momento)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,54 @@
+"""
+Validaciones de arranque de la configuración de conexiones a la base de datos y de la caché.
+
+Los valores mal escritos en el .env ya fallan al cargar config.db (ImproperlyConfigured); aquí se revisan
+combinaciones que solo son incorrectas según el motor o el servidor. Las que consultan el servidor
+(wait_timeout de MySQL) corren solo con ``manage.py check --database default``.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+
+from config.db import DB_POOL
+from kardex.catalogos import cache_compartida
+
+
+@register(Tags.database)
+def revisar_configuracion_conexiones(app_configs=None, databases=None, **kwargs):
+    errores = []
+    for alias in databases or []:
+        conexion = connections[alias]
+        max_age = conexion.settings_dict.get('CONN_MAX_AGE', 0)
+
+        if DB_POOL and conexion.vendor != 'postgresql':
+            errores.append(Warning(
+                f'DB_POOL está activo pero "{alias}" usa {conexion.vendor}, que no tiene pool en Django.',
+                hint='Se usan conexiones persistentes por hilo (DB_CONN_MAX_AGE); desactive DB_POOL.',
+                id='kardex.W001',
+            ))
+
+        if conexion.vendor == 'mysql' and max_age != 0:
+            with conexion.cursor() as cursor:
+                cursor.execute("SELECT @@SESSION.wait_timeout")
+                wait_timeout = cursor.fetchone()[0]
+            if max_age is None or max_age >= wait_timeout:
+                errores.append(Warning(
+                    f'CONN_MAX_AGE de "{alias}" ({max_age}) no es menor que el wait_timeout de MySQL '
+                    f'({wait_timeout} s): el servidor cerrará conexiones que Django intentará reutilizar.',
+                    hint='Baje DB_CONN_MAX_AGE o mantenga DB_CONN_HEALTH_CHECKS activo.',
+                    id='kardex.W002',
+                ))
+    return errores
+
+
+
+@register(Tags.caches)
+def revisar_cache_compartida(app_configs=None, **kwargs):
+    if settings.DEBUG or cache_compartida():
+        return []
+    return [Warning(
+        'La caché por defecto es locmem (por proceso): cada worker guarda sus propios catálogos y conteos y no '
+        've las invalidaciones de los demás hasta que vence la entrada (CACHE_TIMEOUT).',
+        hint="Use CACHE_BACKEND='file' o 'redis' en producción.",
+        id='kardex.W003',
+    )]
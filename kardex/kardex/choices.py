@@ -69,3 +69,9 @@ SECTOR_COLORS = [
     ('PLATEADO', 'Plateado'),
     ('BEIGE', 'Beige'),
 ]
+
+ESTADO_UBICACION = [
+    ('EN TRANSITO', 'En Tránsito'),
+    ('RECIBIDO', 'Recibido'),
+    ('TRASPASADO', 'Traspasado'),
+]
@@ -3,6 +3,7 @@ from django.core.validators import MaxLengthValidator
 
 from config.validations import validate_spaces, validate_exists
 # from config.validation_forms import validate_nombre, validate_description, validate_spaces, validate_exists
+from kardex.catalogos import CatalogoModelChoiceField
 from kardex.models import Establecimiento, Comuna
 
 
@@ -43,7 +44,7 @@ class FormEstablecimiento(forms.ModelForm):
         required=False,
         validators=[MaxLengthValidator(15, message='No puedes escribir más de 15 caracteres.')],
     )
-    comuna = forms.ModelChoiceField(
+    comuna = CatalogoModelChoiceField(
         label="Comuna",
         empty_label="Selecciona una Comuna",
         queryset=Comuna.objects.filter(status="ACTIVE"),
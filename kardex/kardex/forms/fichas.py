@@ -1,5 +1,6 @@
 from django import forms
 
+from kardex.catalogos import CatalogoModelChoiceField
 from kardex.models import Ficha, Establecimiento, Profesional, Paciente, Sector
 
 
@@ -45,7 +46,7 @@ class FormFicha(forms.ModelForm):
         required=True
     )
 
-    sector = forms.ModelChoiceField(
+    sector = CatalogoModelChoiceField(
         label='Sector',
         empty_label='Seleccione un Sector',
         queryset=Sector.objects.all(),
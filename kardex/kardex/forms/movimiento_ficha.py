@@ -1,5 +1,6 @@
 from django import forms
 
+from kardex.catalogos import CatalogoModelChoiceField
 from kardex.models import MovimientoFicha, ServicioClinico, Profesional
 
 
@@ -71,7 +72,7 @@ class FormEntradaFicha(forms.ModelForm):
         required=True
     )
 
-    profesional_recepcion = forms.ModelChoiceField(
+    profesional_recepcion = CatalogoModelChoiceField(
         label='Profesional que recibe',
         empty_label="Seleccione un Profesional",
         queryset=Profesional.objects.filter(status='ACTIVE').all(),
@@ -180,7 +181,7 @@ class FormSalidaFicha(forms.ModelForm):
             }
         )
     )
-    servicio_clinico_envio = forms.ModelChoiceField(
+    servicio_clinico_envio = CatalogoModelChoiceField(
         label='Servicio Clínico de Envío',
         empty_label="Selecciona un Servicio Clínico",
         queryset=ServicioClinico.objects.filter(status='ACTIVE').all(),
@@ -193,7 +194,7 @@ class FormSalidaFicha(forms.ModelForm):
         required=True
     )
 
-    servicio_clinico_recepcion = forms.ModelChoiceField(
+    servicio_clinico_recepcion = CatalogoModelChoiceField(
         label='Servicio Clínico de Recepción',
         empty_label="Selecciona un Servicio Clínico",
         queryset=ServicioClinico.objects.filter(status='ACTIVE').all(),
@@ -216,7 +217,7 @@ class FormSalidaFicha(forms.ModelForm):
         }),
         required=False
     )
-    profesional_envio = forms.ModelChoiceField(
+    profesional_envio = CatalogoModelChoiceField(
         label='Profesional que envía',
         empty_label="Seleccione un Profesional",
         queryset=Profesional.objects.filter(status='ACTIVE').all(),
@@ -346,7 +347,7 @@ class FormTraspasoFicha(forms.ModelForm):
         })
     )
 
-    servicio_clinico_traspaso = forms.ModelChoiceField(
+    servicio_clinico_traspaso = CatalogoModelChoiceField(
         label='Servicio Clínico de Traspaso',
         empty_label='Seleccione un Servicio Clínico',
         queryset=ServicioClinico.objects.filter(status='ACTIVE').all(),
@@ -399,7 +400,7 @@ class FormTraspasoFicha(forms.ModelForm):
                                                      'readonly': 'readonly'}))
 
     # Profesional traspaso mostrado como texto para la API; el sistema puede usar select si fuese necesario
-    profesional_traspaso = forms.ModelChoiceField(
+    profesional_traspaso = CatalogoModelChoiceField(
         label='Profesional que traslada',
         empty_label="Seleccione un Profesional",
         queryset=Profesional.objects.filter(status='ACTIVE').all(),
@@ -466,14 +467,14 @@ class FiltroSalidaFichaForm(forms.Form):
         }),
         required=False
     )
-    servicio_clinico = forms.ModelChoiceField(
+    servicio_clinico = CatalogoModelChoiceField(
         label="Servicio Clínico",
         queryset=ServicioClinico.objects.filter(status='ACTIVE').all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
 
-    profesional = forms.ModelChoiceField(
+    profesional = CatalogoModelChoiceField(
         label="Profesional asignado",
         queryset=Profesional.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
@@ -619,42 +620,42 @@ class MovimientoFichaForm(forms.ModelForm):
     )
 
     # ---------------- SERVICIOS ----------------
-    servicio_clinico_envio = forms.ModelChoiceField(
+    servicio_clinico_envio = CatalogoModelChoiceField(
         label="Servicio clínico de envío",
         queryset=ServicioClinico.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
 
-    servicio_clinico_recepcion = forms.ModelChoiceField(
+    servicio_clinico_recepcion = CatalogoModelChoiceField(
         label="Servicio clínico de recepción",
         queryset=ServicioClinico.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
 
-    servicio_clinico_traspaso = forms.ModelChoiceField(
+    servicio_clinico_traspaso = CatalogoModelChoiceField(
         label="Servicio clínico de traspaso",
         queryset=ServicioClinico.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
     # ---------------- PROFESIONALES ----------------
-    profesional_envio = forms.ModelChoiceField(
+    profesional_envio = CatalogoModelChoiceField(
         label="Profesional envío",
         queryset=Profesional.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
 
-    profesional_recepcion = forms.ModelChoiceField(
+    profesional_recepcion = CatalogoModelChoiceField(
         label="Profesional recepción",
         queryset=Profesional.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
 
-    profesional_traspaso = forms.ModelChoiceField(
+    profesional_traspaso = CatalogoModelChoiceField(
         label="Profesional traspaso",
         queryset=Profesional.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
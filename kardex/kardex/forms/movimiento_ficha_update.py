@@ -1,6 +1,7 @@
 # forms.py
 from django import forms
 
+from kardex.catalogos import CatalogoModelChoiceField
 from kardex.models import MovimientoFicha, ServicioClinico, Profesional
 
 
@@ -60,7 +61,7 @@ class FormSalidaFicha(forms.ModelForm):
     # Campos filtrables por establecimiento
     # -------------------------------------------------
 
-    servicio_clinico_envio = forms.ModelChoiceField(
+    servicio_clinico_envio = CatalogoModelChoiceField(
         label='Servicio Clínico de Envío',
         queryset=ServicioClinico.objects.none(),
         widget=forms.Select(attrs={
@@ -70,7 +71,7 @@ class FormSalidaFicha(forms.ModelForm):
         required=True
     )
 
-    servicio_clinico_recepcion = forms.ModelChoiceField(
+    servicio_clinico_recepcion = CatalogoModelChoiceField(
         label='Servicio Clínico de Recepción',
         queryset=ServicioClinico.objects.none(),
         widget=forms.Select(attrs={
@@ -80,7 +81,7 @@ class FormSalidaFicha(forms.ModelForm):
         required=True
     )
 
-    profesional_envio = forms.ModelChoiceField(
+    profesional_envio = CatalogoModelChoiceField(
         label='Profesional Responsable',
         queryset=Profesional.objects.none(),
         widget=forms.Select(attrs={
@@ -1,7 +1,8 @@
 from django import forms
 from django.core.exceptions import ValidationError
 
-from config.validations import validate_spaces, validate_rut, format_rut
+from config.validations import validate_spaces, validate_rut, format_rut, normalize_rut
+from kardex.catalogos import CatalogoModelChoiceField
 from kardex.choices import GENERO_CHOICES
 from kardex.models import Paciente, Comuna, Prevision, Sector
 from usuarios.models import UsuarioPersonalizado
@@ -42,7 +43,7 @@ class FormPacienteSinRut(forms.ModelForm):
 
         errors = {}
         if rut:
-            qs = Pac.objects.filter(rut=rut)
+            qs = Pac.objects.filter(rut_normalizado=normalize_rut(rut))
             if instance_pk:
                 qs = qs.exclude(pk=instance_pk)
             if qs.exists():
@@ -316,14 +317,14 @@ class FormPacienteSinRut(forms.ModelForm):
         widget=forms.CheckboxInput(attrs={'id': 'sin_telefono_paciente'})
     )
 
-    comuna = forms.ModelChoiceField(
+    comuna = CatalogoModelChoiceField(
         label='Comuna',
         empty_label='Seleccione una Comuna',
         queryset=Comuna.objects.filter(status='ACTIVE'),
         widget=forms.Select(attrs={'class': 'form-control select2', 'id': 'comuna_paciente'}),
         required=True
     )
-    sector = forms.ModelChoiceField(
+    sector = CatalogoModelChoiceField(
         label='Sector',
         empty_label='Seleccione un Sector',
         queryset=Sector.objects.all(),
@@ -338,7 +339,7 @@ class FormPacienteSinRut(forms.ModelForm):
         required=True
     )
 
-    prevision = forms.ModelChoiceField(
+    prevision = CatalogoModelChoiceField(
         label='Previsión',
         empty_label='Seleccione una Previsión',
         queryset=Prevision.objects.filter(status='ACTIVE'),
@@ -515,7 +516,7 @@ class FormPacienteActualizarRut(forms.ModelForm):
         if not rut:
             return cleaned
         instance_pk = getattr(self.instance, 'pk', None)
-        qs = Paciente.objects.filter(rut=rut)
+        qs = Paciente.objects.filter(rut_normalizado=normalize_rut(rut))
         if instance_pk:
             qs = qs.exclude(pk=instance_pk)
         if qs.exists():
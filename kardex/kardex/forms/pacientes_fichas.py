@@ -4,6 +4,7 @@ import datetime
 from django import forms
 from django.core.validators import RegexValidator
 
+from kardex.catalogos import CatalogoModelChoiceField
 from kardex.choices import GENERO_CHOICES
 from kardex.models import Prevision, Sector, Comuna
 
@@ -377,7 +378,7 @@ class PacienteForm(forms.Form):
     # =============================
 
     # Nota: Este campo se cargará dinámicamente desde la base de datos
-    prevision = forms.ModelChoiceField(
+    prevision = CatalogoModelChoiceField(
         label='Previsión',
         empty_label="Selecciona una Opción",
         queryset=Prevision.objects.all(),
@@ -389,7 +390,7 @@ class PacienteForm(forms.Form):
     )
 
     # Nota: Este campo se cargará dinámicamente desde la base de datos
-    sector = forms.ModelChoiceField(
+    sector = CatalogoModelChoiceField(
         label='Sector',
         empty_label="Selecciona una Opción",
         queryset=Sector.objects.all(),
@@ -400,7 +401,7 @@ class PacienteForm(forms.Form):
         })
     )
 
-    comuna = forms.ModelChoiceField(
+    comuna = CatalogoModelChoiceField(
         label='Comuna',
         empty_label="Selecciona una Opción",
         queryset=Comuna.objects.all(),
@@ -1,7 +1,7 @@
 from django import forms
 from django.core.exceptions import ValidationError
 
-from config.validations import validate_rut, format_rut, validate_spaces, validate_email
+from config.validations import validate_rut, format_rut, validate_spaces, validate_email, normalize_rut
 from kardex.models import Profesional, Establecimiento
 from kardex.models.profesion import Profesion
 
@@ -95,7 +95,7 @@ class FormProfesional(forms.ModelForm):
             raise ValidationError("El RUT ingresado no es válido.")
 
         # Si ya existe otro profesional con el mismo RUT
-        if Profesional.objects.filter(rut=format_rut(rut_sin_formato)).exclude(pk=self.instance.pk).exists():
+        if Profesional.objects.filter(rut_normalizado=normalize_rut(rut_sin_formato)).exclude(pk=self.instance.pk).exists():
             raise ValidationError("Ya existe un profesional con este RUT.")
 
         return format_rut(rut_sin_formato)
@@ -0,0 +1,83 @@
+"""
+Diferencias entre versiones de los registros históricos (django-simple-history).
+
+Cada actualización ('~') guarda en `history_cambios` los campos que cambió y sus valores antes/después,
+al momento de escribir el registro. Así los listados de historial, el dashboard y las exportaciones muestran
+los cambios sin reconstruir pares de versiones (prev_record) fila por fila.
+"""
+from django.utils import timezone
+
+
+def campos_auditados(model):
+    # Campos comparados: todos los concretos salvo la PK y los que cambian solos (auto_now)
+    return [
+        f for f in model._meta.concrete_fields
+        if not f.primary_key and not getattr(f, 'auto_now', False)
+    ]
+
+
+def calcular_cambios(model, anteriores, actuales):
+    """
+    {campo: [antes, después]} de los campos de `model` que difieren entre dos diccionarios por attname
+    ('<fk>_id' en relaciones). Los campos ausentes en `anteriores` no se comparan.
+    """
+    cambios = {}
+    for field in campos_auditados(model):
+        if field.attname in anteriores and anteriores[field.attname] != actuales.get(field.attname):
+            cambios[field.name] = [anteriores[field.attname], actuales.get(field.attname)]
+    return cambios
+
+
+def cambios_de_registro(instance, history_instance):
+    """
+    Cambios de la versión `history_instance` respecto de la anterior. Usa los valores cargados en memoria si
+    el modelo los guarda (ConValoresCargados); si no, lee solo la versión previa (una consulta por PK).
+    """
+    model = type(instance)
+    anteriores = getattr(instance, '_valores_cargados', None)
+    if anteriores is None:
+        pk = model._meta.pk.attname
+        anteriores = type(history_instance).objects.filter(**{pk: instance.pk}) \
+            .order_by('-history_date', '-history_id') \
+            .values(*[f.attname for f in campos_auditados(model)]).first()
+        if anteriores is None:
+            return None
+    actuales = {f.attname: getattr(history_instance, f.attname) for f in campos_auditados(model)}
+    return calcular_cambios(model, anteriores, actuales)
+
+
+def describir_cambios(cambios, limite=None):
+    """
+    Texto para listados: 'campo: antes → después; ...'. Con `limite`, solo los primeros campos.
+    """
+    if not cambios:
+        return ''
+    items = list(cambios.items())
+    partes = [f"{campo}: {'' if antes is None else antes} → {'' if despues is None else despues}"
+              for campo, (antes, despues) in items[:limite]]
+    if limite is not None and len(items) > limite:
+        partes.append(f'(+{len(items) - limite})')
+    return '; '.join(partes)
+
+
+def crear_historial_actualizacion(model, objetos, anteriores, batch_size=None, default_user=None):
+    """
+    Registros históricos '~' de objetos guardados con bulk_update, con su `history_cambios`. Equivale a
+    model.history.bulk_history_create(objetos, update=True), que no emite pre_create_historical_record;
+    `anteriores` son los diccionarios por attname de cada objeto antes del cambio; `default_user`, el usuario
+    cuando no hay uno en la instancia o en la petición (como en bulk_update_with_history).
+    """
+    historico = model.history.model
+    fecha = timezone.now()
+    registros = []
+    for objeto, antes in zip(objetos, anteriores):
+        valores = {f.attname: getattr(objeto, f.attname) for f in historico.tracked_fields}
+        registros.append(historico(
+            history_date=fecha,
+            history_user=historico.get_default_history_user(objeto) or default_user,
+            history_change_reason='',
+            history_type='~',
+            history_cambios=calcular_cambios(model, antes, valores),
+            **valores,
+        ))
+    return historico.objects.bulk_create(registros, batch_size=batch_size)
@@ -0,0 +1,489 @@
+"""
+Base compartida por los comandos importar_*: lectura por bloques, etapas vectorizadas con pandas
+(normalización de RUT, claves de la base de datos como DataFrames para hacer merge), registro de filas
+rechazadas en un CSV y ComandoImportacion, que aplica cada bloque en su propia transacción con un punto de
+control para poder reanudar (--resume).
+
+El módulo empieza con "_" para que Django no lo liste como comando.
+"""
+import multiprocessing
+import os
+import queue
+from collections import Counter
+from importlib import import_module
+from itertools import islice
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from tqdm import tqdm
+
+
+def normalizar_ruts(serie):
+    """
+    normalize_rut() vectorizado: sin puntos/guiones/espacios, en mayúsculas y sin ceros a la izquierda del
+    cuerpo. Vacíos y NaN quedan como ''.
+    """
+    s = serie.fillna('').astype(str).str.upper().str.replace(r'[\W_]+', '', regex=True)
+    s = s.mask(s == 'NAN', '')
+    cuerpo, dv = s.str[:-1], s.str[-1:]
+    cuerpo = cuerpo.mask(cuerpo.str.isdigit(), cuerpo.str.lstrip('0'))
+    return cuerpo + dv
+
+
+def a_entero(serie):
+    """
+    Columna de texto a entero nullable (Int64); lo que no es número queda como <NA>.
+    """
+    return pd.to_numeric(serie, errors='coerce').astype('Int64')
+
+
+def a_booleano(serie):
+    """
+    Columna "0"/"1" a booleanos; vacíos y valores no numéricos quedan como False.
+    """
+    return a_entero(serie).fillna(0).ne(0).astype(bool)
+
+
+def a_fecha(serie):
+    """
+    Columna de texto a fechas con la zona horaria actual, como objetos para asignarlas a los modelos. Lo que
+    no es fecha queda como None.
+    """
+    fechas = pd.to_datetime(serie, errors='coerce', format='mixed')
+    fechas = fechas.dt.tz_localize(timezone.get_current_timezone(), ambiguous='NaT', nonexistent='shift_forward')
+    return fechas.astype(object).where(fechas.notna(), None)
+
+
+def a_fecha_sin_hora(serie):
+    """
+    Columna de texto a date (sin hora ni zona horaria); lo que no es fecha queda como None.
+    """
+    fechas = pd.to_datetime(serie, errors='coerce', format='mixed')
+    return fechas.dt.date.astype(object).where(fechas.notna(), None)
+
+
+def a_ids(serie):
+    """
+    Columna de ids (Int64) a enteros de Python, con None donde falta; lista para asignar a los modelos.
+    """
+    return pd.Series([None if pd.isna(v) else int(v) for v in serie], index=serie.index, dtype=object)
+
+
+def _texto_celda(valor):
+    # Igual que read_excel(dtype=str): los números enteros guardados como float van sin ".0"
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor)
+
+
+def leer_bloques(ruta, tamano, hoja=None):
+    """
+    Lee el archivo en DataFrames de a `tamano` filas, con todas las columnas como texto. Acepta CSV
+    (separado por ";"), Parquet (requiere pyarrow) y Excel (con openpyxl en modo solo lectura, `hoja` o la
+    activa). El archivo se abre aquí, así los errores de lectura aparecen al llamar y no al iterar.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == '.csv':
+        return pd.read_csv(ruta, sep=';', dtype=str, chunksize=tamano)
+    if extension == '.parquet':
+        import pyarrow.parquet as pq
+
+        archivo = pq.ParquetFile(ruta)
+        return (
+            lote.to_pandas().apply(lambda c: c.astype(object).where(c.isna(), c.map(_texto_celda)))
+            for lote in archivo.iter_batches(batch_size=tamano)
+        )
+
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    return _bloques_excel(libro, libro[hoja] if hoja else libro.active, tamano)
+
+
+def _bloques_excel(libro, hoja, tamano):
+    try:
+        filas = hoja.iter_rows(values_only=True)
+        encabezados = [str(c).strip() if c is not None else '' for c in next(filas, ())]
+        ancho = len(encabezados)
+        filas = (fila for fila in filas if any(v is not None for v in fila))
+        while True:
+            bloque = list(islice(filas, tamano))
+            if not bloque:
+                break
+            yield pd.DataFrame(
+                [[_texto_celda(v) for v in fila[:ancho]] + [None] * (ancho - len(fila)) for fila in bloque],
+                columns=encabezados)
+    finally:
+        libro.close()
+
+
+def en_lotes(valores, tamano):
+    valores = list(valores)
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+
+def claves(queryset, columnas, campo_filtro=None, valores=None, tamano=5000):
+    """
+    DataFrame con `columnas` (values_list) del queryset. Con `campo_filtro`/`valores` solo trae las filas cuyas
+    claves aparecen en el archivo, consultando `campo_filtro__in` en lotes de `tamano` (memoria acotada al
+    tamaño del archivo y no al de la tabla).
+    """
+    if campo_filtro is None:
+        return pd.DataFrame.from_records(list(queryset.values_list(*columnas)), columns=columnas)
+    partes = [
+        pd.DataFrame.from_records(
+            list(queryset.filter(**{f'{campo_filtro}__in': lote}).values_list(*columnas)), columns=columnas)
+        for lote in en_lotes(pd.unique(pd.Series(list(valores)).dropna()), tamano)
+    ]
+    if not partes:
+        return pd.DataFrame(columns=columnas)
+    return pd.concat(partes, ignore_index=True)
+
+
+class RegistroRechazos:
+    """
+    CSV de filas rechazadas: número de fila del archivo, motivo y columnas originales. Las filas se acumulan
+    mientras se procesa el bloque y se escriben con confirmar() cuando su transacción se guarda (o se
+    descartan si falla), así al reanudar no quedan repetidas. Nunca se imprimen una a una en la consola.
+    """
+
+    def __init__(self, ruta, columnas, continuar=False):
+        self.ruta = ruta
+        self.columnas = list(columnas)
+        self.por_motivo = Counter()
+        self._pendientes = []
+        if ruta and not continuar and os.path.exists(ruta):
+            os.remove(ruta)
+
+    @property
+    def total(self):
+        return sum(self.por_motivo.values())
+
+    @property
+    def pendientes(self):
+        return sum(len(rechazadas) for rechazadas in self._pendientes)
+
+    def rechazar(self, df, mascara, motivo):
+        """
+        Registra las filas de `df` donde `mascara` es verdadera y devuelve las restantes.
+        """
+        mascara = pd.Series(mascara, index=df.index).fillna(False).astype(bool)
+        rechazadas = df.loc[mascara]
+        if len(rechazadas):
+            salida = rechazadas[self.columnas].copy()
+            salida.insert(0, 'motivo', motivo)
+            salida.insert(0, 'fila', rechazadas['_fila'])
+            self._pendientes.append(salida)
+        return df.loc[~mascara]
+
+    def confirmar(self):
+        for salida in self._pendientes:
+            salida.to_csv(self.ruta, mode='a', index=False, sep=';', header=not os.path.exists(self.ruta))
+            self.por_motivo.update(salida['motivo'])
+        self._pendientes = []
+
+    def descartar(self):
+        self._pendientes = []
+
+    def tomar(self):
+        """
+        Entrega y olvida los rechazos pendientes (un worker los envía al proceso principal, que los escribe).
+        """
+        pendientes, self._pendientes = self._pendientes, []
+        return pendientes
+
+    def agregar(self, rechazos):
+        """
+        Escribe rechazos ya confirmados por otro proceso.
+        """
+        self._pendientes.extend(rechazos)
+        self.confirmar()
+
+
+def _mensaje_error(numero, df, error):
+    return (f'Error en el bloque {numero} (filas {df["_fila"].iloc[0]} a {df["_fila"].iloc[-1]}): {error}. '
+            f'Los bloques anteriores quedaron guardados; vuelva a ejecutar con --resume para continuar.')
+
+
+def _trabajador(modulo, opciones, archivo, entrada, salida):
+    """
+    Proceso de --workers: recibe partes de bloques por `entrada`, las aplica con su propia conexión a la base
+    de datos y devuelve totales y rechazos por `salida` (el CSV de rechazos lo escribe el proceso principal).
+    """
+    import django
+    from django.db import connections
+
+    django.setup()
+    comando = import_module(modulo).Command()
+    comando.configurar(opciones, archivo, ruta_rechazos=None)
+    comando.preparar(opciones)
+    try:
+        for numero, df, huella in iter(entrada.get, None):
+            try:
+                comando.reservar(df)
+                resultado = comando.aplicar(numero, df, huella)
+                salida.put(('ok', len(df), dict(resultado), comando.rechazos.tomar()))
+            except Exception as e:
+                comando.rechazos.descartar()
+                salida.put(('error', len(df), _mensaje_error(numero, df, e), []))
+    finally:
+        connections.close_all()
+
+
+class ComandoImportacion(BaseCommand):
+    """
+    Comando de importación por bloques. Cada bloque se procesa en una transacción que también registra su
+    LoteImportacion (huella del contenido): si el proceso se corta, lo guardado son bloques completos y
+    --resume salta los que ya tienen huella registrada.
+
+    Con --workers N cada bloque se reparte por clave_particion() entre N procesos, cada uno con su conexión.
+    Una misma clave va siempre al mismo proceso, así el orden entre filas relacionadas se mantiene; lo que
+    depende de un contador compartido se reserva en reservar(), fuera de la transacción del bloque.
+
+    Las subclases definen `columnas`, leer() si el archivo no es el estándar de leer_bloques(), preparar()
+    para cargar catálogos una vez y procesar_bloque(df), que suma sus totales en self.resultado.
+    """
+    columnas = []
+    descripcion = 'registros'
+    tamano_bloque = 100000
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Tamaño del lote de bulk_create/bulk_update (default: 1000)')
+        parser.add_argument('--chunk-size', type=int, default=self.tamano_bloque,
+                            help=f'Filas del archivo por bloque (transacción y punto de control) '
+                                 f'(default: {self.tamano_bloque})')
+        parser.add_argument('--rechazos', type=str, default=None,
+                            help='CSV donde se guardan las filas rechazadas (default: <archivo>.rechazos.csv)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continúa una importación interrumpida saltando los bloques ya aplicados '
+                                 '(usar el mismo --chunk-size y --workers)')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Procesos en paralelo, cada uno con su conexión a la base de datos (default: 1)')
+
+    @property
+    def nombre_comando(self):
+        return self.__module__.rsplit('.', 1)[-1]
+
+    def configurar(self, options, archivo, ruta_rechazos):
+        self.batch_size = options['batch_size']
+        self.reanudar = options['resume']
+        self.archivo = archivo
+        self.rechazos = RegistroRechazos(ruta_rechazos, self.columnas, continuar=self.reanudar or not ruta_rechazos)
+
+    def leer(self, ruta, options):
+        return leer_bloques(ruta, options['chunk_size'])
+
+    def preparar(self, options):
+        pass
+
+    def procesar_bloque(self, df):
+        raise NotImplementedError
+
+    def clave_particion(self, df):
+        """
+        Clave que decide el proceso de cada fila con --workers (por defecto, la fila completa).
+        """
+        return df[self.columnas]
+
+    def reservar(self, df):
+        """
+        Con --workers, antes de abrir la transacción del bloque: reservar lo que comparten los procesos
+        (p. ej. rangos de números), para no retener sus bloqueos mientras dura el bloque.
+        """
+
+    def importar(self, ruta, options):
+        """
+        Procesa el archivo completo y devuelve los totales (Counter), o None si no se pudo leer.
+        """
+        from kardex.models import LoteImportacion
+
+        self.configurar(options, os.path.basename(ruta), options['rechazos'] or f'{ruta}.rechazos.csv')
+        try:
+            self.stdout.write(self.style.SUCCESS(f'📖 Leyendo archivo por bloques: {ruta}'))
+            bloques = self.leer(ruta, options)
+        except Exception as e:
+            self.stderr.write(self.style.ERROR(f'❌ Error al leer el archivo: {e}'))
+            return None
+
+        previos = self.reanudar and LoteImportacion.objects.filter(
+            comando=self.nombre_comando, archivo=self.archivo).exists()
+
+        self.totales = Counter()
+        with tqdm(desc=f'📋 Procesando {self.descripcion}', unit='registro') as self.pbar:
+            if options['workers'] > 1:
+                self.importar_en_paralelo(self.bloques(bloques), options)
+            else:
+                self.preparar(options)
+                for numero, df in self.bloques(bloques):
+                    self.totales.update(self.aplicar_bloque(numero, df))
+                    self.pbar.update(len(df))
+                    self.pbar.set_postfix({'Bloques omitidos': self.totales['bloques_omitidos'],
+                                           'Rechazadas': self.rechazos.total})
+
+        if previos and not self.totales['bloques_omitidos']:
+            self.stdout.write(self.style.WARNING(
+                '⚠️ Había bloques aplicados de este archivo pero ninguno coincidió: '
+                '¿cambió --chunk-size, --workers o el archivo?'))
+        return self.totales
+
+    def bloques(self, bloques):
+        for numero, df in enumerate(bloques, 1):
+            # Limpiar nombres de columnas; las que falten quedan vacías
+            df.columns = df.columns.str.strip()
+            df = df.reindex(columns=self.columnas).astype(object)
+            df['_fila'] = range(self.totales['filas'] + 2, self.totales['filas'] + 2 + len(df))  # Fila en Excel/CSV
+            self.totales['filas'] += len(df)
+            yield numero, df
+
+    def ya_aplicado(self, df):
+        """
+        Devuelve (huella, omitido): con --resume, omitido indica que el bloque ya tiene su punto de control.
+        """
+        from kardex.models import LoteImportacion
+
+        huella = LoteImportacion.calcular_huella(df, self.columnas)
+        return huella, bool(self.reanudar and LoteImportacion.aplicados(self.nombre_comando, [huella]))
+
+    def aplicar_bloque(self, numero, df):
+        huella, omitido = self.ya_aplicado(df)
+        if omitido:
+            return Counter(bloques_omitidos=1, filas_omitidas=len(df))
+        try:
+            resultado = self.aplicar(numero, df, huella)
+        except Exception as e:
+            self.rechazos.descartar()
+            raise CommandError(_mensaje_error(numero, df, e)) from e
+        self.rechazos.confirmar()
+        return resultado
+
+    def aplicar(self, numero, df, huella):
+        """
+        Procesa el bloque en una transacción junto con su punto de control y devuelve sus totales. Los
+        rechazos quedan pendientes hasta confirmar() (o tomar() en un worker).
+        """
+        from kardex.models import LoteImportacion
+
+        self.resultado = Counter()
+        with transaction.atomic():
+            self.procesar_bloque(df)
+            LoteImportacion.registrar(self.nombre_comando, huella, self.archivo, numero, len(df),
+                                      {**{k: int(v) for k, v in self.resultado.items()},
+                                       'rechazadas': self.rechazos.pendientes})
+        return self.resultado
+
+    # === --workers ===
+
+    def importar_en_paralelo(self, bloques, options):
+        from django.db import connections
+
+        workers = options['workers']
+        contexto = multiprocessing.get_context()
+        entradas = [contexto.Queue(maxsize=2) for _ in range(workers)]
+        salida = contexto.Queue()
+        # Solo opciones simples: las de call_command (p. ej. stdout) no se pueden enviar a otro proceso
+        opciones = {k: v for k, v in options.items() if isinstance(v, (str, int, float, bool, type(None)))}
+        # Cada proceso abre su propia conexión: no debe heredar la del proceso principal
+        connections.close_all()
+        procesos = [
+            contexto.Process(target=_trabajador, args=(self.__module__, opciones, self.archivo, entrada, salida),
+                             daemon=True)
+            for entrada in entradas
+        ]
+        for proceso in procesos:
+            proceso.start()
+        self.error_worker = None
+
+        pendientes = 0
+        try:
+            for numero, df in bloques:
+                if self.error_worker:
+                    break
+                particion = pd.util.hash_pandas_object(self.clave_particion(df).astype(object), index=False) % workers
+                for indice, parte in df.groupby(particion.to_numpy(), sort=False):
+                    huella, omitido = self.ya_aplicado(parte)
+                    if omitido:
+                        self.totales.update(bloques_omitidos=1, filas_omitidas=len(parte))
+                        self.pbar.update(len(parte))
+                        continue
+                    self.enviar(entradas[int(indice)], (numero, parte, huella), procesos)
+                    pendientes += 1
+                while self.recibir(salida, procesos, esperar=False):
+                    pendientes -= 1
+            for entrada in entradas:
+                self.enviar(entrada, None, procesos)
+            while pendientes:
+                self.recibir(salida, procesos, esperar=True)
+                pendientes -= 1
+        except BaseException:
+            for proceso in procesos:
+                proceso.terminate()
+            raise
+        for proceso in procesos:
+            proceso.join()
+        if self.error_worker:
+            raise CommandError(self.error_worker)
+
+    @staticmethod
+    def _verificar_procesos(procesos):
+        if any(proceso.exitcode not in (None, 0) for proceso in procesos):
+            raise CommandError('Un proceso de importación terminó inesperadamente. Los bloques completos '
+                               'quedaron guardados; vuelva a ejecutar con --resume para continuar.')
+
+    def enviar(self, entrada, tarea, procesos):
+        while True:
+            try:
+                entrada.put(tarea, timeout=1)
+                return
+            except queue.Full:
+                self._verificar_procesos(procesos)
+
+    def recibir(self, salida, procesos, esperar):
+        """
+        Suma el resultado de una parte terminada y escribe sus rechazos. Sin `esperar` devuelve False si no
+        hay ninguno listo.
+        """
+        while True:
+            try:
+                estado, filas, datos, rechazos = salida.get(timeout=1) if esperar else salida.get_nowait()
+                break
+            except queue.Empty:
+                if not esperar:
+                    return False
+                self._verificar_procesos(procesos)
+        if estado == 'ok':
+            self.totales.update(datos)
+            self.rechazos.agregar(rechazos)
+        elif self.error_worker is None:
+            self.error_worker = datos
+        self.pbar.update(filas)
+        self.pbar.set_postfix({'Bloques omitidos': self.totales['bloques_omitidos'],
+                               'Rechazadas': self.rechazos.total})
+        return True
+
+    def escribir_resumen(self, totales, lineas):
+        """
+        Resumen final: `lineas` son pares (estilo, texto) propios del comando, seguidos de los bloques
+        omitidos por --resume y los rechazos por motivo.
+        """
+        self.stdout.write(self.style.SUCCESS('\n' + '=' * 60))
+        self.stdout.write(self.style.SUCCESS('📊 RESUMEN FINAL DE IMPORTACIÓN'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(f'📊 Total de registros encontrados: {totales["filas"]:,}'))
+        for estilo, texto in lineas:
+            self.stdout.write(estilo(texto))
+        if totales['bloques_omitidos']:
+            self.stdout.write(self.style.WARNING(
+                f'⏭️ Bloques ya aplicados (omitidos): {totales["bloques_omitidos"]:,} '
+                f'({totales["filas_omitidas"]:,} filas)'))
+        self.stdout.write(self.style.WARNING(f'⚠️ Filas rechazadas: {self.rechazos.total:,}'))
+        for motivo, cantidad in self.rechazos.por_motivo.most_common():
+            self.stdout.write(self.style.WARNING(f'   - {motivo}: {cantidad:,}'))
+        if self.rechazos.total:
+            self.stdout.write(self.style.WARNING(f'📄 Detalle de filas rechazadas: {self.rechazos.ruta}'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from kardex.models import Establecimiento, ResumenDashboard
+from kardex.models.resumen_dashboard import ALCANCE_GLOBAL
+
+
+class Command(BaseCommand):
+    help = ('Recalcula las tarjetas del dashboard (ResumenDashboard) de cada establecimiento. '
+            'Programarlo periódicamente (cron) mantiene al día los datos cargados por importaciones masivas')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--establecimiento', type=int, action='append',
+                            help='ID de establecimiento a recalcular (repetible). Por defecto todos')
+
+    def handle(self, *args, **options):
+        alcances = options['establecimiento'] or [
+            ALCANCE_GLOBAL, *Establecimiento.objects.values_list('pk', flat=True)
+        ]
+        self.stdout.write('📊 Recalculando resumen del dashboard...')
+        total = len(ResumenDashboard.recalcular(alcances))
+        self.stdout.write(self.style.SUCCESS(f'✅ Resúmenes actualizados: {total:,}'))
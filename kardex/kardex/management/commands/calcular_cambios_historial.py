@@ -0,0 +1,50 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from kardex.historial import calcular_cambios, campos_auditados
+
+
+class Command(BaseCommand):
+    help = ('Completa history_cambios de los registros históricos que no lo tienen (anteriores a la columna '
+            'o escritos sin señales), comparando cada versión con la anterior del mismo objeto')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modelo', action='append',
+                            help='Modelo base a procesar (p. ej. Paciente, repetible). Por defecto todos')
+        parser.add_argument('--lote', type=int, default=2000, help='Registros por bulk_update')
+
+    def handle(self, *args, **options):
+        nombres = {m.lower() for m in options['modelo'] or []}
+        for model in apps.get_app_config('kardex').get_models():
+            history = getattr(model, 'history', None)
+            if history is None or (nombres and model.__name__.lower() not in nombres):
+                continue
+            historico = history.model
+            if not any(f.name == 'history_cambios' for f in historico._meta.concrete_fields):
+                continue
+            total = self.completar(model, historico, options['lote'])
+            self.stdout.write(self.style.SUCCESS(f'✅ {model.__name__}: {total:,} registros completados'))
+
+    def completar(self, model, historico, lote):
+        pk = model._meta.pk.attname
+        campos = [f.attname for f in campos_auditados(model)]
+        # Versiones de cada objeto en orden: se compara cada una con la inmediatamente anterior
+        filas = historico.objects.order_by(pk, 'history_date', 'history_id') \
+            .values('history_id', 'history_type', 'history_cambios', pk, *campos)
+        pendientes = []
+        total = 0
+        anterior = None
+        for fila in filas.iterator(chunk_size=lote):
+            if anterior is not None and anterior[pk] == fila[pk] and fila['history_type'] == '~' \
+                    and fila['history_cambios'] is None:
+                pendientes.append(historico(history_id=fila['history_id'],
+                                            history_cambios=calcular_cambios(model, anterior, fila)))
+                if len(pendientes) >= lote:
+                    historico.objects.bulk_update(pendientes, ['history_cambios'])
+                    total += len(pendientes)
+                    pendientes = []
+            anterior = fila
+        if pendientes:
+            historico.objects.bulk_update(pendientes, ['history_cambios'])
+            total += len(pendientes)
+        return total
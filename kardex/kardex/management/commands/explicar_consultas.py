@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.generics import GenericAPIView
+from rest_framework.request import Request
+
+from kardex.mixin import DataTableMixin
+
+
+class Command(BaseCommand):
+    help = ('Muestra el plan de ejecución (EXPLAIN) de las consultas de cada listado DataTable y de '
+            'cada endpoint "list" de la API, tal como se ejecutan para un usuario')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', help='Username con el que se construyen las consultas '
+                                              '(por defecto el primer superusuario)')
+        parser.add_argument('--buscar', default='', help='Texto de búsqueda a aplicar en los DataTables')
+        parser.add_argument('--filtro', default='', help='Solo vistas cuyo nombre contenga este texto')
+        parser.add_argument('--largo', type=int, default=100, help='Tamaño de página a explicar')
+
+    def handle(self, *args, **options):
+        usuario = self.obtener_usuario(options['usuario'])
+        filtro = options['filtro'].lower()
+        vistos = set()
+        total = 0
+
+        for ruta, callback in self.recorrer_urls(get_resolver().url_patterns):
+            vista = getattr(callback, 'view_class', None) or getattr(callback, 'cls', None)
+            # El router de DRF repite cada ruta con sufijo de formato: mismo callback
+            if vista is None or callback in vistos or filtro not in vista.__name__.lower():
+                continue
+
+            if issubclass(vista, DataTableMixin):
+                construir = self.consultas_datatable
+            elif issubclass(vista, GenericAPIView) and 'list' in (getattr(callback, 'actions', None) or {}).values():
+                construir = self.consultas_api
+            else:
+                continue
+            vistos.add(callback)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n▶ {vista.__name__}  (/{ruta})'))
+            try:
+                for titulo, qs in construir(callback, usuario, ruta, options):
+                    self.stdout.write(self.style.MIGRATE_LABEL(f'  {titulo}'))
+                    self.stdout.write(f'    SQL: {qs.query}')
+                    for linea in qs.explain().splitlines():
+                        self.stdout.write(f'    {linea}')
+                total += 1
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f'  ⚠️ No se pudo explicar: {e}'))
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Vistas analizadas: {total}'))
+
+    @staticmethod
+    def obtener_usuario(username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'No existe el usuario "{username}".')
+        usuario = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if usuario is None:
+            raise CommandError('No hay superusuarios; indique --usuario.')
+        return usuario
+
+    def recorrer_urls(self, patrones, prefijo=''):
+        for patron in patrones:
+            if isinstance(patron, URLResolver):
+                yield from self.recorrer_urls(patron.url_patterns, prefijo + str(patron.pattern))
+            elif isinstance(patron, URLPattern):
+                yield prefijo + str(patron.pattern), patron.callback
+
+    def construir_request(self, usuario, ruta, params):
+        request = RequestFactory().get('/' + ruta, params, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        request.user = usuario
+        return request
+
+    def consultas_datatable(self, callback, usuario, ruta, options):
+        # Mismos pasos que DataTableMixin.get_datatable_response, sin ejecutar las consultas
+        request = self.construir_request(usuario, ruta, {
+            'datatable': 1, 'draw': 1, 'start': 0, 'length': options['largo'],
+            'order[0][column]': 0, 'order[0][dir]': 'desc', 'search[value]': options['buscar'],
+        })
+        # Vistas genéricas (p. ej. historial) reciben el modelo en as_view()
+        vista = callback.view_class(**callback.view_initkwargs)
+        vista.setup(request)
+        if getattr(vista, 'base_model', None) is not None:
+            # Lo que hace GenericHistoryListView.dispatch(): listar el modelo histórico
+            vista.model = vista.base_model.history.model
+        base_qs = vista.get_base_queryset()
+        qs = vista.filter_queryset(base_qs, options['buscar'])
+        order_field = vista.get_ordering(request)
+        qs = vista.project_queryset(vista.order_queryset(qs, order_field), order_field)
+        return [
+            ('Conteo total', base_qs.order_by().values('pk')),
+            ('Página', qs[:options['largo']]),
+        ]
+
+    def consultas_api(self, callback, usuario, ruta, options):
+        request = Request(self.construir_request(usuario, ruta, {}))
+        request.user = usuario
+        viewset = callback.cls(**callback.initkwargs, request=request, action='list',
+                               format_kwarg=None, args=(), kwargs={})
+        qs = viewset.filter_queryset(viewset.get_queryset())
+        return [('Listado', qs[:options['largo']])]
@@ -1,21 +1,51 @@
 import pandas as pd
-from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
-from django.utils.timezone import make_aware
-from tqdm import tqdm
+from simple_history.utils import bulk_create_with_history
 
+from kardex.mixin import invalidate_datatable_counts
 from kardex.models import (
     MovimientoFicha,
     ServicioClinico,
     Ficha,
+    FichaUbicacion,
     Profesional,
     Establecimiento,
     UsuarioAnterior,
 )
+from ._importacion import ComandoImportacion, a_entero, a_fecha, claves, normalizar_ruts
 
+COLUMNAS = ['establecimiento', 'rut_anterior', 'ficha', 'fecha_envio', 'fecha_recepcion', 'usuario_envio_anterior',
+            'usuario_recepcion_anterior', 'profesional_recepcion', 'servicio_clinico_recepcion', 'observacion_envio',
+            'observacion_recepcion', 'observacion_traspaso', 'estado_recepcion']
 
-class Command(BaseCommand):
-    help = 'Importa movimientos de fichas desde un archivo CSV.'
+# RUT que en el archivo significan "sin dato" (ya normalizados)
+RUTS_VACIOS = ['', '0', 'SINRUT', 'NULL']
+
+ESTADOS_RECEPCION = {
+    'R': 'RECIBIDO',
+    'RECIBIDO': 'RECIBIDO',
+    'E': 'ENVIADO',
+    'ENVIADO': 'ENVIADO',
+    'P': 'EN ESPERA',
+    'PENDIENTE': 'EN ESPERA',
+}
+
+# Relaciones que quedan vacías si no se encuentran (se informan en el resumen)
+REFERENCIAS_OPCIONALES = ['establecimiento', 'servicio_clinico_recepcion', 'usuario_envio_anterior',
+                          'usuario_recepcion_anterior', 'profesional_recepcion']
+
+CAMPOS_MOVIMIENTO = ['fecha_recepcion', 'observacion_envio', 'observacion_recepcion', 'observacion_traspaso',
+                     'estado_envio', 'estado_recepcion', 'estado_traspaso', 'servicio_clinico_recepcion_id',
+                     'usuario_envio_anterior_id', 'usuario_recepcion_anterior_id', 'profesional_recepcion_id',
+                     'establecimiento_id', 'rut_anterior', 'rut_anterior_profesional']
+
+
+class Command(ComandoImportacion):
+    help = ('Importa movimientos de fichas desde un archivo CSV. Las relaciones se resuelven por bloque con '
+            'merges de pandas (una consulta por tabla) y los movimientos se insertan con su historial en lotes')
+    columnas = COLUMNAS
+    descripcion = 'movimientos'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -23,262 +53,175 @@ class Command(BaseCommand):
             type=str,
             help='Ruta al archivo CSV que contiene los movimientos de fichas',
         )
-        parser.add_argument(
-            '--batch-size',
-            type=int,
-            default=1000,
-            help='Tamaño del lote para procesamiento (por defecto: 1000)',
-        )
+        super().add_arguments(parser)
 
     def handle(self, *args, **options):
-        csv_path = options['csv_path']
-        batch_size = options['batch_size']
-
-        try:
-            self.stdout.write(self.style.SUCCESS(f'📖 Leyendo archivo CSV: {csv_path}'))
-            df = pd.read_csv(csv_path, sep=';', dtype=str, engine='python', on_bad_lines='skip')
-        except Exception as e:
-            self.stderr.write(self.style.ERROR(f'❌ Error al leer el archivo: {e}'))
+        totales = self.importar(options['csv_path'], options)
+        if totales is None:
             return
 
-        # Limpiar nombres de columnas
-        df.columns = df.columns.str.strip()
-        total_registros = len(df)
-
-        self.stdout.write(f'📊 Total de registros encontrados: {total_registros:,}')
-        self.stdout.write('🔄 Procesando movimientos...')
-
-        movimientos_a_crear = []
-        total_importados = 0
-        total_actualizados = 0
-        total_errores = 0
-
-        # Configurar barra de progreso
-        with tqdm(
-                total=total_registros,
-                desc='📋 Procesando movimientos',
-                unit='registro',
-                ncols=100
-        ) as pbar:
-
-            for index, row in df.iterrows():
-                try:
-                    # === Limpieza general de datos ===
-                    row = row.fillna('')
-
-                    # === Lectura de campos ===
-                    establecimiento_id = self.to_int_or_none(row.get('establecimiento'))
-                    rut_anterior = str(row.get('rut_anterior', '')).strip() or 'SIN RUT'
-                    numero_ficha_sistema = self.to_int_or_none(row.get('ficha'))  # Cambiado el nombre
-
-                    fecha_envio = self.parse_fecha(row.get('fecha_envio'))
-                    fecha_recepcion = self.parse_fecha(row.get('fecha_recepcion'))
-
-                    usuario_envio_anterior_rut = str(row.get('usuario_envio_anterior', '')).strip()
-                    usuario_recepcion_anterior_rut = str(row.get('usuario_recepcion_anterior', '')).strip()
-                    profesional_recepcion_rut = str(row.get('profesional_recepcion', '')).strip()
-                    servicio_recepcion_id = self.to_int_or_none(row.get('servicio_clinico_recepcion'))
-
-                    observacion_envio = str(row.get('observacion_envio', '')).strip()
-                    observacion_recepcion = str(row.get('observacion_recepcion', '')).strip()
-                    observacion_traspaso = str(row.get('observacion_traspaso', '')).strip()
-
-                    # === Estado ===
-                    estado_raw = str(row.get('estado_recepcion', '')).strip().upper()
-                    estado_recepcion = self.map_estado(estado_raw)
-                    estado_envio = 'ENVIADO'
-                    estado_traspaso = 'SIN TRASPASO'
-
-                    # === Relaciones - CAMBIO IMPORTANTE AQUÍ ===
-                    # Buscar la ficha por numero_ficha_sistema en lugar de id
-                    ficha_obj = Ficha.objects.filter(
-                        numero_ficha_sistema=numero_ficha_sistema).first() if numero_ficha_sistema else None
-                    if not ficha_obj:
-                        self.stdout.write(self.style.WARNING(
-                            f'⚠️ Fila {index + 2}: Ficha con número {numero_ficha_sistema} no encontrada. Se omite.'
-                        ))
-                        total_errores += 1
-                        pbar.update(1)
-                        continue
-
-                    establecimiento = self.safe_get(Establecimiento, establecimiento_id, 'establecimiento', index)
-                    servicio_recepcion = self.safe_get(ServicioClinico, servicio_recepcion_id,
-                                                       'servicio_clinico_recepcion',
-                                                       index)
-                    usuario_envio_anterior = self.safe_get_by_rut(UsuarioAnterior, usuario_envio_anterior_rut,
-                                                                  'usuario_envio_anterior', index)
-                    usuario_recepcion_anterior = self.safe_get_by_rut(UsuarioAnterior, usuario_recepcion_anterior_rut,
-                                                                      'usuario_recepcion_anterior', index)
-
-                    # === Lógica especial para profesional_recepcion ===
-                    profesional_recepcion = self.safe_get_by_rut(Profesional, profesional_recepcion_rut,
-                                                                 'profesional_recepcion', index)
-                    if not profesional_recepcion and profesional_recepcion_rut not in ('', '0', 'SIN RUT', 'NULL'):
-                        rut_anterior_profesional = profesional_recepcion_rut
-                    else:
-                        rut_anterior_profesional = 'SIN RUT'
-
-                    # === Crear movimiento ===
-                    movimiento = MovimientoFicha(
-                        ficha=ficha_obj,
-                        fecha_envio=fecha_envio,
-                        fecha_recepcion=fecha_recepcion,
-                        observacion_envio=observacion_envio,
-                        observacion_recepcion=observacion_recepcion,
-                        observacion_traspaso=observacion_traspaso,
-                        estado_envio=estado_envio,
-                        estado_recepcion=estado_recepcion,
-                        estado_traspaso=estado_traspaso,
-                        servicio_clinico_recepcion=servicio_recepcion,
-                        usuario_envio_anterior=usuario_envio_anterior,
-                        usuario_recepcion_anterior=usuario_recepcion_anterior,
-                        profesional_recepcion=profesional_recepcion,
-                        establecimiento=establecimiento,
-                        rut_anterior=rut_anterior or 'SIN RUT',
-                        rut_anterior_profesional=rut_anterior_profesional,
-                    )
-
-                    movimientos_a_crear.append(movimiento)
-
-                    # Procesar por lotes
-                    if len(movimientos_a_crear) >= batch_size:
-                        creados, actualizados = self.procesar_lote(movimientos_a_crear)
-                        total_importados += creados
-                        total_actualizados += actualizados
-                        movimientos_a_crear = []
-
-                        # Actualizar barra de progreso con estadísticas
-                        pbar.set_postfix({
-                            'Importados': total_importados,
-                            'Actualizados': total_actualizados,
-                            'Errores': total_errores
-                        })
-
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(
-                        f'❌ Error en fila {index + 2}: {str(e)}'
-                    ))
-                    total_errores += 1
-
-                pbar.update(1)
+        # bulk_create no emite post_save: invalidar a mano los conteos cacheados de las tablas
+        invalidate_datatable_counts(MovimientoFicha)
+
+        lineas = [
+            (self.style.SUCCESS, f'✅ Movimientos creados: {totales["creados"]:,}'),
+            (self.style.SUCCESS, f'🔄 Movimientos actualizados: {totales["actualizados"]:,}'),
+        ]
+        for columna in REFERENCIAS_OPCIONALES:
+            if totales[f'sin_{columna}']:
+                lineas.append((self.style.WARNING,
+                               f'⚠️ {columna} no encontrado (se deja vacío): {totales[f"sin_{columna}"]:,}'))
+        if totales['filas']:
+            procesados = totales['creados'] + totales['actualizados']
+            lineas.append((self.style.SUCCESS, f'📈 Eficiencia: {(procesados / totales["filas"] * 100):.1f}%'))
+        self.escribir_resumen(totales, lineas)
+
+    def leer(self, ruta, options):
+        return pd.read_csv(ruta, sep=';', dtype=str, engine='python', on_bad_lines='skip',
+                           chunksize=options['chunk_size'])
+
+    def preparar(self, options):
+        # Tablas chicas: se cargan una vez
+        self.establecimientos = set(Establecimiento.objects.values_list('id', flat=True))
+        self.servicios = set(ServicioClinico.objects.values_list('id', flat=True))
+
+    def clave_particion(self, df):
+        # La ficha se busca por (número, establecimiento): sus movimientos y su ubicación quedan en un proceso
+        return a_entero(df['establecimiento'])
+
+    def procesar_bloque(self, df):
+        # === Normalización ===
+        df['_est'] = a_entero(df['establecimiento'])
+        df['_numero'] = a_entero(df['ficha'])
+        df['_servicio'] = a_entero(df['servicio_clinico_recepcion'])
+
+        # === Ficha: clave compuesta (número, establecimiento) ===
+        con_clave = df[df['_numero'].notna() & df['_est'].notna()]
+        fichas = claves(Ficha.objects.filter(establecimiento_id__in=con_clave['_est'].unique().tolist()),
+                        ['id', 'numero_ficha_sistema', 'establecimiento_id'], 'numero_ficha_sistema',
+                        con_clave['_numero'].astype('int64'))
+        fichas = fichas.rename(columns={'id': '_ficha_id', 'numero_ficha_sistema': '_numero',
+                                        'establecimiento_id': '_est'}).astype('Int64') \
+            .drop_duplicates(['_numero', '_est'])
+        df = df.merge(fichas, on=['_numero', '_est'], how='left')
+        df = self.rechazos.rechazar(df, df['_ficha_id'].isna(), 'Ficha no encontrada en el establecimiento')
+        if df.empty:
+            return
 
-            # Procesar último lote
-            if movimientos_a_crear:
-                creados, actualizados = self.procesar_lote(movimientos_a_crear)
-                total_importados += creados
-                total_actualizados += actualizados
+        # === Relaciones opcionales: sin coincidencia quedan vacías ===
+        df['_establecimiento_id'] = self.referencia(df, '_est', self.establecimientos, 'establecimiento')
+        df['_servicio_id'] = self.referencia(df, '_servicio', self.servicios, 'servicio_clinico_recepcion')
+        for columna, model in (('usuario_envio_anterior', UsuarioAnterior),
+                               ('usuario_recepcion_anterior', UsuarioAnterior),
+                               ('profesional_recepcion', Profesional)):
+            df[f'_{columna}_rut'] = normalizar_ruts(df[columna])
+            df = self.referencia_por_rut(df, model, columna)
+
+        # Profesional no encontrado: se conserva el RUT del archivo
+        rut_profesional = df['profesional_recepcion'].fillna('').str.strip()
+        df['_rut_anterior_profesional'] = rut_profesional.where(
+            df['_profesional_recepcion_id'].isna() & ~df['_profesional_recepcion_rut'].isin(RUTS_VACIOS), 'SIN RUT')
+        df['_rut_anterior'] = df['rut_anterior'].fillna('').str.strip().replace('', 'SIN RUT')
+
+        # === Fechas, estado y textos ===
+        ahora = timezone.now()
+        for columna in ('fecha_envio', 'fecha_recepcion'):
+            df[f'_{columna}'] = a_fecha(df[columna]).fillna(ahora)
+        df['_estado_recepcion'] = df['estado_recepcion'].fillna('').str.strip().str.upper() \
+            .map(ESTADOS_RECEPCION).fillna('EN ESPERA')
+        for columna in ('observacion_envio', 'observacion_recepcion', 'observacion_traspaso'):
+            df[f'_{columna}'] = df[columna].fillna('').str.strip()
+
+        for inicio in range(0, len(df), self.batch_size):
+            creados, actualizados = self.procesar_lote(df.iloc[inicio:inicio + self.batch_size])
+            self.resultado['creados'] += creados
+            self.resultado['actualizados'] += actualizados
+
+    def referencia(self, df, columna, existentes, nombre):
+        """
+        Id de la columna si existe en la base de datos; vacío (None) si no viene o no se encuentra.
+        """
+        encontrado = df[columna].isin(existentes)
+        self.resultado[f'sin_{nombre}'] += int((df[columna].notna() & ~encontrado).sum())
+        return df[columna].astype(object).where(encontrado, None)
+
+    def referencia_por_rut(self, df, model, columna):
+        """
+        Agrega `_<columna>_id` (la clave primaria: en UsuarioAnterior es el RUT tal como se guardó) resolviendo
+        el RUT contra `model.rut_normalizado` con una consulta por bloque.
+        """
+        rut = f'_{columna}_rut'
+        con_rut = df.loc[~df[rut].isin(RUTS_VACIOS), rut]
+        encontrados = claves(model.objects.order_by('pk'), ['pk', 'rut_normalizado'], 'rut_normalizado', con_rut)
+        encontrados = encontrados.drop_duplicates('rut_normalizado') \
+            .rename(columns={'pk': f'_{columna}_id', 'rut_normalizado': rut})
+        df = df.merge(encontrados, on=rut, how='left')
+        self.resultado[f'sin_{columna}'] += int((~df[rut].isin(RUTS_VACIOS) & df[f'_{columna}_id'].isna()).sum())
+        return df
+
+    def procesar_lote(self, lote):
+        """Inserta el lote con bulk_create y su historial; si falla, de a uno con update_or_create"""
+        movimientos = [self.crear_movimiento(fila) for fila in lote.to_dict('records')]
 
-        # Mostrar resumen final
-        self.stdout.write(self.style.SUCCESS('\n' + '=' * 50))
-        self.stdout.write(self.style.SUCCESS('📊 RESUMEN FINAL DE IMPORTACIÓN'))
-        self.stdout.write(self.style.SUCCESS('=' * 50))
-        self.stdout.write(self.style.SUCCESS(f'✅ Movimientos creados: {total_importados:,}'))
-        self.stdout.write(self.style.SUCCESS(f'🔄 Movimientos actualizados: {total_actualizados:,}'))
-        self.stdout.write(self.style.SUCCESS(f'❌ Errores: {total_errores:,}'))
-        self.stdout.write(self.style.SUCCESS(
-            f'📈 Eficiencia: {((total_importados + total_actualizados) / total_registros * 100):.1f}%'))
+        try:
+            with transaction.atomic():
+                creados = bulk_create_with_history(movimientos, MovimientoFicha, batch_size=self.batch_size)
+                # bulk_create no pasa por save(): actualizar la ubicación actual de las fichas
+                FichaUbicacion.registrar_lote(creados)
+            return len(creados), 0
+        except Exception:
+            pass
 
-    def procesar_lote(self, movimientos):
-        """Procesa un lote de movimientos usando bulk_create con manejo de duplicados"""
+        # Crear uno por uno para aislar las filas con error; un movimiento igual (ficha + fecha de envío) se
+        # actualiza
         creados = 0
         actualizados = 0
-
-        try:
-            # Intentar crear en lote
-            MovimientoFicha.objects.bulk_create(movimientos, ignore_conflicts=False)
-            creados = len(movimientos)
-            self.stdout.write(self.style.SUCCESS(f'✅ Lote creado: {len(movimientos)} movimientos'))
-
-        except Exception as e:
-            self.stdout.write(self.style.WARNING(f'⚠️ Error en bulk_create: {e}'))
-            self.stdout.write('🔍 Intentando crear una por una para identificar el problema...')
-
-            # Crear uno por uno para identificar errores específicos
-            for movimiento in movimientos:
-                try:
+        errores = {}
+        for indice, movimiento in zip(lote.index, movimientos):
+            try:
+                with transaction.atomic():
                     obj, created = MovimientoFicha.objects.update_or_create(
-                        ficha=movimiento.ficha,
+                        ficha_id=movimiento.ficha_id,
                         fecha_envio=movimiento.fecha_envio,
-                        defaults={
-                            'fecha_recepcion': movimiento.fecha_recepcion,
-                            'observacion_envio': movimiento.observacion_envio,
-                            'observacion_recepcion': movimiento.observacion_recepcion,
-                            'observacion_traspaso': movimiento.observacion_traspaso,
-                            'estado_envio': movimiento.estado_envio,
-                            'estado_recepcion': movimiento.estado_recepcion,
-                            'estado_traspaso': movimiento.estado_traspaso,
-                            'servicio_clinico_recepcion': movimiento.servicio_clinico_recepcion,
-                            'usuario_envio_anterior': movimiento.usuario_envio_anterior,
-                            'usuario_recepcion_anterior': movimiento.usuario_recepcion_anterior,
-                            'profesional_recepcion': movimiento.profesional_recepcion,
-                            'establecimiento': movimiento.establecimiento,
-                            'rut_anterior': movimiento.rut_anterior,
-                            'rut_anterior_profesional': movimiento.rut_anterior_profesional,
-                        }
+                        defaults={campo: getattr(movimiento, campo) for campo in CAMPOS_MOVIMIENTO}
                     )
-                    if created:
-                        creados += 1
-                    else:
-                        actualizados += 1
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(
-                        f'❌ Error creando movimiento para ficha #{movimiento.ficha.id} (sistema: {movimiento.ficha.numero_ficha_sistema}): {e}'
-                    ))
-
+                if created:
+                    creados += 1
+                else:
+                    actualizados += 1
+            except Exception as e:
+                errores.setdefault(f'Error al guardar: {e}', []).append(indice)
+        for motivo, indices in errores.items():
+            self.rechazos.rechazar(lote, lote.index.isin(indices), motivo)
         return creados, actualizados
 
-    # === Utilidades (mantener las mismas) ===
-
-    def safe_get(self, model, pk, nombre, index):
-        """Obtiene instancia por PK si existe."""
-        if not pk:
-            return None
-        obj = model.objects.filter(id=pk).first()
-        if not obj:
-            self.stdout.write(self.style.WARNING(f'⚠️ Fila {index + 2}: {nombre} ID {pk} no encontrado.'))
-        return obj
-
-    def safe_get_by_rut(self, model, rut, nombre, index):
-        """Obtiene instancia por campo RUT si aplica."""
-        if not rut or rut.strip() in ('', '0', 'SIN RUT', 'NULL'):
-            return None
-        obj = model.objects.filter(rut=rut.strip()).first()
-        if not obj:
-            self.stdout.write(self.style.WARNING(f'⚠️ Fila {index + 2}: {nombre} con RUT {rut} no encontrado. {model}'))
-        return obj
-
-    def parse_fecha(self, value):
-        """Convierte fechas del CSV a datetime aware (con zona horaria)."""
-        if pd.isna(value) or value == '' or str(value).upper() == 'NULL':
-            return timezone.now()
-        try:
-            if isinstance(value, pd.Timestamp):
-                dt = value.to_pydatetime()
-            else:
-                dt = pd.to_datetime(value)
-            if timezone.is_naive(dt):
-                dt = make_aware(dt, timezone.get_current_timezone())
-            return dt
-        except Exception:
-            return timezone.now()
-
-    def to_int_or_none(self, value):
-        try:
-            if pd.isna(value) or str(value).strip() in ('', 'NULL'):
-                return None
-            return int(value)
-        except Exception:
-            return None
+    def crear_movimiento(self, fila):
+        movimiento = MovimientoFicha(
+            ficha_id=int(fila['_ficha_id']),
+            fecha_envio=fila['_fecha_envio'],
+            fecha_recepcion=fila['_fecha_recepcion'],
+            observacion_envio=fila['_observacion_envio'],
+            observacion_recepcion=fila['_observacion_recepcion'],
+            observacion_traspaso=fila['_observacion_traspaso'],
+            estado_envio='ENVIADO',
+            estado_recepcion=fila['_estado_recepcion'],
+            estado_traspaso='SIN TRASPASO',
+            servicio_clinico_recepcion_id=self.a_id(fila['_servicio_id']),
+            usuario_envio_anterior_id=self.a_clave(fila['_usuario_envio_anterior_id']),
+            usuario_recepcion_anterior_id=self.a_clave(fila['_usuario_recepcion_anterior_id']),
+            profesional_recepcion_id=self.a_id(fila['_profesional_recepcion_id']),
+            establecimiento_id=self.a_id(fila['_establecimiento_id']),
+            rut_anterior=fila['_rut_anterior'],
+            rut_anterior_profesional=fila['_rut_anterior_profesional'],
+        )
+        movimiento.aplicar_valores_creacion()
+        return movimiento
 
-    def map_estado(self, estado):
-        """Mapea las letras o abreviaciones del CSV a tus choices con debug."""
-        estado_str = str(estado).upper().strip()
+    @staticmethod
+    def a_id(valor):
+        return None if valor is None or pd.isna(valor) else int(valor)
 
-        if estado_str in ['R', 'RECIBIDO']:
-            return 'RECIBIDO'
-        elif estado_str in ['E', 'ENVIADO']:
-            return 'ENVIADO'
-        elif estado_str in ['P', 'PENDIENTE']:
-            return 'EN ESPERA'
-        else:
-            return 'EN ESPERA'
+    @staticmethod
+    def a_clave(valor):
+        # Claves que no son enteras (RUT de UsuarioAnterior): se asignan tal cual
+        return None if valor is None or pd.isna(valor) else valor
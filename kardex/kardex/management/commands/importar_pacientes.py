@@ -1,17 +1,46 @@
 import re
 
 import pandas as pd
-from django.core.management.base import BaseCommand
+from django.db import transaction
 from tqdm import tqdm
 
-from kardex.models import Paciente, Comuna, Prevision, UsuarioAnterior
-
-
-class Command(BaseCommand):
-    help = 'Importa pacientes desde una hoja "pacientes" en un archivo Excel.'
+from config.validations import normalize_rut
+from kardex.busqueda import indexar_pacientes
+from kardex.historial import crear_historial_actualizacion
+from kardex.mixin import invalidate_datatable_counts
+from kardex.models import Paciente, Comuna, Prevision, UsuarioAnterior, ResumenDashboard
+from ._importacion import (
+    ComandoImportacion, a_booleano, a_entero, a_fecha_sin_hora, a_ids, claves, leer_bloques, normalizar_ruts,
+)
+
+COLUMNAS = ['rut', 'nombre', 'apellido_paterno', 'apellido_materno', 'fecha_nacimiento', 'sexo', 'estado_civil',
+            'direccion', 'numero_telefono1', 'numero_telefono2', 'comuna_id', 'prevision_id', 'genero',
+            'usuario_anterior_id', 'rut_madre', 'nombre_social', 'pasaporte', 'nombres_padre', 'nombres_madre',
+            'nombre_pareja', 'representante_legal', 'ocupacion', 'rut_responsable_temporal', 'sin_telefono',
+            'recien_nacido', 'extranjero', 'fallecido', 'usar_rut_madre_como_responsable', 'fecha_fallecimiento']
+
+# Campos de Paciente que escribe la importación (modo --bulk); rut_normalizado se recalcula desde rut
+CAMPOS_PACIENTE = ['rut', 'rut_normalizado', 'nombre', 'apellido_paterno', 'apellido_materno', 'fecha_nacimiento',
+                   'sexo', 'estado_civil', 'direccion', 'numero_telefono1', 'numero_telefono2', 'comuna_id',
+                   'prevision_id', 'genero', 'nombre_social', 'pasaporte', 'nombres_padre', 'nombres_madre',
+                   'nombre_pareja', 'representante_legal', 'ocupacion', 'rut_madre', 'rut_responsable_temporal',
+                   'sin_telefono', 'recien_nacido', 'extranjero', 'fallecido', 'usuario_anterior_id',
+                   'fecha_fallecimiento', 'usar_rut_madre_como_responsable']
+
+
+class Command(ComandoImportacion):
+    help = ('Importa pacientes desde una hoja "pacientes" en un archivo Excel. Con --bulk lee el archivo por '
+            'bloques (también CSV separado por ";" o Parquet) y crea/actualiza con bulk_create/bulk_update; '
+            'las opciones de bloques, rechazos y --resume aplican a ese modo.')
+    columnas = COLUMNAS
+    descripcion = 'pacientes'
+    tamano_bloque = 50000
 
     def add_arguments(self, parser):
         parser.add_argument('excel_path', type=str, help='Ruta del archivo Excel que contiene la hoja "pacientes".')
+        parser.add_argument('--bulk', action='store_true',
+                            help='Upsert masivo por bloques en lugar de update_or_create por fila')
+        super().add_arguments(parser)
 
     def limpiar_rut(self, valor):
         """
@@ -78,6 +107,9 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         excel_path = options['excel_path']
+        if options['bulk']:
+            self.importar_masivo(excel_path, options)
+            return
 
         try:
             # Leer el archivo Excel
@@ -140,7 +172,8 @@ class Command(BaseCommand):
                     usuario_anterior_rut = self.limpiar_rut(usuario_anterior_rut_raw)
                     usuario_anterior = None
                     if usuario_anterior_rut:
-                        usuario_anterior = UsuarioAnterior.objects.filter(rut=usuario_anterior_rut).first()
+                        usuario_anterior = UsuarioAnterior.objects.filter(
+                            rut_normalizado=normalize_rut(usuario_anterior_rut)).first()
                         if not usuario_anterior:
                             self.stdout.write(self.style.WARNING(
                                 f"⚠️ UsuarioAnterior con RUT '{usuario_anterior_rut}' no encontrado (Fila {index + 2})"
@@ -211,6 +244,7 @@ class Command(BaseCommand):
 
                     # Preparar datos para el paciente
                     datos_paciente = {
+                        'rut': rut,
                         'nombre': nombre,
                         'apellido_paterno': apellido_paterno,
                         'apellido_materno': apellido_materno,
@@ -242,8 +276,9 @@ class Command(BaseCommand):
                     }
 
                     # Crear o actualizar el paciente
+                    # Buscar por RUT canónico (columna indexada), independiente del formato del archivo
                     paciente, created = Paciente.objects.update_or_create(
-                        rut=rut,
+                        rut_normalizado=normalize_rut(rut),
                         defaults=datos_paciente
                     )
 
@@ -275,3 +310,226 @@ class Command(BaseCommand):
         self.stdout.write(self.style.ERROR(f'❌ Errores: {total_errores:,}'))
         self.stdout.write(self.style.SUCCESS(f'📈 Total procesados: {total_creados + total_actualizados:,}'))
         self.stdout.write(self.style.SUCCESS('=' * 60))
+
+    # === Modo --bulk ===
+
+    def importar_masivo(self, ruta, options):
+        totales = self.importar(ruta, options)
+        if totales is None:
+            return
+
+        # bulk_create/bulk_update no emiten post_save: invalidar a mano los conteos cacheados de las tablas
+        invalidate_datatable_counts(Paciente)
+
+        lineas = [
+            (self.style.SUCCESS, f'✅ Pacientes creados: {totales["creados"]:,}'),
+            (self.style.SUCCESS, f'🔄 Pacientes actualizados: {totales["actualizados"]:,}'),
+            (self.style.SUCCESS, f'➖ Pacientes sin cambios: {totales["sin_cambios"]:,}'),
+            (self.style.WARNING, f'👶 Recién nacidos omitidos: {totales["recien_nacidos"]:,}'),
+        ]
+        if totales['usuario_anterior']:
+            lineas.append((self.style.WARNING,
+                           f'⚠️ UsuarioAnterior no encontrado (se deja vacío): {totales["usuario_anterior"]:,}'))
+        self.escribir_resumen(totales, lineas)
+
+    def leer(self, ruta, options):
+        return leer_bloques(ruta, options['chunk_size'], hoja='pacientes')
+
+    def preparar(self, options):
+        # Catálogos chicos: se cargan una vez
+        self.comunas = set(Comuna.objects.values_list('id', flat=True))
+        self.previsiones = set(Prevision.objects.values_list('id', flat=True))
+        # Códigos reservados para el bloque con --workers (ver reservar())
+        self.codigos = None
+
+    def clave_particion(self, df):
+        # Un mismo RUT siempre en el mismo proceso: no se crean dos pacientes en paralelo para él
+        return normalizar_ruts(self.limpiar_ruts(df['rut']))
+
+    def reservar(self, df):
+        """
+        Con --workers: reserva los códigos de los pacientes nuevos del bloque fuera de su transacción, así los
+        procesos no se esperan en la secuencia. Los códigos de filas que después se rechazan quedan sin usar.
+        """
+        ruts = self.limpiar_ruts(df['rut'])
+        ruts = normalizar_ruts(ruts[~self.ruts_recien_nacido(ruts)])
+        ruts = set(ruts[ruts != ''])
+        existentes = claves(Paciente.objects.all(), ['rut_normalizado'], 'rut_normalizado', ruts)
+        nuevos = len(ruts - set(existentes['rut_normalizado']))
+        self.codigos = iter(Paciente.reservar_codigos(nuevos) if nuevos else [])
+
+    def procesar_bloque(self, df):
+        rechazar = self.rechazos.rechazar
+
+        # === Limpieza (las mismas reglas que limpiar_rut/limpiar_texto/limpiar_telefono, por columna) ===
+        for columna in ('rut', 'usuario_anterior_id', 'rut_madre', 'rut_responsable_temporal'):
+            df[f'_{columna}'] = self.limpiar_ruts(df[columna])
+        recien_nacidos = self.ruts_recien_nacido(df['_rut'])
+        self.resultado['recien_nacidos'] += int(recien_nacidos.sum())
+        df = df[~recien_nacidos]
+
+        for columna in ('nombre', 'apellido_paterno', 'apellido_materno', 'nombre_social', 'nombres_padre',
+                        'nombres_madre', 'nombre_pareja', 'representante_legal', 'ocupacion'):
+            df[f'_{columna}'] = self.limpiar_textos(df[columna])
+        for columna in ('direccion', 'sexo', 'estado_civil', 'pasaporte'):
+            df[f'_{columna}'] = df[columna].fillna('').str.strip().str.upper()
+        df['_genero'] = df['genero'].str.strip().str.upper().fillna('NO INFORMADO')
+        for columna in ('numero_telefono1', 'numero_telefono2'):
+            df[f'_{columna}'] = df[columna].fillna('').str.replace(r'[^\d]', '', regex=True)
+        for columna in ('sin_telefono', 'recien_nacido', 'extranjero', 'fallecido',
+                        'usar_rut_madre_como_responsable'):
+            df[f'_{columna}'] = a_booleano(df[columna])
+        for columna in ('fecha_nacimiento', 'fecha_fallecimiento'):
+            df[f'_{columna}'] = a_fecha_sin_hora(df[columna])
+        df['_comuna_id'] = a_entero(df['comuna_id'])
+        df['_prevision_id'] = a_entero(df['prevision_id'])
+
+        # === Validaciones ===
+        obligatorios = df[['_rut', '_nombre', '_sexo', '_estado_civil']].ne('').all(axis=1) \
+            & df['comuna_id'].fillna('').str.strip().ne('')
+        df = rechazar(df, ~obligatorios, 'Faltan datos obligatorios')
+        df = rechazar(df, ~df['_comuna_id'].isin(self.comunas), 'Comuna no encontrada')
+        # Previsión desconocida queda vacía, como antes
+        df['_prevision_id'] = df['_prevision_id'].where(df['_prevision_id'].isin(self.previsiones))
+
+        # Un paciente por RUT: si el bloque lo repite, gana la última fila (como update_or_create). Entre
+        # bloques no hace falta: el paciente creado en uno se actualiza en el siguiente.
+        df['_rut_normalizado'] = normalizar_ruts(df['_rut'])
+        df = rechazar(df, df.duplicated('_rut_normalizado', keep='last'),
+                      'RUT repetido en el archivo (se usa la última fila)')
+
+        # === Relaciones por RUT: una consulta por bloque ===
+        # La clave primaria de UsuarioAnterior es su RUT tal como se guardó (texto)
+        usuarios = claves(UsuarioAnterior.objects.order_by('pk'), ['pk', 'rut_normalizado'], 'rut_normalizado',
+                          normalizar_ruts(df.loc[df['_usuario_anterior_id'] != '', '_usuario_anterior_id']))
+        usuarios = usuarios.drop_duplicates('rut_normalizado') \
+            .rename(columns={'pk': '_usuario_id', 'rut_normalizado': '_usuario_rut'})
+        df['_usuario_rut'] = normalizar_ruts(df['_usuario_anterior_id'])
+        df = df.merge(usuarios, on='_usuario_rut', how='left')
+        self.resultado['usuario_anterior'] += int(((df['_usuario_rut'] != '') & df['_usuario_id'].isna()).sum())
+
+        # === Insertar o actualizar: pacientes existentes por rut_normalizado ===
+        existentes = claves(Paciente.objects.all(), ['id', 'rut_normalizado'], 'rut_normalizado',
+                            df['_rut_normalizado'])
+        existentes = existentes.rename(columns={'id': '_paciente_id', 'rut_normalizado': '_rut_normalizado'})
+        varios = existentes['_rut_normalizado'].duplicated(keep=False)
+        df = rechazar(df, df['_rut_normalizado'].isin(existentes.loc[varios, '_rut_normalizado']),
+                      'RUT con más de un paciente en la base de datos')
+        df = df.merge(existentes[~varios], on='_rut_normalizado', how='left')
+
+        datos = self.datos_paciente(df)
+        for inicio in range(0, len(df), self.batch_size):
+            lote = df.iloc[inicio:inicio + self.batch_size]
+            registros = datos.iloc[inicio:inicio + self.batch_size].to_dict('records')
+            nuevo = lote['_paciente_id'].isna().to_numpy()
+            self.crear_lote(lote[nuevo], [r for r, n in zip(registros, nuevo) if n])
+            self.actualizar_lote(lote[~nuevo], [r for r, n in zip(registros, nuevo) if not n])
+
+    def datos_paciente(self, df):
+        """
+        Columnas limpias con los nombres de los campos de Paciente (vacíos como None).
+        """
+        def opcional(serie):
+            return serie.where(serie != '', None)
+
+        datos = pd.DataFrame(index=df.index)
+        for campo in ('rut', 'nombre', 'apellido_paterno', 'apellido_materno', 'sexo', 'estado_civil', 'direccion',
+                      'genero', 'sin_telefono', 'recien_nacido', 'extranjero', 'fallecido',
+                      'usar_rut_madre_como_responsable', 'fecha_nacimiento', 'fecha_fallecimiento'):
+            datos[campo] = df[f'_{campo}']
+        for campo in ('numero_telefono1', 'numero_telefono2', 'nombre_social', 'pasaporte', 'nombres_padre',
+                      'nombres_madre', 'nombre_pareja', 'representante_legal', 'ocupacion', 'rut_madre',
+                      'rut_responsable_temporal'):
+            datos[campo] = opcional(df[f'_{campo}'])
+        datos['comuna_id'] = a_ids(df['_comuna_id'])
+        datos['prevision_id'] = a_ids(df['_prevision_id'])
+        datos['usuario_anterior_id'] = df['_usuario_id'].astype(object).where(df['_usuario_id'].notna(), None)
+        return datos
+
+    def crear_lote(self, lote, registros):
+        if not registros:
+            return
+        pacientes = [Paciente(**registro) for registro in registros]
+        for paciente in pacientes:
+            paciente.normalizar_campos()
+        try:
+            with transaction.atomic():
+                # Códigos de la secuencia con una sola reserva; también identifican las filas insertadas
+                if self.codigos is not None:
+                    for paciente in pacientes:
+                        paciente.codigo = next(self.codigos, None)
+                Paciente.asignar_codigos(pacientes)
+                Paciente.objects.bulk_create(pacientes, batch_size=self.batch_size)
+                if any(p.pk is None for p in pacientes):
+                    # MySQL no devuelve los id del INSERT masivo
+                    ids = dict(Paciente.objects.filter(codigo__in=[p.codigo for p in pacientes])
+                               .values_list('codigo', 'id'))
+                    for paciente in pacientes:
+                        paciente.pk = ids[paciente.codigo]
+                Paciente.history.bulk_history_create(pacientes, batch_size=self.batch_size)
+                indexar_pacientes(pacientes)
+                ResumenDashboard.sumar(total_pacientes=len(pacientes))
+            self.resultado['creados'] += len(pacientes)
+        except Exception:
+            # El lote falló: guardar de a uno (save() con su historial y señales) para aislar las filas con error
+            self.guardar_de_a_uno(lote, [Paciente(**registro) for registro in registros], 'creados')
+
+    def actualizar_lote(self, lote, registros):
+        if not registros:
+            return
+        ids = [int(i) for i in lote['_paciente_id']]
+        actuales = Paciente.objects.in_bulk(ids)
+        pacientes, indices, anteriores = [], [], []
+        for indice, paciente_id, registro in zip(lote.index, ids, registros):
+            paciente = actuales.get(paciente_id)
+            if paciente is None:
+                continue
+            antes = {campo: getattr(paciente, campo) for campo in CAMPOS_PACIENTE}
+            for campo, valor in registro.items():
+                setattr(paciente, campo, valor)
+            paciente.normalizar_campos()
+            if antes == {campo: getattr(paciente, campo) for campo in CAMPOS_PACIENTE}:
+                self.resultado['sin_cambios'] += 1
+                continue
+            pacientes.append(paciente)
+            indices.append(indice)
+            anteriores.append(antes)
+        if not pacientes:
+            return
+        try:
+            with transaction.atomic():
+                Paciente.objects.bulk_update(pacientes, CAMPOS_PACIENTE, batch_size=self.batch_size)
+                # Con los valores anteriores ya leídos: el historial guarda sus cambios (history_cambios)
+                crear_historial_actualizacion(Paciente, pacientes, anteriores, batch_size=self.batch_size)
+                indexar_pacientes(pacientes)
+            self.resultado['actualizados'] += len(pacientes)
+        except Exception:
+            self.guardar_de_a_uno(lote.loc[indices], pacientes, 'actualizados')
+
+    def guardar_de_a_uno(self, lote, pacientes, total):
+        errores = {}
+        for indice, paciente in zip(lote.index, pacientes):
+            try:
+                with transaction.atomic():
+                    if paciente.pk is None:
+                        paciente.save()
+                    else:
+                        paciente.save(update_fields=CAMPOS_PACIENTE)
+                self.resultado[total] += 1
+            except Exception as e:
+                errores.setdefault(f'Error al guardar: {e}', []).append(indice)
+        for motivo, indices in errores.items():
+            self.rechazos.rechazar(lote, lote.index.isin(indices), motivo)
+
+    # Versiones por columna de las funciones de limpieza de arriba
+
+    def limpiar_ruts(self, serie):
+        return serie.fillna('').str.strip().str.replace(r'[\s\u200b]', '', regex=True)
+
+    def ruts_recien_nacido(self, serie):
+        cuerpo = serie.str.split('-').str[0].str.replace(r'[^\d]', '', regex=True)
+        return pd.to_numeric(cuerpo, errors='coerce').ge(90000000).fillna(False).astype(bool)
+
+    def limpiar_textos(self, serie):
+        texto = serie.fillna('').str.strip().str.replace(r'[^a-zA-ZáéíóúÁÉÍÓÚñÑ\s]', '', regex=True)
+        return texto.str.replace(r'\s+', ' ', regex=True).str.upper()
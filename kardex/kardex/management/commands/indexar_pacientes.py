@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from kardex.busqueda import TAMANO_LOTE, reindexar_todos
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de pacientes (PacienteBusqueda)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Pacientes por lote')
+        parser.add_argument('--desde-id', type=int, default=0, help='Reanudar desde este id de paciente')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔎 Indexando pacientes...')
+        pacientes, terminos = reindexar_todos(tamano_lote=options['lote'], desde_id=options['desde_id'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Índice actualizado: {pacientes} pacientes, {terminos} términos.'
+        ))
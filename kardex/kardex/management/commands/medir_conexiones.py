@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = ('Compara la latencia por request con y sin reutilización de conexiones (CONN_MAX_AGE), '
+            'simulando el ciclo request_started / request_finished de Django')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests simulados por modo')
+        parser.add_argument('--consulta', default='SELECT 1', help='SQL que ejecuta cada request')
+        parser.add_argument('--database', default='default', help='Alias de la base de datos')
+        parser.add_argument('--max-age', type=int, default=None,
+                            help='CONN_MAX_AGE del modo con reutilización (por defecto el configurado, o 60)')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests debe ser mayor que 0.')
+        conexion = connections[options['database']]
+        configurado = conexion.settings_dict.get('CONN_MAX_AGE', 0)
+        max_age = options['max_age'] if options['max_age'] is not None else (configurado or 60)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'▶ {conexion.vendor} ({options["database"]}), {options["requests"]} requests por modo'))
+        try:
+            for titulo, valor in (('Sin reutilización (CONN_MAX_AGE=0)', 0),
+                                  (f'Con reutilización (CONN_MAX_AGE={max_age})', max_age)):
+                tiempos, abiertas = self.medir(conexion, valor, options)
+                self.informar(titulo, tiempos, abiertas)
+        finally:
+            conexion.settings_dict['CONN_MAX_AGE'] = configurado
+            conexion.close()
+
+    def medir(self, conexion, max_age, options):
+        conexion.close()
+        conexion.settings_dict['CONN_MAX_AGE'] = max_age
+        abiertas = []
+
+        def contar(sender, connection, **kwargs):
+            if connection.alias == conexion.alias:
+                abiertas.append(1)
+
+        connection_created.connect(contar)
+        tiempos = []
+        try:
+            for _ in range(options['requests']):
+                inicio = time.perf_counter()
+                # Lo mismo que hace el handler: close_old_connections al inicio y al final del request
+                request_started.send(sender=BaseHandler)
+                with conexion.cursor() as cursor:
+                    cursor.execute(options['consulta'])
+                    cursor.fetchall()
+                request_finished.send(sender=BaseHandler)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            connection_created.disconnect(contar)
+        return tiempos, len(abiertas)
+
+    def informar(self, titulo, tiempos, abiertas):
+        ordenados = sorted(tiempos)
+        p95 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))]
+        self.stdout.write(self.style.MIGRATE_LABEL(f'  {titulo}'))
+        self.stdout.write(f'    conexiones abiertas: {abiertas}')
+        self.stdout.write(f'    media: {statistics.mean(tiempos):.2f} ms   mediana: {statistics.median(tiempos):.2f} ms'
+                          f'   p95: {p95:.2f} ms   total: {sum(tiempos):.0f} ms')
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from config.validations import normalize_rut
+from kardex.models import Paciente, Profesional, UsuarioAnterior
+
+MODELOS = {
+    'paciente': Paciente,
+    'profesional': Profesional,
+    'usuario_anterior': UsuarioAnterior,
+}
+
+
+class Command(BaseCommand):
+    help = 'Completa la columna rut_normalizado de pacientes, profesionales y usuarios anteriores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modelo', choices=list(MODELOS), help='Procesar solo este modelo')
+        parser.add_argument('--lote', type=int, default=5000, help='Registros por lote')
+        parser.add_argument('--todos', action='store_true',
+                            help='Recalcular también los registros que ya tienen rut_normalizado')
+
+    def handle(self, *args, **options):
+        modelos = [MODELOS[options['modelo']]] if options['modelo'] else list(MODELOS.values())
+        for model in modelos:
+            total = self.normalizar(model, options['lote'], options['todos'])
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {model._meta.verbose_name_plural}: {total:,} RUT normalizados.'
+            ))
+
+    def normalizar(self, model, lote, todos):
+        qs = model.objects.all() if todos else model.objects.filter(rut_normalizado__isnull=True)
+        qs = qs.exclude(rut__isnull=True).exclude(rut='')
+        total = 0
+        ultimo_pk = None
+        # Recorrido por rangos de clave primaria (sin OFFSET) y bulk_update sin pasar por save()/historial
+        with tqdm(total=qs.count(), desc=f'🔄 {model._meta.verbose_name_plural}', unit='registro') as pbar:
+            while True:
+                pagina = qs.order_by('pk')
+                if ultimo_pk is not None:
+                    pagina = pagina.filter(pk__gt=ultimo_pk)
+                registros = list(pagina.only('pk', 'rut')[:lote])
+                if not registros:
+                    break
+                for obj in registros:
+                    obj.rut_normalizado = normalize_rut(obj.rut) or None
+                model.objects.bulk_update(registros, ['rut_normalizado'])
+                total += len(registros)
+                ultimo_pk = registros[-1].pk
+                pbar.update(len(registros))
+        return total
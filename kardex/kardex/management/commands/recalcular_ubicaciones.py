@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from kardex.models import FichaUbicacion
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la ubicación actual de cada ficha (FichaUbicacion) desde sus movimientos'
+
+    def handle(self, *args, **options):
+        self.stdout.write('📍 Recalculando ubicaciones de fichas...')
+        total = FichaUbicacion.recalcular()
+        self.stdout.write(self.style.SUCCESS(f'✅ Ubicaciones registradas: {total:,}'))
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kardex', '0026_vistafichapaciente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PacienteBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=100, verbose_name='Término')),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                               related_name='terminos_busqueda', to='kardex.paciente',
+                                               verbose_name='Paciente')),
+            ],
+            options={
+                'verbose_name': 'Término de búsqueda de paciente',
+                'verbose_name_plural': 'Términos de búsqueda de pacientes',
+                'indexes': [models.Index(fields=['termino', 'paciente'], name='paciente_busqueda_termino_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kardex', '0027_pacientebusqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalpaciente',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, null=True,
+                                   verbose_name='R.U.T. normalizado'),
+        ),
+        migrations.AddField(
+            model_name='historicalprofesional',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, null=True,
+                                   verbose_name='R.U.T. normalizado'),
+        ),
+        migrations.AddField(
+            model_name='historicalusuarioanterior',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, null=True,
+                                   verbose_name='R.U.T. normalizado'),
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, null=True,
+                                   verbose_name='R.U.T. normalizado'),
+        ),
+        migrations.AddField(
+            model_name='profesional',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, null=True,
+                                   verbose_name='R.U.T. normalizado'),
+        ),
+        migrations.AddField(
+            model_name='usuarioanterior',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, null=True,
+                                   verbose_name='R.U.T. normalizado'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kardex', '0028_rut_normalizado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorFicha',
+            fields=[
+                ('establecimiento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE,
+                                                         primary_key=True, related_name='contador_ficha',
+                                                         serialize=False, to='kardex.establecimiento',
+                                                         verbose_name='Establecimiento')),
+                ('ultimo_numero', models.PositiveIntegerField(default=0, verbose_name='Último número de ficha')),
+            ],
+            options={
+                'verbose_name': 'Contador de Fichas',
+                'verbose_name_plural': 'Contadores de Fichas',
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kardex', '0030_secuencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FichaUbicacion',
+            fields=[
+                ('ficha', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                               related_name='ubicacion', serialize=False, to='kardex.ficha',
+                                               verbose_name='Ficha')),
+                ('estado', models.CharField(choices=[('EN TRANSITO', 'En Tránsito'), ('RECIBIDO', 'Recibido'),
+                                                     ('TRASPASADO', 'Traspasado')],
+                                            max_length=20, verbose_name='Estado')),
+                ('en_transito', models.BooleanField(default=False, verbose_name='En tránsito')),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True,
+                                                     verbose_name='Fecha de envío del último movimiento')),
+                ('desde', models.DateTimeField(blank=True, null=True, verbose_name='Desde')),
+                ('establecimiento', models.ForeignKey(blank=True, null=True,
+                                                      on_delete=django.db.models.deletion.SET_NULL,
+                                                      related_name='ubicaciones_fichas',
+                                                      to='kardex.establecimiento', verbose_name='Establecimiento')),
+                ('movimiento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                                 related_name='+', to='kardex.movimientoficha',
+                                                 verbose_name='Último movimiento')),
+                ('servicio_clinico', models.ForeignKey(blank=True, null=True,
+                                                       on_delete=django.db.models.deletion.SET_NULL,
+                                                       related_name='ubicaciones_fichas',
+                                                       to='kardex.servicioclinico',
+                                                       verbose_name='Servicio Clínico')),
+            ],
+            options={
+                'verbose_name': 'Ubicación de Ficha',
+                'verbose_name_plural': 'Ubicaciones de Fichas',
+                'indexes': [
+                    models.Index(fields=['establecimiento', 'en_transito'], name='ficha_ubicacion_transito_idx'),
+                    models.Index(fields=['estado'], name='ficha_ubicacion_estado_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kardex', '0031_fichaubicacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientoficha',
+            index=models.Index(fields=['ficha', 'estado_recepcion', 'establecimiento'],
+                               name='mov_ficha_recepcion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoficha',
+            index=models.Index(fields=['ficha', '-fecha_envio'], name='mov_ficha_fecha_envio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoficha',
+            index=models.Index(fields=['estado_envio', '-fecha_envio'], name='mov_estado_envio_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoficha',
+            index=models.Index(fields=['estado_recepcion', '-fecha_recepcion'], name='mov_estado_recep_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kardex', '0032_movimientoficha_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDashboard',
+            fields=[
+                ('alcance', models.PositiveIntegerField(primary_key=True, serialize=False,
+                                                        verbose_name='ID de establecimiento (0 = todos)')),
+                ('total_pacientes', models.IntegerField(default=0, verbose_name='Total de pacientes')),
+                ('total_ingresos', models.IntegerField(default=0, verbose_name='Pacientes con ficha')),
+                ('total_fichas', models.IntegerField(default=0, verbose_name='Fichas')),
+                ('fichas_en_transito', models.IntegerField(default=0, verbose_name='Fichas en tránsito')),
+                ('cambios_recientes', models.IntegerField(default=0, verbose_name='Cambios de pacientes (7 días)')),
+                ('recalculado_en', models.DateTimeField(blank=True, null=True, verbose_name='Recalculado en')),
+            ],
+            options={
+                'verbose_name': 'Resumen del Dashboard',
+                'verbose_name_plural': 'Resúmenes del Dashboard',
+            },
+        ),
+    ]
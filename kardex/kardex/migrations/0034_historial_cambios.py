@@ -0,0 +1,84 @@
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kardex', '0033_resumendashboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalcomuna',
+            name='history_cambios',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder,
+                                   null=True, verbose_name='Cambios'),
+        ),
+        migrations.AddField(
+            model_name='historicalestablecimiento',
+            name='history_cambios',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder,
+                                   null=True, verbose_name='Cambios'),
+        ),
+        migrations.AddField(
+            model_name='historicalficha',
+            name='history_cambios',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder,
+                                   null=True, verbose_name='Cambios'),
+        ),
+        migrations.AddField(
+            model_name='historicalmovimientoficha',
+            name='history_cambios',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder,
+                                   null=True, verbose_name='Cambios'),
+        ),
+        migrations.AddField(
+            model_name='historicalpaciente',
+            name='history_cambios',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder,
+                                   null=True, verbose_name='Cambios'),
+        ),
+        migrations.AddField(
+            model_name='historicalpais',
+            name='history_cambios',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder,
+                                   null=True, verbose_name='Cambios'),
+        ),
+        migrations.AddField(
+            model_name='historicalprevision',
+            name='history_cambios',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder,
+                                   null=True, verbose_name='Cambios'),
+        ),
+        migrations.AddField(
+            model_name='historicalprofesion',
+            name='history_cambios',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder,
+                                   null=True, verbose_name='Cambios'),
+        ),
+        migrations.AddField(
+            model_name='historicalprofesional',
+            name='history_cambios',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder,
+                                   null=True, verbose_name='Cambios'),
+        ),
+        migrations.AddField(
+            model_name='historicalsector',
+            name='history_cambios',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder,
+                                   null=True, verbose_name='Cambios'),
+        ),
+        migrations.AddField(
+            model_name='historicalservicioclinico',
+            name='history_cambios',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder,
+                                   null=True, verbose_name='Cambios'),
+        ),
+        migrations.AddField(
+            model_name='historicalusuarioanterior',
+            name='history_cambios',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder,
+                                   null=True, verbose_name='Cambios'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kardex', '0034_historial_cambios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comando', models.CharField(max_length=100, verbose_name='Comando')),
+                ('huella', models.CharField(max_length=64, verbose_name='Huella')),
+                ('archivo', models.CharField(max_length=255, verbose_name='Archivo')),
+                ('numero', models.PositiveIntegerField(verbose_name='Número de bloque')),
+                ('filas', models.PositiveIntegerField(default=0, verbose_name='Filas')),
+                ('resultado', models.JSONField(blank=True, default=dict, verbose_name='Resultado')),
+                ('aplicado_en', models.DateTimeField(auto_now=True, verbose_name='Aplicado en')),
+            ],
+            options={
+                'verbose_name': 'Lote de Importación',
+                'verbose_name_plural': 'Lotes de Importación',
+                'constraints': [
+                    models.UniqueConstraint(fields=('comando', 'huella'), name='unique_lote_importacion'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+from config.validations import normalize_rut
+
+MODELOS = ['Paciente', 'Profesional', 'UsuarioAnterior']
+
+
+def completar_rut_normalizado(apps, schema_editor):
+    # Las búsquedas por RUT usan solo rut_normalizado (0028): los registros anteriores a la columna no se
+    # encontrarían y se crearían duplicados. Mismo recorrido que el comando normalizar_ruts.
+    for nombre in MODELOS:
+        model = apps.get_model('kardex', nombre)
+        qs = model.objects.filter(rut_normalizado__isnull=True).exclude(rut__isnull=True).exclude(rut='')
+        ultimo_pk = None
+        while True:
+            pagina = qs.order_by('pk')
+            if ultimo_pk is not None:
+                pagina = pagina.filter(pk__gt=ultimo_pk)
+            registros = list(pagina.only('pk', 'rut')[:5000])
+            if not registros:
+                break
+            for obj in registros:
+                obj.rut_normalizado = normalize_rut(obj.rut) or None
+            model.objects.bulk_update(registros, ['rut_normalizado'])
+            ultimo_pk = registros[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kardex', '0035_loteimportacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(completar_rut_normalizado, migrations.RunPython.noop),
+    ]
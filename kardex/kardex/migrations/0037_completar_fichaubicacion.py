@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from kardex.models.ficha_ubicacion import FichaUbicacion as FichaUbicacionActual
+
+
+def completar_ubicaciones(apps, schema_editor):
+    # La lista de fichas en tránsito y el dashboard leen solo FichaUbicacion (0031): las fichas con movimientos
+    # anteriores a la tabla no aparecerían. Mismo recorrido que FichaUbicacion.recalcular(), solo para las
+    # fichas que aún no tienen ubicación.
+    MovimientoFicha = apps.get_model('kardex', 'MovimientoFicha')
+    FichaUbicacion = apps.get_model('kardex', 'FichaUbicacion')
+    ResumenDashboard = apps.get_model('kardex', 'ResumenDashboard')
+
+    ultimos = MovimientoFicha.objects.filter(ficha__isnull=False) \
+        .exclude(ficha_id__in=FichaUbicacion.objects.values('ficha_id')) \
+        .annotate(orden=Window(RowNumber(), partition_by=F('ficha_id'),
+                               order_by=[F('fecha_envio').desc(), F('id').desc()])) \
+        .filter(orden=1)
+    lote = []
+    for movimiento in ultimos.iterator(chunk_size=2000):
+        lote.append(FichaUbicacion(ficha_id=movimiento.ficha_id, **FichaUbicacionActual.valores_desde(movimiento)))
+        if len(lote) >= 2000:
+            FichaUbicacion.objects.bulk_create(lote)
+            lote = []
+    if lote:
+        FichaUbicacion.objects.bulk_create(lote)
+    # Las fichas en tránsito del dashboard se recalculan en la próxima consulta
+    ResumenDashboard.objects.update(recalculado_en=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kardex', '0036_backfill_rut_normalizado'),
+    ]
+
+    operations = [
+        migrations.RunPython(completar_ubicaciones, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,62 @@
+import hashlib
+
+from django.core import signing
+from django.core.cache import cache
+from django.db import connections
 from django.db.models import Q
 from django.http import JsonResponse
-from django.urls import reverse_lazy
+from django.urls import reverse
+
+from kardex.cache_vistas import obtener_version, subir_version
+
+KEYSET_CURSOR_SALT = 'kardex.datatable.cursor'
+
+# Marcador del pk en la plantilla de acciones (y pk ficticio con el que se resuelven las URLs)
+ACTION_PK_PLACEHOLDER = '__pk__'
+ACTION_PK_SENTINEL = 2147483647
+
+COUNT_VERSION_KEY = 'kardex:datatable:count_version:{label}'
+
+
+def get_datatable_count_version(model):
+    """
+    Versión actual de los conteos cacheados de un modelo (cambia al guardar/eliminar registros).
+    """
+    return obtener_version(COUNT_VERSION_KEY.format(label=model._meta.label_lower))
+
+
+def invalidate_datatable_counts(model):
+    """
+    Invalida todos los conteos cacheados del modelo subiendo su versión.
+    """
+    subir_version(COUNT_VERSION_KEY.format(label=model._meta.label_lower))
+
+
+def estimate_table_rows(model):
+    """
+    Cantidad aproximada de filas según las estadísticas del motor (sin recorrer la tabla).
+    Devuelve None si el motor no las expone.
+    """
+    connection = connections[model.objects.db]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    [table],
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except Exception:
+        return None
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
 
 
 class DataTableMixin:
@@ -9,6 +65,25 @@ class DataTableMixin:
     datatable_order_fields = []  # e.g. ['id', None, 'nombre', 'codigo']
     model = None  # e.g. Comuna
 
+    # Columnas (rutas del modelo) que lee render_row, e.g. ['id', 'rut', 'comuna__nombre']. Si se declaran,
+    # la página se consulta con only() de esas columnas y select_related de las relaciones recorridas,
+    # en vez de instancias completas y un SELECT por FK y fila.
+    datatable_fields = []
+
+    # Paginación keyset (seek): opt-in por vista. En vez de OFFSET n se filtra desde el último
+    # registro entregado (columna de orden + id), por lo que la página N cuesta lo mismo que la 1.
+    datatable_keyset = False
+
+    # Estrategia de conteo para recordsTotal/recordsFiltered:
+    #   'exact'     -> COUNT(*) en cada petición (comportamiento original)
+    #   'cached'    -> total cacheado por consulta base (vista + establecimiento + filtros), con TTL
+    #                  e invalidación al guardar/eliminar registros del modelo
+    #   'estimated' -> estadística de la tabla cuando supera el umbral y la consulta base no filtra filas;
+    #                  en otro caso, igual que 'cached'
+    datatable_count_strategy = 'exact'
+    datatable_count_timeout = 300  # segundos
+    datatable_count_estimate_threshold = 100000
+
     url_detail = None
     url_update = None
     url_delete = None
@@ -46,35 +121,44 @@ class DataTableMixin:
             'Codigo': getattr(obj, 'codigo', ''),
         }
 
-    def get_actions(self, obj):
+    # (permiso, url, clase CSS, título, ícono) de cada botón de acción
+    def get_action_specs(self):
+        return [
+            (self.permission_view, self.url_detail, 'btn-secondary view-btn', 'Ver detalle', 'fa-search'),
+            (self.permission_update, self.url_update, 'btn-info', 'Editar', 'fa-edit'),
+            (self.permission_delete, self.url_delete, 'btn-danger', 'Eliminar', 'fa-trash'),
+        ]
+
+    def get_actions_template(self):
         """
-        Devuelve el HTML de los botones de acciones, según permisos definidos en la clase hija.
+        HTML de los botones de acciones con ACTION_PK_PLACEHOLDER en lugar del pk. Los permisos y las URLs
+        se resuelven una sola vez por request; cada fila solo reemplaza el marcador.
         """
-        user = self.request.user
-        actions = []
-
-        if self.permission_view and user.has_perm(self.permission_view):
-            actions.append(f"""
-                <a href="{reverse_lazy(f'{self.url_detail}', kwargs={'pk': obj.pk})}"
-                   class="btn p-1 btn-sm btn-secondary view-btn" title="Ver detalle">
-                   <i class="fas fa-search"></i></a>
-            """)
-
-        if self.permission_update and user.has_perm(self.permission_update):
-            actions.append(f"""
-                <a href="{reverse_lazy(f'{self.url_update}', kwargs={'pk': obj.pk})}"
-                   class="btn p-1 btn-sm btn-info" title="Editar">
-                   <i class="fas fa-edit"></i></a>
+        if getattr(self, '_actions_template', None) is None:
+            user = self.request.user
+            actions = []
+            for permission, url_name, css, title, icon in self.get_action_specs():
+                if not (permission and url_name and user.has_perm(permission)):
+                    continue
+                url = reverse(url_name, kwargs={'pk': ACTION_PK_SENTINEL}) \
+                    .replace(str(ACTION_PK_SENTINEL), ACTION_PK_PLACEHOLDER)
+                actions.append(f"""
+                <a href="{url}"
+                   class="btn p-1 btn-sm {css}" title="{title}">
+                   <i class="fas {icon}"></i></a>
             """)
+            self._actions_template = ''.join(actions)
+        return self._actions_template
 
-        if self.permission_delete and user.has_perm(self.permission_delete):
-            actions.append(f"""
-                <a href="{reverse_lazy(f'{self.url_delete}', kwargs={'pk': obj.pk})}"
-                   class="btn p-1 btn-sm btn-danger" title="Eliminar">
-                   <i class="fas fa-trash"></i></a>
-            """)
+    def get_actions(self, obj):
+        """
+        Devuelve el HTML de los botones de acciones, según permisos definidos en la clase hija.
+        """
+        return self.get_actions_template().replace(ACTION_PK_PLACEHOLDER, str(obj.pk))
 
-        return ''.join(actions)
+    def uses_actions_template(self):
+        # Si la vista no redefine get_actions, todas las filas comparten la plantilla de la página
+        return type(self).get_actions is DataTableMixin.get_actions
 
     def filter_queryset(self, qs, search_value):
         """
@@ -87,19 +171,83 @@ class DataTableMixin:
             qs = qs.filter(q)
         return qs
 
-    def get_datatable_response(self, request):
-        qs = self.get_base_queryset()
+    @staticmethod
+    def get_related_paths(model, fields):
+        """
+        Relaciones a un solo objeto (FK / OneToOne) recorridas por las rutas `fields`, para select_related.
+        """
+        paths = set()
+        for field_path in fields:
+            current = model
+            prefix = []
+            for part in field_path.split('__')[:-1]:
+                field = current._meta.get_field(part)
+                if not (field.is_relation and (field.many_to_one or field.one_to_one)):
+                    break
+                prefix.append(part)
+                paths.add('__'.join(prefix))
+                current = field.related_model
+        return sorted(paths)
 
-        draw = int(request.GET.get('draw', 1))
-        start = int(request.GET.get('start', 0))
-        length = int(request.GET.get('length', 100))
-        search_value = request.GET.get('search[value]', '').strip()
+    def project_queryset(self, qs, order_field=None):
+        """
+        Limita la consulta de la página a datatable_fields (más la columna de orden, que usa el cursor).
+        """
+        if not self.datatable_fields:
+            return qs
+        fields = list(self.datatable_fields)
+        if order_field and order_field.lstrip('-') not in fields:
+            fields.append(order_field.lstrip('-'))
+        # select_related(None): las relaciones de get_base_queryset que no se leen quedarían diferidas y recorridas
+        return qs.select_related(None).select_related(*self.get_related_paths(qs.model, fields)).only(*fields)
 
-        qs = self.filter_queryset(qs, search_value)
-        records_total = self.get_base_queryset().count()
-        records_filtered = qs.count()
+    def get_count_cache_key(self, qs):
+        # El SQL de la consulta base ya incluye establecimiento y filtros de la vista
+        try:
+            sql = str(qs.query)
+        except Exception:
+            return None
+        digest = hashlib.md5(sql.encode('utf-8')).hexdigest()
+        version = get_datatable_count_version(qs.model)
+        return f'kardex:datatable:count:{type(self).__name__}:{version}:{digest}'
 
-        # Ordenamiento
+    def get_cached_count(self, qs):
+        key = self.get_count_cache_key(qs)
+        if key is None:
+            return qs.count()
+        total = cache.get(key)
+        if total is None:
+            total = qs.count()
+            cache.set(key, total, self.datatable_count_timeout)
+        return total
+
+    def get_records_total(self, qs):
+        """
+        Total de registros de la consulta base según `datatable_count_strategy`.
+        """
+        strategy = self.datatable_count_strategy
+        # La estadística es de la tabla completa: solo sirve si la consulta base no filtra filas (si no, el
+        # paginador mostraría páginas vacías al final)
+        if strategy == 'estimated' and self.is_unfiltered(qs):
+            estimate = estimate_table_rows(qs.model)
+            if estimate is not None and estimate >= self.datatable_count_estimate_threshold:
+                return estimate
+        if strategy in ('cached', 'estimated'):
+            return self.get_cached_count(qs)
+        return qs.count()
+
+    @staticmethod
+    def is_unfiltered(qs):
+        """
+        True si el queryset recorre la tabla completa (sin WHERE, DISTINCT ni cortes).
+        """
+        query = qs.query
+        return not query.where and not query.distinct and query.low_mark == 0 and query.high_mark is None
+
+    def get_ordering(self, request):
+        """
+        Devuelve el campo de orden solicitado por DataTables (con '-' si es descendente) o None.
+        """
         try:
             order_col = int(request.GET.get('order[0][column]', 0))
         except (TypeError, ValueError):
@@ -111,22 +259,147 @@ class DataTableMixin:
             if 0 <= order_col < len(self.datatable_order_fields)
             else 'id'
         )
+        if order_field and order_dir == 'desc':
+            order_field = f'-{order_field}'
+        return order_field
+
+    @staticmethod
+    def _resolve_path(obj, path):
+        # Recorre rutas tipo 'paciente__rut' sobre la instancia ya cargada
+        value = obj
+        for part in path.split('__'):
+            if value is None:
+                return None
+            value = getattr(value, part, None)
+        return value
+
+    def encode_cursor(self, obj, order_field, search_value, next_start):
+        """
+        Codifica (firmado) la posición del último registro de la página para la siguiente petición.
+        """
+        field = (order_field or 'id').lstrip('-')
+        value = self._resolve_path(obj, field)
+        if value is not None and hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        elif value is not None and not isinstance(value, (str, int, float, bool)):
+            return None
+        return signing.dumps({
+            'o': order_field or 'id',
+            'q': search_value,
+            's': next_start,
+            'v': value,
+            'id': obj.pk,
+        }, salt=KEYSET_CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, request, order_field, search_value, start):
+        """
+        Devuelve el cursor solo si corresponde exactamente a la página solicitada
+        (mismo orden, misma búsqueda y mismo `start`); en otro caso None y se usa OFFSET.
+        """
+        raw = request.GET.get('cursor')
+        if not raw:
+            return None
+        try:
+            cursor = signing.loads(raw, salt=KEYSET_CURSOR_SALT)
+        except signing.BadSignature:
+            return None
+        if cursor.get('o') != (order_field or 'id') or cursor.get('q') != search_value or cursor.get('s') != start:
+            return None
+        return cursor
+
+    @staticmethod
+    def is_nullable_path(model, path):
+        """
+        True si la ruta (e.g. 'paciente__rut') puede valer NULL: el campo o alguna relación recorrida es nullable.
+        """
+        current = model
+        for part in path.split('__'):
+            field = current._meta.get_field(part)
+            if field.null:
+                return True
+            if not field.is_relation:
+                break
+            current = field.related_model
+        return False
+
+    def apply_keyset(self, qs, cursor, order_field):
+        """
+        Filtra el queryset a los registros posteriores al cursor según (columna de orden, id).
+
+        Los NULL no se comparan con > / <: forman un grupo aparte que el motor ordena primero o último
+        (MySQL y SQLite los tratan como el menor valor, PostgreSQL como el mayor), y se recorre por id.
+        """
+        field = (order_field or 'id').lstrip('-')
+        descending = (order_field or '').startswith('-')
+        op = 'lt' if descending else 'gt'
+        if field in ('id', 'pk'):
+            return qs.filter(**{f'pk__{op}': cursor['id']})
+        nullable = self.is_nullable_path(qs.model, field)
+        if nullable:
+            # ¿El grupo de NULL viene después de los valores no nulos en este sentido de orden?
+            nulls_last = connections[qs.db].features.nulls_order_largest != descending
+        if cursor['v'] is None:
+            q = Q(**{f'{field}__isnull': True, f'pk__{op}': cursor['id']})
+            if nullable and not nulls_last:
+                q |= Q(**{f'{field}__isnull': False})
+            return qs.filter(q)
+        q = Q(**{f'{field}__{op}': cursor['v']}) | Q(**{field: cursor['v'], f'pk__{op}': cursor['id']})
+        if nullable and nulls_last:
+            q |= Q(**{f'{field}__isnull': True})
+        return qs.filter(q)
+
+    def order_queryset(self, qs, order_field):
+        if self.datatable_keyset:
+            # Desempate por id en el mismo sentido para que el orden sea total y estable
+            pk_order = '-pk' if (order_field or '').startswith('-') else 'pk'
+            if order_field and order_field.lstrip('-') not in ('id', 'pk'):
+                return qs.order_by(order_field, pk_order)
+            return qs.order_by(pk_order)
         if order_field:
-            if order_dir == 'desc':
-                order_field = f'-{order_field}'
-            qs = qs.order_by(order_field)
+            return qs.order_by(order_field)
+        return qs
+
+    def get_datatable_response(self, request):
+        base_qs = self.get_base_queryset()
 
-        qs_page = qs[start:start + length]
+        draw = int(request.GET.get('draw', 1))
+        start = int(request.GET.get('start', 0))
+        length = int(request.GET.get('length', 100))
+        search_value = request.GET.get('search[value]', '').strip()
+
+        qs = self.filter_queryset(base_qs, search_value)
+        records_total = self.get_records_total(base_qs)
+        # Sin búsqueda el filtrado es la misma consulta: no se cuenta dos veces
+        records_filtered = records_total if qs is base_qs else qs.count()
 
+        # Ordenamiento
+        order_field = self.get_ordering(request)
+        qs = self.project_queryset(self.order_queryset(qs, order_field), order_field)
+
+        cursor = self.decode_cursor(request, order_field, search_value, start) if self.datatable_keyset else None
+        if cursor:
+            qs_page = self.apply_keyset(qs, cursor, order_field)[:length]
+        else:
+            qs_page = qs[start:start + length]
+
+        # Acciones: una plantilla por página y solo el pk por fila (el cliente arma los botones)
+        actions_template = self.get_actions_template() if self.uses_actions_template() else None
         data = []
+        last_obj = None
         for obj in qs_page:
             row = self.render_row(obj)
-            row['actions'] = self.get_actions(obj)
+            row['actions'] = obj.pk if actions_template is not None else self.get_actions(obj)
             data.append(row)
+            last_obj = obj
 
-        return JsonResponse({
+        response = {
             'draw': draw,
             'recordsTotal': records_total,
             'recordsFiltered': records_filtered,
             'data': data,
-        })
+        }
+        if actions_template is not None:
+            response['actions_template'] = actions_template
+        if self.datatable_keyset and last_obj is not None:
+            response['cursor'] = self.encode_cursor(last_obj, order_field, search_value, start + length)
+        return JsonResponse(response)
@@ -1,12 +1,18 @@
 from .comuna import Comuna
+from .contador_ficha import ContadorFicha
 from .establecimiento import Establecimiento
 from .ficha import Ficha
+from .ficha_ubicacion import FichaUbicacion
+from .lote_importacion import LoteImportacion
 from .movimiento_ficha import MovimientoFicha
+from .paciente_busqueda import PacienteBusqueda
 from .pacientes import Paciente
 from .pais import Pais
 from .prevision import Prevision
 from .profesion import Profesion
 from .profesionales import Profesional
+from .resumen_dashboard import ResumenDashboard
+from .secuencia import Secuencia
 from .sectores import Sector
 from .servicio_clinico import ServicioClinico
 from .soporte import Soporte
@@ -1,7 +1,7 @@
 from django.db import models
 from simple_history.models import HistoricalRecords
 
-from config.abstract import StandardModel
+from config.abstract import HistorialConCambios, StandardModel
 
 
 class Comuna(StandardModel):
@@ -9,7 +9,7 @@ class Comuna(StandardModel):
     codigo = models.CharField(max_length=200, verbose_name='Código de Comuna')
     pais = models.ForeignKey('kardex.Pais', on_delete=models.SET_NULL, null=True, blank=True, verbose_name='País'
                              , related_name='comuna_paises')
-    history = HistoricalRecords()
+    history = HistoricalRecords(bases=[HistorialConCambios])
 
     def __str__(self):
         return self.nombre
@@ -0,0 +1,106 @@
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
+
+
+class ContadorFicha(models.Model):
+    """
+    Último número de ficha entregado por establecimiento. Reemplaza el MAX(numero_ficha_sistema)
+    por un UPDATE sobre una sola fila bloqueada (SELECT ... FOR UPDATE).
+    """
+    establecimiento = models.OneToOneField('kardex.Establecimiento', on_delete=models.CASCADE, primary_key=True,
+                                           verbose_name='Establecimiento', related_name='contador_ficha')
+    ultimo_numero = models.PositiveIntegerField(default=0, verbose_name='Último número de ficha')
+
+    def __str__(self):
+        return f"{self.establecimiento_id}: {self.ultimo_numero}"
+
+    class Meta:
+        verbose_name = 'Contador de Fichas'
+        verbose_name_plural = 'Contadores de Fichas'
+
+    @staticmethod
+    def _maximo_actual(establecimiento_id):
+        from kardex.models import Ficha
+        return Ficha.objects.filter(establecimiento_id=establecimiento_id) \
+            .aggregate(Max('numero_ficha_sistema'))['numero_ficha_sistema__max'] or 0
+
+    @classmethod
+    def _bloquear(cls, establecimiento_id):
+        # Debe llamarse dentro de transaction.atomic()
+        try:
+            return cls.objects.select_for_update().get(establecimiento_id=establecimiento_id)
+        except cls.DoesNotExist:
+            pass
+        # Primera vez: el contador parte desde el máximo existente (única agregación por establecimiento)
+        try:
+            with transaction.atomic():
+                return cls.objects.create(establecimiento_id=establecimiento_id,
+                                          ultimo_numero=cls._maximo_actual(establecimiento_id))
+        except IntegrityError:
+            # Otra transacción lo creó en paralelo
+            return cls.objects.select_for_update().get(establecimiento_id=establecimiento_id)
+
+    @classmethod
+    def reservar(cls, establecimiento_id, cantidad=1):
+        """
+        Reserva `cantidad` números consecutivos para el establecimiento y los devuelve como range.
+        """
+        with transaction.atomic():
+            contador = cls._bloquear(establecimiento_id)
+            inicio = contador.ultimo_numero + 1
+            contador.ultimo_numero += cantidad
+            contador.save(update_fields=['ultimo_numero'])
+        return range(inicio, inicio + cantidad)
+
+    @classmethod
+    def sincronizar(cls, establecimiento_id, numero):
+        """
+        Asegura que el contador no quede por debajo de un número asignado explícitamente (importaciones).
+        """
+        actualizados = cls.objects.filter(establecimiento_id=establecimiento_id).update(
+            ultimo_numero=Greatest(F('ultimo_numero'), numero)
+        )
+        if not actualizados:
+            with transaction.atomic():
+                contador = cls._bloquear(establecimiento_id)
+                if contador.ultimo_numero < numero:
+                    contador.ultimo_numero = numero
+                    contador.save(update_fields=['ultimo_numero'])
+
+    @classmethod
+    def siguiente(cls, establecimiento_id):
+        """
+        Número que recibiría la próxima ficha (solo vista previa, no reserva).
+        """
+        ultimo = cls.objects.filter(establecimiento_id=establecimiento_id) \
+            .values_list('ultimo_numero', flat=True).first()
+        if ultimo is None:
+            ultimo = cls._maximo_actual(establecimiento_id)
+        return ultimo + 1
+
+    @classmethod
+    def asignar_lote(cls, fichas):
+        """
+        Para bulk_create: numera las fichas sin número reservando un rango por establecimiento
+        y sincroniza los contadores con los números que ya vienen informados.
+        """
+        sin_numero = {}
+        maximos = {}
+        for ficha in fichas:
+            if not ficha.establecimiento_id:
+                continue
+            if ficha.numero_ficha_sistema in (None, ''):
+                sin_numero.setdefault(ficha.establecimiento_id, []).append(ficha)
+            else:
+                try:
+                    numero = int(ficha.numero_ficha_sistema)
+                except (TypeError, ValueError):
+                    continue  # El INSERT rechazará el valor inválido
+                maximos[ficha.establecimiento_id] = max(numero, maximos.get(ficha.establecimiento_id, 0))
+
+        for establecimiento_id, numero in maximos.items():
+            cls.sincronizar(establecimiento_id, numero)
+        for establecimiento_id, pendientes in sin_numero.items():
+            for ficha, numero in zip(pendientes, cls.reservar(establecimiento_id, len(pendientes))):
+                ficha.numero_ficha_sistema = numero
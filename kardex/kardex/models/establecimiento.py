@@ -1,7 +1,7 @@
 from django.db import models
 from simple_history.models import HistoricalRecords
 
-from config.abstract import StandardModel
+from config.abstract import HistorialConCambios, StandardModel
 
 
 class Establecimiento(StandardModel):
@@ -10,7 +10,7 @@ class Establecimiento(StandardModel):
     telefono = models.CharField(max_length=15, verbose_name='Teléfono')
     comuna = models.ForeignKey('kardex.Comuna', on_delete=models.PROTECT, null=False, verbose_name='Comuna'
                                , related_name='establecimientos_comuna')
-    history = HistoricalRecords()
+    history = HistoricalRecords(bases=[HistorialConCambios])
 
     def __str__(self):
         return self.nombre
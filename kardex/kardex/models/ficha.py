@@ -1,10 +1,10 @@
 from django.db import models
 from simple_history.models import HistoricalRecords
 
-from config.abstract import StandardModel
+from config.abstract import ConValoresCargados, HistorialConCambios, StandardModel
 
 
-class Ficha(StandardModel):
+class Ficha(ConValoresCargados, StandardModel):
     numero_ficha_sistema = models.IntegerField(null=True, blank=True, verbose_name='Número de Ficha')
     numero_ficha_tarjeta = models.IntegerField(null=True, blank=True,
                                                verbose_name='Número de Ficha Tarjeta')
@@ -25,7 +25,7 @@ class Ficha(StandardModel):
     sector = models.ForeignKey('kardex.Sector', on_delete=models.PROTECT, null=True, blank=True,
                                verbose_name='Sector', related_name='fichas_sectores')
 
-    history = HistoricalRecords()
+    history = HistoricalRecords(bases=[HistorialConCambios])
 
     def __str__(self):
         num = self.numero_ficha_sistema
@@ -49,22 +49,17 @@ class Ficha(StandardModel):
 
     def save(self, *args, **kwargs):
         creando = self.pk is None
-        super().save(*args, **kwargs)  # Guardamos primero para tener el PK
 
-        if creando and not self.numero_ficha_sistema and self.establecimiento:
-            # Obtener el máximo actual
-            max_ficha = Ficha.objects.filter(establecimiento=self.establecimiento) \
-                .exclude(pk=self.pk) \
-                .aggregate(models.Max('numero_ficha_sistema'))['numero_ficha_sistema__max']
-
-            if max_ficha is not None:
-                self.numero_ficha_sistema = max_ficha + 1
+        if creando and self.establecimiento_id:
+            from kardex.models import ContadorFicha
+            if not self.numero_ficha_sistema:
+                # Número tomado del contador del establecimiento antes del INSERT (una sola escritura)
+                self.numero_ficha_sistema = ContadorFicha.reservar(self.establecimiento_id)[0]
             else:
-                # Fallback: usar el ID como número de ficha si no hay registros
-                self.numero_ficha_sistema = self.pk
+                # Número informado (importaciones): el contador no debe quedar por debajo
+                ContadorFicha.sincronizar(self.establecimiento_id, int(self.numero_ficha_sistema))
 
-            # Guardamos solo el campo actualizado para evitar loops
-            super().save(update_fields=['numero_ficha_sistema'])
+        super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = 'Ficha'
@@ -0,0 +1,199 @@
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from kardex.choices import ESTADO_UBICACION
+
+ESTADOS_TRASPASO = ('TRASPASDO', 'TRASPASADO')
+
+# Para comparar movimientos sin fecha de envío
+_FECHA_MINIMA = datetime.min.replace(tzinfo=dt_timezone.utc)
+
+
+class FichaUbicacion(models.Model):
+    """
+    Ubicación actual de cada ficha (desnormalizada desde su último movimiento por fecha de envío).
+    Se actualiza en la misma transacción que el movimiento, así saber dónde está una ficha o si está
+    en tránsito es una búsqueda por PK en vez de ordenar el historial de movimientos.
+    """
+    ficha = models.OneToOneField('kardex.Ficha', on_delete=models.CASCADE, primary_key=True,
+                                 verbose_name='Ficha', related_name='ubicacion')
+    movimiento = models.ForeignKey('kardex.MovimientoFicha', on_delete=models.SET_NULL, null=True, blank=True,
+                                   verbose_name='Último movimiento', related_name='+')
+    establecimiento = models.ForeignKey('kardex.Establecimiento', on_delete=models.SET_NULL, null=True, blank=True,
+                                        verbose_name='Establecimiento', related_name='ubicaciones_fichas')
+    servicio_clinico = models.ForeignKey('kardex.ServicioClinico', on_delete=models.SET_NULL, null=True, blank=True,
+                                         verbose_name='Servicio Clínico', related_name='ubicaciones_fichas')
+    estado = models.CharField(max_length=20, choices=ESTADO_UBICACION, verbose_name='Estado')
+    # Igual que la validación de salida: el último movimiento sigue 'EN ESPERA' de recepción
+    en_transito = models.BooleanField(default=False, verbose_name='En tránsito')
+    fecha_envio = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de envío del último movimiento')
+    desde = models.DateTimeField(null=True, blank=True, verbose_name='Desde')
+
+    def __str__(self):
+        return f"Ficha {self.ficha_id}: {self.estado}"
+
+    class Meta:
+        verbose_name = 'Ubicación de Ficha'
+        verbose_name_plural = 'Ubicaciones de Fichas'
+        indexes = [
+            models.Index(fields=['establecimiento', 'en_transito'], name='ficha_ubicacion_transito_idx'),
+            models.Index(fields=['estado'], name='ficha_ubicacion_estado_idx'),
+        ]
+
+    CAMPOS = ['movimiento', 'establecimiento', 'servicio_clinico', 'estado', 'en_transito', 'fecha_envio', 'desde']
+
+    @staticmethod
+    def valores_desde(movimiento):
+        if movimiento.estado_traspaso in ESTADOS_TRASPASO:
+            estado, servicio_id, desde = 'TRASPASADO', movimiento.servicio_clinico_traspaso_id, \
+                movimiento.fecha_traspaso
+        elif movimiento.estado_recepcion == 'RECIBIDO':
+            estado, servicio_id, desde = 'RECIBIDO', movimiento.servicio_clinico_recepcion_id, \
+                movimiento.fecha_recepcion
+        else:
+            estado, servicio_id, desde = 'EN TRANSITO', movimiento.servicio_clinico_recepcion_id, \
+                movimiento.fecha_envio
+        return {
+            'movimiento_id': movimiento.pk,
+            'establecimiento_id': movimiento.establecimiento_id,
+            'servicio_clinico_id': servicio_id,
+            'estado': estado,
+            'en_transito': movimiento.estado_recepcion == 'EN ESPERA',
+            'fecha_envio': movimiento.fecha_envio,
+            'desde': desde or movimiento.fecha_envio,
+        }
+
+    def _es_vigente(self, movimiento):
+        # El movimiento reemplaza a la ubicación si es el mismo o tiene fecha de envío igual o posterior
+        if self.movimiento_id == movimiento.pk or self.fecha_envio is None:
+            return True
+        return (movimiento.fecha_envio or _FECHA_MINIMA) >= self.fecha_envio
+
+    @classmethod
+    def registrar(cls, movimiento):
+        """
+        Actualiza la ubicación de la ficha del movimiento. Llamar dentro de la transacción del guardado.
+        """
+        cls.registrar_lote([movimiento])
+
+    @classmethod
+    def registrar_lote(cls, movimientos):
+        """
+        Igual que registrar() para muchos movimientos (bulk_create / bulk_update): bloquea las ubicaciones
+        involucradas, toma el movimiento más reciente por ficha y escribe con bulk_create/bulk_update.
+        """
+        ultimos = {}
+        for movimiento in movimientos:
+            if not movimiento.ficha_id or not movimiento.pk:
+                continue
+            previo = ultimos.get(movimiento.ficha_id)
+            if previo is None or (movimiento.fecha_envio or _FECHA_MINIMA) >= (previo.fecha_envio or _FECHA_MINIMA):
+                ultimos[movimiento.ficha_id] = movimiento
+        if not ultimos:
+            return
+
+        from kardex.models import ResumenDashboard
+
+        with transaction.atomic():
+            existentes = cls.objects.select_for_update().in_bulk(list(ultimos))
+            # Fichas en tránsito del dashboard: diferencia por establecimiento entre la ubicación anterior y
+            # la nueva (sin recontar)
+            transito = Counter()
+            actualizar, crear = [], []
+            for ficha_id, movimiento in ultimos.items():
+                ubicacion = existentes.get(ficha_id)
+                if ubicacion is None:
+                    crear.append(cls(ficha_id=ficha_id, **cls.valores_desde(movimiento)))
+                elif ubicacion._es_vigente(movimiento):
+                    transito[ubicacion.establecimiento_id] -= ubicacion.en_transito
+                    for campo, valor in cls.valores_desde(movimiento).items():
+                        setattr(ubicacion, campo, valor)
+                    transito[ubicacion.establecimiento_id] += ubicacion.en_transito
+                    actualizar.append(ubicacion)
+            if actualizar:
+                cls.objects.bulk_update(actualizar, cls.CAMPOS)
+            if crear:
+                try:
+                    with transaction.atomic():
+                        cls.objects.bulk_create(crear)
+                    for ubicacion in crear:
+                        transito[ubicacion.establecimiento_id] += ubicacion.en_transito
+                except IntegrityError:
+                    # Otra transacción creó alguna en paralelo: reintentar con las filas ya existentes
+                    cls.registrar_lote([ultimos[u.ficha_id] for u in crear])
+            ResumenDashboard.sumar_transito(transito)
+
+    @classmethod
+    def recalcular(cls, ficha_ids=None):
+        """
+        Reconstruye las ubicaciones desde MovimientoFicha (último movimiento por fecha de envío de cada ficha).
+        Sin `ficha_ids` recorre todas las fichas con movimientos.
+        """
+        from kardex.models import MovimientoFicha
+
+        qs = MovimientoFicha.objects.filter(ficha__isnull=False)
+        if ficha_ids is not None:
+            qs = qs.filter(ficha_id__in=ficha_ids)
+            cls.objects.filter(ficha_id__in=ficha_ids).delete()
+        else:
+            cls.objects.all().delete()
+        ultimos = qs.annotate(
+            orden=Window(RowNumber(), partition_by=F('ficha_id'), order_by=[F('fecha_envio').desc(), F('id').desc()])
+        ).filter(orden=1)
+        lote = []
+        total = 0
+        for movimiento in ultimos.iterator(chunk_size=2000):
+            lote.append(cls(ficha_id=movimiento.ficha_id, **cls.valores_desde(movimiento)))
+            if len(lote) >= 2000:
+                cls.objects.bulk_create(lote)
+                total += len(lote)
+                lote = []
+        if lote:
+            cls.objects.bulk_create(lote)
+            total += len(lote)
+        return total
+
+    @classmethod
+    def movimiento_actual(cls, ficha):
+        """
+        Último movimiento de la ficha. Si aún no tiene ubicación registrada (datos previos a esta tabla),
+        se busca en el historial de movimientos.
+        """
+        from kardex.models import MovimientoFicha
+
+        ubicacion = cls.objects.select_related('movimiento').filter(ficha=ficha).first()
+        if ubicacion is not None:
+            return ubicacion.movimiento
+        return MovimientoFicha.objects.filter(ficha=ficha).order_by('-fecha_envio').first()
+
+    @classmethod
+    def fichas_en_transito(cls, ficha_ids, establecimiento):
+        """
+        Subconjunto de `ficha_ids` cuyo último movimiento está pendiente de recepción en el establecimiento.
+        """
+        from kardex.models import MovimientoFicha
+
+        ficha_ids = {int(ficha_id) for ficha_id in ficha_ids}
+        ubicaciones = cls.objects.filter(ficha_id__in=ficha_ids) \
+            .values_list('ficha_id', 'en_transito', 'establecimiento_id')
+        resultado = set()
+        con_ubicacion = set()
+        for ficha_id, en_transito, establecimiento_id in ubicaciones:
+            con_ubicacion.add(ficha_id)
+            if en_transito and establecimiento_id == getattr(establecimiento, 'pk', establecimiento):
+                resultado.add(ficha_id)
+        # Fichas sin ubicación registrada: validar contra el historial como antes
+        sin_ubicacion = ficha_ids - con_ubicacion
+        if sin_ubicacion:
+            resultado |= set(
+                MovimientoFicha.objects.filter(
+                    ficha_id__in=sin_ubicacion,
+                    estado_recepcion='EN ESPERA',
+                    establecimiento=establecimiento
+                ).values_list('ficha_id', flat=True)
+            )
+        return resultado
@@ -0,0 +1,57 @@
+import hashlib
+
+import pandas as pd
+from django.db import models
+
+
+class LoteImportacion(models.Model):
+    """
+    Punto de control de las importaciones masivas (comandos importar_*): un registro por bloque del archivo
+    ya aplicado, escrito en la misma transacción que sus datos. Con --resume los bloques cuya huella ya
+    está registrada se saltan, así una importación interrumpida continúa sin repetir escrituras.
+    """
+    comando = models.CharField(max_length=100, verbose_name='Comando')
+    # SHA-256 del contenido del bloque (identifica el bloque aunque cambie su posición en el archivo)
+    huella = models.CharField(max_length=64, verbose_name='Huella')
+    archivo = models.CharField(max_length=255, verbose_name='Archivo')
+    numero = models.PositiveIntegerField(verbose_name='Número de bloque')
+    filas = models.PositiveIntegerField(default=0, verbose_name='Filas')
+    resultado = models.JSONField(default=dict, blank=True, verbose_name='Resultado')
+    aplicado_en = models.DateTimeField(auto_now=True, verbose_name='Aplicado en')
+
+    def __str__(self):
+        return f"{self.comando} bloque {self.numero} ({self.archivo})"
+
+    class Meta:
+        verbose_name = 'Lote de Importación'
+        verbose_name_plural = 'Lotes de Importación'
+        constraints = [
+            models.UniqueConstraint(fields=['comando', 'huella'], name='unique_lote_importacion'),
+        ]
+
+    @staticmethod
+    def calcular_huella(df, columnas):
+        """
+        Huella del contenido de `columnas` del bloque: no depende del índice ni de los tipos inferidos.
+        """
+        filas = pd.util.hash_pandas_object(df[columnas].astype(object), index=False)
+        huella = hashlib.sha256(';'.join(columnas).encode('utf-8'))
+        huella.update(filas.to_numpy().tobytes())
+        return huella.hexdigest()
+
+    @classmethod
+    def aplicados(cls, comando, huellas):
+        """
+        Huellas de `huellas` ya registradas para el comando.
+        """
+        return set(cls.objects.filter(comando=comando, huella__in=list(huellas)).values_list('huella', flat=True))
+
+    @classmethod
+    def registrar(cls, comando, huella, archivo, numero, filas, resultado):
+        """
+        Registra el bloque como aplicado. Llamar dentro de la transacción que escribe sus datos.
+        """
+        cls.objects.update_or_create(
+            comando=comando, huella=huella,
+            defaults={'archivo': archivo, 'numero': numero, 'filas': filas, 'resultado': resultado},
+        )
@@ -1,13 +1,13 @@
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from simple_history.models import HistoricalRecords
 
-from config.abstract import StandardModel
+from config.abstract import ConValoresCargados, HistorialConCambios, StandardModel
 from kardex.choices import ESTADO_RESPUESTA
 
 
-class MovimientoFicha(StandardModel):
+class MovimientoFicha(ConValoresCargados, StandardModel):
     fecha_envio = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Envío')
     fecha_recepcion = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Recepción')
     fecha_traspaso = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Traspaso')
@@ -96,7 +96,7 @@ class MovimientoFicha(StandardModel):
     ficha = models.ForeignKey('kardex.Ficha', null=True, blank=True, on_delete=models.PROTECT,
                               verbose_name='Ficha')
 
-    history = HistoricalRecords()
+    history = HistoricalRecords(bases=[HistorialConCambios])
 
     def clean(self):
         # servicios distintos
@@ -104,40 +104,30 @@ class MovimientoFicha(StandardModel):
                 self.servicio_clinico_envio_id == self.servicio_clinico_recepcion_id:
             raise ValidationError(
                 {'servicio_clinico_recepcion': 'El servicio de recepción no puede ser igual al de envío.'})
-        # no editar si ya está recibido
-        if self.pk and self.estado_recepcion == 'RECIBIDO':
-            # Permitir idempotencia al marcar recibido: si lo único que cambia es establecer precisamente
-            # los campos de recepción desde vacío a sus valores definitivos, no bloquear.
-            changed = []
-            try:
-                old = type(self).objects.get(pk=self.pk)
-                tracked = ['fecha_envio', 'observacion_envio', 'estado_envio', 'servicio_clinico_envio',
-                           'usuario_envio', 'profesional_envio',
-                           'ficha', 'servicio_clinico_recepcion', 'observacion_recepcion', 'profesional_recepcion',
-                           'fecha_recepcion', 'estado_recepcion', 'usuario_recepcion']
-                for f in tracked:
-                    if getattr(old, f) != getattr(self, f):
-                        changed.append(f)
-            except type(self).DoesNotExist:
-                pass
+
+    def aplicar_valores_creacion(self):
+        """
+        Valores por defecto de un movimiento nuevo. Se usa en save() y antes de bulk_create.
+        """
+        # Si no tiene estado de envío, lo marcamos como ENVIADO
+        if not self.estado_envio:
+            self.estado_envio = 'ENVIADO'
+        # Si no tiene estado de recepción, queda en espera
+        if not self.estado_recepcion:
+            self.estado_recepcion = 'EN ESPERA'
+        # Si no tiene estado de traspaso, también en espera
+        if not self.estado_traspaso:
+            self.estado_traspaso = 'EN ESPERA'
+        # Asignamos la fecha de envío automáticamente
+        if not self.fecha_envio:
+            self.fecha_envio = timezone.now()
 
     def save(self, *args, **kwargs):
         creating = self.pk is None
 
         # Si es un movimiento nuevo (creación)
         if creating:
-            # Si no tiene estado de envío, lo marcamos como ENVIADO
-            if not self.estado_envio:
-                self.estado_envio = 'ENVIADO'
-            # Si no tiene estado de recepción, queda en espera
-            if not self.estado_recepcion:
-                self.estado_recepcion = 'EN ESPERA'
-            # Si no tiene estado de traspaso, también en espera
-            if not self.estado_traspaso:
-                self.estado_traspaso = 'EN ESPERA'
-            # Asignamos la fecha de envío automáticamente
-            if not self.fecha_envio:
-                self.fecha_envio = timezone.now()
+            self.aplicar_valores_creacion()
 
         else:
             # Si se marca como recibido y no tiene fecha, se asigna automáticamente
@@ -148,9 +138,18 @@ class MovimientoFicha(StandardModel):
             if self.estado_traspaso == 'TRASPASADO' and not self.fecha_traspaso:
                 self.fecha_traspaso = timezone.now()
 
-        # Validación de datos antes de guardar
-        self.full_clean()
-        super().save(*args, **kwargs)
+        # Validación de datos antes de guardar. Las FK que no cambiaron desde la carga ya fueron
+        # validadas: se excluyen para no consultar su existencia una a una.
+        modificados = set(self.campos_modificados())
+        self.full_clean(exclude=[
+            f.name for f in self._meta.concrete_fields
+            if f.is_relation and f.name not in modificados
+        ])
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Ubicación actual de la ficha en la misma transacción que el movimiento
+            from kardex.models import FichaUbicacion
+            FichaUbicacion.registrar(self)
 
     def __str__(self):
         return f"Movimiento de Ficha #{self.ficha.numero_ficha_sistema if self.ficha else 'N/A'}"
@@ -158,3 +157,13 @@ class MovimientoFicha(StandardModel):
     class Meta:
         verbose_name = 'Movimiento Ficha'
         verbose_name_plural = 'Movimientos Fichas'
+        indexes = [
+            # Validación de salida: ¿la ficha tiene un movimiento 'EN ESPERA' en el establecimiento?
+            models.Index(fields=['ficha', 'estado_recepcion', 'establecimiento'], name='mov_ficha_recepcion_idx'),
+            # Último movimiento de cada ficha (order_by('-fecha_envio') por ficha)
+            models.Index(fields=['ficha', '-fecha_envio'], name='mov_ficha_fecha_envio_idx'),
+            # Listados de salida: estado de envío con filtro/orden por fecha de envío
+            models.Index(fields=['estado_envio', '-fecha_envio'], name='mov_estado_envio_fecha_idx'),
+            # Listados de recepción: estado de recepción con filtro/orden por fecha de recepción
+            models.Index(fields=['estado_recepcion', '-fecha_recepcion'], name='mov_estado_recep_fecha_idx'),
+        ]
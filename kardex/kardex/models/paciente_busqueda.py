@@ -0,0 +1,22 @@
+from django.db import models
+
+
+class PacienteBusqueda(models.Model):
+    """
+    Índice de búsqueda de pacientes: un registro por término normalizado (sin tildes, en mayúsculas)
+    de los datos de identificación y nombres. Se mantiene desde `kardex.busqueda`.
+    """
+    paciente = models.ForeignKey('kardex.Paciente', on_delete=models.CASCADE, related_name='terminos_busqueda',
+                                 verbose_name='Paciente')
+    termino = models.CharField(max_length=100, verbose_name='Término')
+
+    def __str__(self):
+        return f"{self.termino} -> {self.paciente_id}"
+
+    class Meta:
+        verbose_name = 'Término de búsqueda de paciente'
+        verbose_name_plural = 'Términos de búsqueda de pacientes'
+        indexes = [
+            # Búsqueda por prefijo: el índice entrega directamente los paciente_id
+            models.Index(fields=['termino', 'paciente'], name='paciente_busqueda_termino_idx'),
+        ]
@@ -1,14 +1,20 @@
 from django.db import models
 from simple_history.models import HistoricalRecords
 
-from config.abstract import StandardModel
+from config.abstract import ConValoresCargados, HistorialConCambios, StandardModel
+from config.validations import normalize_rut
 from kardex.choices import ESTADO_CIVIL, GENERO_CHOICES
+from kardex.models.secuencia import Secuencia
 
+SECUENCIA_CODIGO = 'paciente_codigo'
 
-class Paciente(StandardModel):
+
+class Paciente(ConValoresCargados, StandardModel):
     # IDENTIFICACIÓN
     codigo = models.CharField(max_length=100, unique=True, null=True, blank=True, verbose_name='Código')
     rut = models.CharField(max_length=100, null=True, blank=True, verbose_name='R.U.T.')
+    rut_normalizado = models.CharField(max_length=20, null=True, blank=True, db_index=True, editable=False,
+                                       verbose_name='R.U.T. normalizado')
     nip = models.CharField(max_length=100, null=True, blank=True, verbose_name='NIP')
     nombre = models.CharField(max_length=100, null=False, verbose_name='Nombre')
     rut_madre = models.CharField(max_length=100, null=True, blank=True, verbose_name='R.U.T. Madre')
@@ -67,7 +73,7 @@ class Paciente(StandardModel):
     usuario_anterior = models.ForeignKey('kardex.UsuarioAnterior', on_delete=models.PROTECT, null=True, blank=True,
                                          verbose_name='UsuarioAnterior', related_name='usuarios_anteriores')
 
-    history = HistoricalRecords()
+    history = HistoricalRecords(bases=[HistorialConCambios])
 
     def __str__(self):
         return f"{self.rut} - {self.nombre} {self.apellido_paterno} {self.apellido_materno}"
@@ -77,9 +83,26 @@ class Paciente(StandardModel):
         verbose_name_plural = 'Pacientes'
 
     def save(self, *args, **kwargs):
-        # Normalizar campos texto
+        self.normalizar_campos()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'rut' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'rut_normalizado'}
+
+        # Si es creación y no tiene código, se toma de la secuencia antes del INSERT (un solo guardado)
+        if self.pk is None and not self.codigo:
+            self.codigo = Paciente.reservar_codigos(1)[0]
+
+        super().save(*args, **kwargs)
+
+    def normalizar_campos(self):
+        """
+        Normaliza los campos de texto y calcula rut_normalizado. Se usa en save() y antes de
+        bulk_create/bulk_update.
+        """
         if self.rut:
             self.rut = self.rut.strip().lower()
+        # Columna indexada para búsquedas exactas por RUT (ver config.validations.normalize_rut)
+        self.rut_normalizado = normalize_rut(self.rut) or None
         if self.nip:
             self.nip = self.nip.strip().upper()
         if self.nombre:
@@ -119,21 +142,39 @@ class Paciente(StandardModel):
         if self.alergico_a:
             self.alergico_a = self.alergico_a.strip().upper()
 
-        # Si es creación y no tiene código, hacer primer save sin historial para obtener el ID
-        is_creating = self.pk is None
-        if is_creating and not self.codigo:
-            # deshabilitar historial para este primer guardado
-            setattr(self, '_disable_history', True)
-            super().save(*args, **kwargs)
-            # limpiar flag para que el próximo guardado sí cree historial
-            if hasattr(self, '_disable_history'):
-                delattr(self, '_disable_history')
-
-            # generar y asignar código basado en el ID
-            self.codigo = f"PAC-{self.pk:07d}"
-            # ahora guardar normalmente (esto creará un único registro en el historial con el código)
-            super().save(update_fields=["codigo"])  # no usar signals, ni crear segundo historial previo
-            return
-
-        # Comportamiento normal para updates o creaciones con código previamente definido
-        super().save(*args, **kwargs)
+    @staticmethod
+    def formatear_codigo(numero):
+        return f"PAC-{numero:07d}"
+
+    @classmethod
+    def _codigo_inicial(cls):
+        # Primer uso de la secuencia: continuar después de los códigos existentes (antes eran PAC-{id})
+        ultimo_id = cls.objects.aggregate(models.Max('id'))['id__max'] or 0
+        ultimo_codigo = cls.objects.filter(codigo__startswith='PAC-') \
+            .aggregate(models.Max('codigo'))['codigo__max'] or ''
+        digitos = ultimo_codigo[4:]
+        return max(ultimo_id, int(digitos) if digitos.isdigit() else 0)
+
+    @classmethod
+    def reservar_codigos(cls, cantidad):
+        """
+        Reserva `cantidad` códigos de paciente consecutivos.
+        """
+        numeros = Secuencia.reservar(SECUENCIA_CODIGO, cantidad, inicial=cls._codigo_inicial)
+        return [cls.formatear_codigo(numero) for numero in numeros]
+
+    @classmethod
+    def asignar_codigos(cls, pacientes):
+        """
+        Para bulk_create: asigna códigos a los pacientes que no lo tienen con una sola reserva.
+        """
+        pendientes = [p for p in pacientes if not p.codigo]
+        for paciente, codigo in zip(pendientes, cls.reservar_codigos(len(pendientes)) if pendientes else []):
+            paciente.codigo = codigo
+
+    @classmethod
+    def siguiente_codigo(cls):
+        """
+        Código que recibiría el próximo paciente (solo vista previa, no reserva).
+        """
+        return cls.formatear_codigo(Secuencia.siguiente(SECUENCIA_CODIGO, inicial=cls._codigo_inicial))
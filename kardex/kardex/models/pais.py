@@ -1,14 +1,14 @@
 from django.db import models
 from simple_history.models import HistoricalRecords
 
-from config.abstract import StandardModel
+from config.abstract import HistorialConCambios, StandardModel
 
 
 class Pais(StandardModel):
     nombre = models.CharField(max_length=100, unique=True, null=False, verbose_name='Nombre del País')
     cod_pais = models.CharField(max_length=10, unique=True, null=False, verbose_name='Código del País')
 
-    history = HistoricalRecords()
+    history = HistoricalRecords(bases=[HistorialConCambios])
 
     def __str__(self):
         return self.nombre
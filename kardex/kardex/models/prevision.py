@@ -1,13 +1,13 @@
 from django.db import models
 from simple_history.models import HistoricalRecords
 
-from config.abstract import StandardModel
+from config.abstract import HistorialConCambios, StandardModel
 
 
 class Prevision(StandardModel):
     nombre = models.CharField(max_length=100, unique=True, null=False, verbose_name='Nombre')
 
-    history = HistoricalRecords()
+    history = HistoricalRecords(bases=[HistorialConCambios])
 
     def __str__(self):
         return self.nombre
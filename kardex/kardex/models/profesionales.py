@@ -1,11 +1,14 @@
 from django.db import models
 from simple_history.models import HistoricalRecords
 
-from config.abstract import StandardModel
+from config.abstract import HistorialConCambios, StandardModel
+from config.validations import normalize_rut
 
 
 class Profesional(StandardModel):
     rut = models.CharField(max_length=100, unique=True, null=False, verbose_name='R.U.T.')
+    rut_normalizado = models.CharField(max_length=20, null=True, blank=True, db_index=True, editable=False,
+                                       verbose_name='R.U.T. normalizado')
     nombres = models.CharField(max_length=100, null=False, verbose_name='Nombre')
     correo = models.EmailField(max_length=100, null=False, verbose_name='Correo')
     telefono = models.CharField(max_length=15, null=True, blank=True, verbose_name='Teléfono')
@@ -16,7 +19,7 @@ class Profesional(StandardModel):
     establecimiento = models.ForeignKey('kardex.Establecimiento', null=True, blank=True, on_delete=models.SET_NULL,
                                         verbose_name='Establecimiento', related_name='profesionales_establecimiento')
 
-    history = HistoricalRecords()
+    history = HistoricalRecords(bases=[HistorialConCambios])
 
     def __str__(self):
         return self.nombres
@@ -24,6 +27,11 @@ class Profesional(StandardModel):
     def save(self, *args, **kwargs):
         if self.rut:
             self.rut = self.rut.upper()
+        # Columna indexada para búsquedas exactas por RUT (ver config.validations.normalize_rut)
+        self.rut_normalizado = normalize_rut(self.rut) or None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'rut' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'rut_normalizado'}
         if self.nombres:
             self.nombres = self.nombres.upper()
         if self.correo:
@@ -0,0 +1,180 @@
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+# Pasado este tiempo la fila se recalcula completa al consultarla: corrige lo que no pasa por señales
+# (bulk_create de las importaciones) y saca del conteo los cambios con más de 7 días
+VIGENCIA_RESUMEN = timedelta(hours=1)
+DIAS_CAMBIOS_RECIENTES = 7
+
+# Alcance de la fila sin establecimiento (usuarios sin establecimiento asignado ven todas las fichas)
+ALCANCE_GLOBAL = 0
+
+
+class ResumenDashboard(models.Model):
+    """
+    Tarjetas del dashboard precalculadas por establecimiento, para que la portada lea una sola fila en vez
+    de contar pacientes, fichas e historial en cada carga.
+
+    Los totales globales (pacientes, cambios recientes) se suman/restan en todas las filas con un UPDATE
+    al crear o eliminar registros. Fichas, pacientes con ficha y fichas en tránsito se ajustan por diferencia
+    (ajustar()) al crear, mover o eliminar fichas y movimientos; solo actualizar_resumen_dashboard y el
+    vencimiento de la fila (VIGENCIA_RESUMEN) recuentan.
+    """
+    alcance = models.PositiveIntegerField(primary_key=True, verbose_name='ID de establecimiento (0 = todos)')
+    total_pacientes = models.IntegerField(default=0, verbose_name='Total de pacientes')
+    total_ingresos = models.IntegerField(default=0, verbose_name='Pacientes con ficha')
+    total_fichas = models.IntegerField(default=0, verbose_name='Fichas')
+    fichas_en_transito = models.IntegerField(default=0, verbose_name='Fichas en tránsito')
+    cambios_recientes = models.IntegerField(default=0, verbose_name='Cambios de pacientes (7 días)')
+    recalculado_en = models.DateTimeField(null=True, blank=True, verbose_name='Recalculado en')
+
+    def __str__(self):
+        return f"Resumen del establecimiento {self.alcance or 'global'}"
+
+    class Meta:
+        verbose_name = 'Resumen del Dashboard'
+        verbose_name_plural = 'Resúmenes del Dashboard'
+
+    @property
+    def tarjetas(self):
+        # Nombres que usa la plantilla dashboard/index.html
+        return {
+            'total_pacientes': self.total_pacientes,
+            'total_ingresos_est': self.total_ingresos,
+            'total_fichas_est': self.total_fichas,
+            'fichas_en_transito': self.fichas_en_transito,
+            'cambios_recientes_count': self.cambios_recientes,
+        }
+
+    @staticmethod
+    def alcance_de(establecimiento):
+        return getattr(establecimiento, 'pk', establecimiento) or ALCANCE_GLOBAL
+
+    @classmethod
+    def obtener(cls, establecimiento):
+        """
+        Resumen del establecimiento (o global si es None). Se calcula si no existe o si está vencido.
+        """
+        alcance = cls.alcance_de(establecimiento)
+        resumen = cls.objects.filter(pk=alcance).first()
+        if resumen is None or resumen.recalculado_en is None \
+                or resumen.recalculado_en < timezone.now() - VIGENCIA_RESUMEN:
+            resumen = cls.recalcular([alcance])[0]
+        return resumen
+
+    @staticmethod
+    def _conteos_fichas(alcance):
+        from kardex.models import Ficha
+
+        fichas = Ficha.objects.all()
+        if alcance != ALCANCE_GLOBAL:
+            fichas = fichas.filter(establecimiento_id=alcance, paciente__status='ACTIVE')
+        return {
+            'total_ingresos': fichas.values('paciente').distinct().count(),
+            'total_fichas': fichas.count(),
+        }
+
+    @staticmethod
+    def _conteo_transito(alcance):
+        from kardex.models import FichaUbicacion
+
+        transito = FichaUbicacion.objects.filter(en_transito=True)
+        if alcance != ALCANCE_GLOBAL:
+            transito = transito.filter(establecimiento_id=alcance)
+        return {'fichas_en_transito': transito.count()}
+
+    @classmethod
+    def recalcular(cls, alcances=None):
+        """
+        Reconstruye las filas de `alcances` (IDs de establecimiento, 0 = global). Sin `alcances`, la fila
+        global y todas las ya existentes.
+        """
+        from kardex.models import Paciente
+
+        if alcances is None:
+            alcances = {ALCANCE_GLOBAL, *cls.objects.values_list('pk', flat=True)}
+        desde = timezone.now() - timedelta(days=DIAS_CAMBIOS_RECIENTES)
+        globales = {
+            'total_pacientes': Paciente.objects.count(),
+            'cambios_recientes': Paciente.history.filter(history_date__gte=desde).count(),
+        }
+        resumenes = []
+        for alcance in alcances:
+            resumen, _ = cls.objects.update_or_create(pk=alcance, defaults={
+                **globales, **cls._conteos_fichas(alcance), **cls._conteo_transito(alcance),
+                'recalculado_en': timezone.now(),
+            })
+            resumenes.append(resumen)
+        return resumenes
+
+    @classmethod
+    def ajustar(cls, diferencias):
+        """
+        Al confirmar la transacción, suma {alcance: {campo: n}} a esas filas (un UPDATE con F() por fila), sin
+        recontar. Las filas que aún no existen se calculan completas al consultarlas.
+        """
+        diferencias = {alcance: {campo: n for campo, n in campos.items() if n}
+                       for alcance, campos in diferencias.items()}
+        diferencias = {alcance: campos for alcance, campos in diferencias.items() if campos}
+        if not diferencias:
+            return
+
+        def aplicar():
+            for alcance, campos in diferencias.items():
+                cls.objects.filter(pk=alcance).update(**{campo: F(campo) + n for campo, n in campos.items()})
+
+        transaction.on_commit(aplicar)
+
+    @classmethod
+    def sumar_transito(cls, diferencias):
+        """
+        Suma {establecimiento_id: +/-n} a las fichas en tránsito de esos establecimientos y el total a la fila
+        global (ver ajustar()).
+        """
+        filas = {e: {'fichas_en_transito': n} for e, n in diferencias.items() if e}
+        filas[ALCANCE_GLOBAL] = {'fichas_en_transito': sum(diferencias.values())}
+        cls.ajustar(filas)
+
+    @classmethod
+    def sumar_ficha(cls, ficha_id, establecimiento_id, paciente_id, signo):
+        """
+        Suma (signo 1) o resta (-1) una ficha a total_fichas y, si es la única del paciente, a total_ingresos:
+        en la fila global y en la de su establecimiento si el paciente está activo (como _conteos_fichas).
+        """
+        from kardex.models import Ficha, Paciente
+
+        otras = Ficha.objects.filter(paciente_id=paciente_id).exclude(pk=ficha_id)
+        unica = paciente_id is not None and not otras.exists()
+        diferencias = {ALCANCE_GLOBAL: {'total_fichas': signo, 'total_ingresos': signo if unica else 0}}
+        if establecimiento_id and paciente_id is not None \
+                and Paciente.objects.filter(pk=paciente_id, status='ACTIVE').exists():
+            unica_en_establecimiento = unica or not otras.filter(establecimiento_id=establecimiento_id).exists()
+            diferencias[establecimiento_id] = {'total_fichas': signo,
+                                               'total_ingresos': signo if unica_en_establecimiento else 0}
+        cls.ajustar(diferencias)
+
+    @classmethod
+    def sumar_paciente_activo(cls, paciente_id, signo):
+        """
+        Un paciente pasa a activo (signo 1) o deja de estarlo (-1): sus fichas entran o salen de los conteos
+        de cada establecimiento.
+        """
+        from kardex.models import Ficha
+
+        por_establecimiento = Ficha.objects.filter(paciente_id=paciente_id, establecimiento__isnull=False) \
+            .values('establecimiento_id').annotate(fichas=Count('pk')).values_list('establecimiento_id', 'fichas')
+        cls.ajustar({
+            establecimiento_id: {'total_fichas': signo * fichas, 'total_ingresos': signo}
+            for establecimiento_id, fichas in por_establecimiento
+        })
+
+    @classmethod
+    def sumar(cls, **campos):
+        """
+        Suma (o resta) a los totales globales de todas las filas con un solo UPDATE.
+        """
+        cls.objects.update(**{campo: F(campo) + valor for campo, valor in campos.items()})
+
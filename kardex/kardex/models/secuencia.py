@@ -0,0 +1,54 @@
+from django.db import IntegrityError, models, transaction
+
+
+class Secuencia(models.Model):
+    """
+    Secuencias con nombre (p. ej. códigos de paciente). Se reservan bloques bajo SELECT ... FOR UPDATE
+    para asignar el valor antes del INSERT, también en bulk_create.
+    """
+    nombre = models.CharField(max_length=50, primary_key=True, verbose_name='Nombre')
+    ultimo_valor = models.PositiveBigIntegerField(default=0, verbose_name='Último valor')
+
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo_valor}"
+
+    class Meta:
+        verbose_name = 'Secuencia'
+        verbose_name_plural = 'Secuencias'
+
+    @classmethod
+    def _bloquear(cls, nombre, inicial):
+        # Debe llamarse dentro de transaction.atomic()
+        try:
+            return cls.objects.select_for_update().get(nombre=nombre)
+        except cls.DoesNotExist:
+            pass
+        try:
+            with transaction.atomic():
+                return cls.objects.create(nombre=nombre, ultimo_valor=inicial() if inicial else 0)
+        except IntegrityError:
+            # Otra transacción la creó en paralelo
+            return cls.objects.select_for_update().get(nombre=nombre)
+
+    @classmethod
+    def reservar(cls, nombre, cantidad=1, inicial=None):
+        """
+        Reserva `cantidad` valores consecutivos y los devuelve como range.
+        `inicial` (callable) da el punto de partida la primera vez que se usa la secuencia.
+        """
+        with transaction.atomic():
+            secuencia = cls._bloquear(nombre, inicial)
+            inicio = secuencia.ultimo_valor + 1
+            secuencia.ultimo_valor += cantidad
+            secuencia.save(update_fields=['ultimo_valor'])
+        return range(inicio, inicio + cantidad)
+
+    @classmethod
+    def siguiente(cls, nombre, inicial=None):
+        """
+        Próximo valor de la secuencia (solo vista previa, no reserva).
+        """
+        ultimo = cls.objects.filter(nombre=nombre).values_list('ultimo_valor', flat=True).first()
+        if ultimo is None:
+            ultimo = inicial() if inicial else 0
+        return ultimo + 1
@@ -1,7 +1,7 @@
 from django.db import models
 from simple_history.models import HistoricalRecords
 
-from config.abstract import StandardModel
+from config.abstract import HistorialConCambios, StandardModel
 
 
 class ServicioClinico(StandardModel):
@@ -14,7 +14,7 @@ class ServicioClinico(StandardModel):
                                         verbose_name='Establecimiento',
                                         related_name='servicios_clinicos_establecimiento')
 
-    history = HistoricalRecords()
+    history = HistoricalRecords(bases=[HistorialConCambios])
 
     def __str__(self):
         return self.nombre
@@ -1,17 +1,20 @@
 from django.db import models
 from simple_history.models import HistoricalRecords
 
-from config.abstract import StandardModel
+from config.abstract import HistorialConCambios, StandardModel
+from config.validations import normalize_rut
 
 
 class UsuarioAnterior(StandardModel):
     rut = models.CharField(primary_key=True, max_length=100, unique=True, null=False, verbose_name='R.U.T.')
+    rut_normalizado = models.CharField(max_length=20, null=True, blank=True, db_index=True, editable=False,
+                                       verbose_name='R.U.T. normalizado')
     nombre = models.CharField(max_length=100, null=False, verbose_name='Nombre')
     correo = models.EmailField(max_length=100, null=False, verbose_name='Correo')
     establecimiento = models.ForeignKey('kardex.Establecimiento', on_delete=models.PROTECT, null=True, blank=True,
                                         verbose_name='Establecimiento',
                                         related_name='usuarios_anteriores_establecimientos')
-    history = HistoricalRecords()
+    history = HistoricalRecords(bases=[HistorialConCambios])
 
     def __str__(self):
         return self.nombre
@@ -19,6 +22,11 @@ class UsuarioAnterior(StandardModel):
     def save(self, *args, **kwargs):
         if self.nombre:
             self.nombre = self.nombre.upper()
+        # Columna indexada para búsquedas exactas por RUT (ver config.validations.normalize_rut)
+        self.rut_normalizado = normalize_rut(self.rut) or None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'rut' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'rut_normalizado'}
         super().save(*args, **kwargs)
 
     class Meta:
@@ -1,14 +1,109 @@
+from collections import Counter
+
+from django.db.models.signals import post_delete
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from simple_history.signals import post_create_historical_record, pre_create_historical_record
 
-from kardex.models import Paciente
+from kardex.busqueda import indexar_pacientes
+from kardex.catalogos import es_catalogo, invalidar_catalogo
+from kardex.historial import cambios_de_registro
+from kardex.mixin import invalidate_datatable_counts
+from kardex.models import Ficha, FichaUbicacion, MovimientoFicha, Paciente, ResumenDashboard
 
 
 @receiver(post_save, sender=Paciente)
-def asignar_codigo_paciente(sender, instance, created, **kwargs):
-    # Dejar como respaldo: si por alguna razón el código no fue asignado en save(),
-    # actualizarlo sin disparar señales ni historial adicional.
-    if created and not instance.codigo:
-        Paciente.objects.filter(pk=instance.pk, codigo__isnull=True).update(
-            codigo=f"PAC-{instance.pk:07d}"
-        )
+def indexar_busqueda_paciente(sender, instance, created, **kwargs):
+    # Mantener el índice de búsqueda (PacienteBusqueda) al día con los datos del paciente
+    if kwargs.get('raw'):
+        return
+    indexar_pacientes([instance])
+
+
+@receiver(pre_create_historical_record)
+def registrar_cambios_historial(sender, instance, history_instance, **kwargs):
+    # Diferencias de la actualización guardadas en el propio registro histórico (ver kardex.historial)
+    if history_instance.history_type != '~' or not hasattr(history_instance, 'history_cambios'):
+        return
+    history_instance.history_cambios = cambios_de_registro(instance, history_instance)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidar_conteos_datatable(sender, **kwargs):
+    # Los totales cacheados de DataTableMixin dependen del modelo; las tablas de historial no se listan
+    if sender._meta.app_label != 'kardex' or sender.__name__.startswith('Historical'):
+        return
+    if kwargs.get('created') is False and kwargs.get('update_fields'):
+        # Actualizaciones parciales (asignar código o número de ficha) no cambian los totales,
+        # salvo que toquen 'status', que filtra la mayoría de los listados
+        if 'status' not in kwargs['update_fields']:
+            return
+    invalidate_datatable_counts(sender)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidar_cache_catalogos(sender, **kwargs):
+    # Comunas, previsiones, sectores, servicios clínicos y profesionales: nueva versión del catálogo
+    if es_catalogo(sender):
+        invalidar_catalogo(sender)
+
+
+@receiver(post_delete, sender=MovimientoFicha)
+def recalcular_ubicacion_ficha(sender, instance, **kwargs):
+    # Si se elimina el último movimiento, la ubicación vuelve a calcularse desde el historial
+    if instance.ficha_id:
+        ubicacion = FichaUbicacion.objects.filter(ficha_id=instance.ficha_id)
+        antes = ubicacion.values_list('establecimiento_id', 'en_transito').first()
+        FichaUbicacion.recalcular([instance.ficha_id])
+        despues = ubicacion.values_list('establecimiento_id', 'en_transito').first()
+        # Fichas en tránsito del dashboard: diferencia entre la ubicación anterior y la recalculada
+        transito = Counter()
+        for signo, valores in ((-1, antes), (1, despues)):
+            if valores:
+                transito[valores[0]] += signo * valores[1]
+        ResumenDashboard.sumar_transito(transito)
+
+
+@receiver(post_save, sender=Paciente)
+def resumen_dashboard_paciente(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    update_fields = kwargs.get('update_fields')
+    if created:
+        ResumenDashboard.sumar(total_pacientes=1)
+    elif (update_fields is None or 'status' in update_fields) and instance.campos_modificados(['status']):
+        # Los conteos de fichas por establecimiento solo consideran pacientes activos
+        anterior = instance.valor_cargado('status')
+        if anterior is not None and (anterior == 'ACTIVE') != (instance.status == 'ACTIVE'):
+            ResumenDashboard.sumar_paciente_activo(instance.pk, 1 if instance.status == 'ACTIVE' else -1)
+
+@receiver(post_delete, sender=Paciente)
+def resumen_dashboard_paciente_eliminado(sender, instance, **kwargs):
+    ResumenDashboard.sumar(total_pacientes=-1)
+
+
+@receiver(post_create_historical_record)
+def resumen_dashboard_cambio_paciente(sender, history_instance, **kwargs):
+    # Los cambios que salen de la ventana de 7 días se descuentan al recalcular la fila (VIGENCIA_RESUMEN)
+    if isinstance(history_instance, Paciente.history.model):
+        ResumenDashboard.sumar(cambios_recientes=1)
+
+
+@receiver(post_save, sender=Ficha)
+def resumen_dashboard_ficha(sender, instance, created, **kwargs):
+    # Se suma al crear la ficha; si cambia de establecimiento o paciente se resta con los valores anteriores
+    if kwargs.get('raw'):
+        return
+    if not created:
+        if not instance.campos_modificados(['establecimiento', 'paciente']):
+            return
+        ResumenDashboard.sumar_ficha(instance.pk, instance.valor_cargado('establecimiento_id'),
+                                     instance.valor_cargado('paciente_id'), -1)
+    ResumenDashboard.sumar_ficha(instance.pk, instance.establecimiento_id, instance.paciente_id, 1)
+
+
+@receiver(post_delete, sender=Ficha)
+def resumen_dashboard_ficha_eliminada(sender, instance, **kwargs):
+    ResumenDashboard.sumar_ficha(instance.pk, instance.establecimiento_id, instance.paciente_id, -1)
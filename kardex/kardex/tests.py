@@ -1,3 +1,389 @@
-from django.test import TestCase
+import json
+import os
+from importlib import import_module
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from kardex.catalogos import CATALOGO_TIMEOUT, timeout_catalogo
+from kardex.checks import revisar_cache_compartida
+from kardex.models import (
+    Comuna, Establecimiento, Ficha, FichaUbicacion, MovimientoFicha, Paciente, Profesional, ResumenDashboard,
+    ServicioClinico, UsuarioAnterior,
+)
+from kardex.models.resumen_dashboard import ALCANCE_GLOBAL
+from kardex.views.api.recepcion_ficha import RecepcionFichaViewSet
+from kardex.views.ficha import FichaListView
+from kardex.views.movimiento_fichas import MovimientoFichaTransitoListView
+from kardex.views.movimiento_fichas_update import SalidaFichaLoteView
+from usuarios.models import UsuarioPersonalizado
+
+
+class DataTableKeysetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        comuna = Comuna.objects.create(nombre='COMUNA', codigo='1')
+        establecimiento = Establecimiento.objects.create(nombre='ESTABLECIMIENTO', direccion='DIRECCION',
+                                                         telefono='1', comuna=comuna)
+        # Una de cada tres fichas sin número de tarjeta (NULL), intercaladas por id
+        for i in range(30):
+            Ficha.objects.create(numero_ficha_sistema=i + 1, establecimiento=establecimiento,
+                                 numero_ficha_tarjeta=None if i % 3 == 0 else 100 - i % 7)
+
+    def paginar(self, direccion, length=7):
+        # Recorre todas las páginas de la tabla ordenada por N° Tarjeta con el cursor de cada respuesta
+        ids, cursor, start = [], None, 0
+        while True:
+            params = {'draw': 1, 'start': start, 'length': length, 'order[0][column]': 2,
+                      'order[0][dir]': direccion}
+            if cursor:
+                params['cursor'] = cursor
+            view = FichaListView()
+            view.request = RequestFactory().get('/', params)
+            view.request.user = AnonymousUser()
+            respuesta = json.loads(view.get_datatable_response(view.request).content)
+            if not respuesta['data']:
+                return ids
+            ids += [fila['ID'] for fila in respuesta['data']]
+            cursor, start = respuesta['cursor'], start + length
+
+    def test_conteo_estimado_solo_sin_filtros(self):
+        view = FichaListView()
+        view.datatable_count_strategy = 'estimated'
+        view.datatable_count_estimate_threshold = 1
+        with mock.patch('kardex.mixin.estimate_table_rows', return_value=500):
+            self.assertEqual(view.get_records_total(Ficha.objects.all()), 500)
+            # La estadística es de toda la tabla: con filtro se cuenta
+            self.assertEqual(view.get_records_total(Ficha.objects.filter(numero_ficha_tarjeta=None)), 10)
+
+    def test_keyset_incluye_valores_nulos(self):
+        for direccion, orden in (('asc', 'numero_ficha_tarjeta'), ('desc', '-numero_ficha_tarjeta')):
+            with self.subTest(direccion=direccion):
+                esperado = list(Ficha.objects.order_by(orden, orden.replace('numero_ficha_tarjeta', 'pk'))
+                                .values_list('pk', flat=True))
+                self.assertEqual(self.paginar(direccion), esperado)
+
+
+class ImportacionTestCase(TestCase):
+    """
+    Base de las pruebas de los comandos importar_*: datos mínimos y un archivo temporal por prueba.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.comuna = Comuna.objects.create(nombre='COMUNA', codigo='1')
+        cls.establecimiento = Establecimiento.objects.create(nombre='ESTABLECIMIENTO', direccion='DIRECCION',
+                                                             telefono='1', comuna=cls.comuna)
+        cls.usuario_anterior = UsuarioAnterior.objects.create(rut='11111111-1', nombre='usuario',
+                                                              correo='usuario@example.com')
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+
+    def archivo(self, nombre, lineas):
+        ruta = os.path.join(self.directorio.name, nombre)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lineas) + '\n')
+        return ruta
+
+    def ejecutar(self, comando, *args, **opciones):
+        call_command(comando, *args, stdout=StringIO(), stderr=StringIO(), **opciones)
+
+
+class ImportarFichasTests(ImportacionTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.paciente = Paciente.objects.create(rut='12345678-5', nombre='ANA', apellido_paterno='PEREZ',
+                                               apellido_materno='SOTO', sexo='FEMENINO', estado_civil='SOLTERO(A)',
+                                               comuna=cls.comuna, prevision=None)
+
+    def test_numeros_faltantes_no_toman_numeros_de_bloques_posteriores(self):
+        est = self.establecimiento.id
+        ruta = self.archivo('fichas.csv', [
+            'paciente_id;usuario_id;establecimiento_id;numero_ficha_sistema;fecha_creacion_anterior;observacion',
+            *[f'12345678-5;;{est};;;' for _ in range(3)],
+            *[f'12.345.678-5;;{est};{numero};;' for numero in (1, 2, 3)],
+        ])
+
+        self.ejecutar('importar_fichas', ruta, chunk_size=3)
+
+        numeros = Ficha.objects.filter(establecimiento=self.establecimiento) \
+            .order_by('numero_ficha_sistema').values_list('numero_ficha_sistema', flat=True)
+        self.assertEqual(list(numeros), [1, 2, 3, 4, 5, 6])
+
+
+class ImportarMovimientosFichasTests(ImportacionTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.profesional = Profesional.objects.create(rut='22222222-2', nombres='profesional',
+                                                     correo='profesional@example.com')
+        cls.ficha = Ficha.objects.create(numero_ficha_sistema=10, establecimiento=cls.establecimiento)
+
+    def test_resuelve_usuario_anterior_por_rut(self):
+        # La clave primaria de UsuarioAnterior es el RUT (texto), no un id entero
+        ruta = self.archivo('movimientos.csv', [
+            'establecimiento;rut_anterior;ficha;fecha_envio;fecha_recepcion;usuario_envio_anterior;'
+            'usuario_recepcion_anterior;profesional_recepcion;servicio_clinico_recepcion;observacion_envio;'
+            'observacion_recepcion;observacion_traspaso;estado_recepcion',
+            f'{self.establecimiento.id};1-9;10;2024-01-02 10:00:00;2024-01-03 10:00:00;11.111.111-1;;'
+            f'22222222-2;;envio;;;R',
+            f'{self.establecimiento.id};1-9;10;2024-02-02 10:00:00;;;;;;;;;',
+        ])
+
+        self.ejecutar('importar_movimientos_fichas', ruta)
+
+        movimientos = MovimientoFicha.objects.filter(ficha=self.ficha).order_by('fecha_envio')
+        self.assertEqual(movimientos.count(), 2)
+        primero, segundo = movimientos
+        self.assertEqual(primero.usuario_envio_anterior_id, '11111111-1')
+        self.assertIsNone(primero.usuario_recepcion_anterior_id)
+        self.assertEqual(primero.profesional_recepcion_id, self.profesional.id)
+        self.assertEqual(primero.estado_recepcion, 'RECIBIDO')
+        self.assertIsNone(segundo.usuario_envio_anterior_id)
+
+
+class ImportarPacientesBulkTests(ImportacionTestCase):
+    encabezado = 'rut;nombre;apellido_paterno;apellido_materno;sexo;estado_civil;comuna_id;usuario_anterior_id;direccion'
+
+    def test_crea_y_actualiza_con_usuario_anterior(self):
+        ruta = self.archivo('pacientes.csv', [
+            self.encabezado,
+            f'12345678-5;Ana;Perez;Soto;FEMENINO;SOLTERO(A);{self.comuna.id};11.111.111-1;calle 1',
+            f'7654321-6;Luis;Rojas;Diaz;MASCULINO;CASADO(A);{self.comuna.id};;calle 2',
+        ])
+        self.ejecutar('importar_pacientes', ruta, bulk=True)
+
+        ana = Paciente.objects.get(rut_normalizado='123456785')
+        self.assertEqual(ana.usuario_anterior_id, '11111111-1')
+        self.assertIsNone(Paciente.objects.get(rut_normalizado='76543216').usuario_anterior_id)
+
+        ruta = self.archivo('pacientes_2.csv', [
+            self.encabezado,
+            f'12345678-5;Ana;Perez;Soto;FEMENINO;SOLTERO(A);{self.comuna.id};11.111.111-1;calle 3',
+        ])
+        self.ejecutar('importar_pacientes', ruta, bulk=True)
+
+        ana.refresh_from_db()
+        self.assertEqual(ana.direccion, 'CALLE 3')
+        actualizacion = ana.history.filter(history_type='~').get()
+        self.assertEqual(actualizacion.history_cambios, {'direccion': ['CALLE 1', 'CALLE 3']})
+
+
+class RecepcionMasivaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        comuna = Comuna.objects.create(nombre='COMUNA', codigo='1')
+        cls.establecimiento = Establecimiento.objects.create(nombre='ESTABLECIMIENTO', direccion='DIRECCION',
+                                                             telefono='1', comuna=comuna)
+        cls.usuario = UsuarioPersonalizado.objects.create(username='usuario', establecimiento=cls.establecimiento)
+        ficha = Ficha.objects.create(numero_ficha_sistema=1, establecimiento=cls.establecimiento)
+        cls.movimiento = MovimientoFicha.objects.create(ficha=ficha, establecimiento=cls.establecimiento)
+
+    def recibir(self, datos):
+        request = APIRequestFactory().post('/', datos, format='json')
+        force_authenticate(request, user=self.usuario)
+        return RecepcionFichaViewSet.as_view({'post': 'mark_received_bulk'})(request)
+
+    def test_profesional_inexistente_responde_400(self):
+        respuesta = self.recibir({'movimientos': [self.movimiento.id], 'profesional_recepcion': 999})
+
+        self.assertEqual(respuesta.status_code, 400)
+        self.movimiento.refresh_from_db()
+        self.assertNotEqual(self.movimiento.estado_recepcion, 'RECIBIDO')
+
+    def test_profesional_existente(self):
+        profesional = Profesional.objects.create(rut='22222222-2', nombres='profesional',
+                                                 correo='profesional@example.com')
+        respuesta = self.recibir({'movimientos': [self.movimiento.id], 'profesional_recepcion': profesional.id})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.movimiento.refresh_from_db()
+        self.assertEqual(self.movimiento.estado_recepcion, 'RECIBIDO')
+        self.assertEqual(self.movimiento.profesional_recepcion_id, profesional.id)
+
+    def test_historial_guarda_cambios(self):
+        respuesta = self.recibir({'movimientos': [self.movimiento.id]})
+
+        self.assertEqual(respuesta.status_code, 200)
+        registro = self.movimiento.history.latest('history_date')
+        self.assertEqual(registro.history_type, '~')
+        self.assertEqual(registro.history_user, self.usuario)
+        self.assertEqual(registro.history_cambios['estado_recepcion'][1], 'RECIBIDO')
+
+
+
+class SalidaFichaLoteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        comuna = Comuna.objects.create(nombre='COMUNA', codigo='1')
+        cls.establecimiento = Establecimiento.objects.create(nombre='ESTABLECIMIENTO', direccion='DIRECCION',
+                                                             telefono='1', comuna=comuna)
+        otro = Establecimiento.objects.create(nombre='OTRO', direccion='DIRECCION', telefono='1', comuna=comuna)
+        cls.usuario = UsuarioPersonalizado.objects.create(username='usuario', establecimiento=cls.establecimiento,
+                                                          is_superuser=True)
+        cls.envio = ServicioClinico.objects.create(nombre='ENVIO', establecimiento=cls.establecimiento)
+        cls.recepcion = ServicioClinico.objects.create(nombre='RECEPCION', establecimiento=cls.establecimiento)
+        cls.servicio_otro = ServicioClinico.objects.create(nombre='OTRO', establecimiento=otro)
+        cls.profesional = Profesional.objects.create(rut='22222222-2', nombres='profesional',
+                                                     correo='profesional@example.com',
+                                                     establecimiento=cls.establecimiento)
+        cls.ficha = Ficha.objects.create(numero_ficha_sistema=1, establecimiento=cls.establecimiento)
+
+    def enviar(self, **datos):
+        datos = {'servicio_envio_id': self.envio.id, 'servicio_recepcion_id': self.recepcion.id,
+                 'profesional_id': self.profesional.id, 'fichas': [self.ficha.id], **datos}
+        request = RequestFactory().post('/', json.dumps(datos), content_type='application/json')
+        request.user = self.usuario
+        return SalidaFichaLoteView.as_view()(request)
+
+    def test_servicio_o_profesional_invalido_responde_400(self):
+        for datos in ({'servicio_recepcion_id': 999}, {'servicio_recepcion_id': self.servicio_otro.id},
+                      {'profesional_id': 999}, {'profesional_id': 'x'}):
+            with self.subTest(datos=datos):
+                respuesta = self.enviar(**datos)
+                self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(MovimientoFicha.objects.exists())
+
+    def test_lote_valido(self):
+        respuesta = self.enviar()
+
+        self.assertEqual(respuesta.status_code, 200)
+        movimiento = MovimientoFicha.objects.get()
+        self.assertEqual(movimiento.servicio_clinico_recepcion_id, self.recepcion.id)
+        self.assertEqual(movimiento.profesional_envio_id, self.profesional.id)
+
+class ResumenDashboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        comuna = Comuna.objects.create(nombre='COMUNA', codigo='1')
+        cls.establecimiento = Establecimiento.objects.create(nombre='ESTABLECIMIENTO', direccion='DIRECCION',
+                                                             telefono='1', comuna=comuna)
+        cls.paciente = Paciente.objects.create(rut='12345678-5', nombre='ANA', apellido_paterno='PEREZ',
+                                               apellido_materno='SOTO', sexo='FEMENINO', estado_civil='SOLTERO(A)',
+                                               comuna=comuna, prevision=None)
+        cls.ficha = Ficha.objects.create(numero_ficha_sistema=1, establecimiento=cls.establecimiento,
+                                         paciente=cls.paciente)
+
+    def setUp(self):
+        ResumenDashboard.recalcular([ALCANCE_GLOBAL, self.establecimiento.id])
+
+    def transito(self):
+        return dict(ResumenDashboard.objects.values_list('pk', 'fichas_en_transito'))
+
+    def conteos(self):
+        return {pk: (ingresos, fichas) for pk, ingresos, fichas in
+                ResumenDashboard.objects.values_list('pk', 'total_ingresos', 'total_fichas')}
+
+    def test_movimientos_ajustan_fichas_en_transito_sin_recontar(self):
+        with mock.patch.object(ResumenDashboard, 'recalcular') as recontar:
+            with self.captureOnCommitCallbacks(execute=True):
+                movimiento = MovimientoFicha.objects.create(ficha=self.ficha, establecimiento=self.establecimiento)
+            self.assertEqual(self.transito(), {ALCANCE_GLOBAL: 1, self.establecimiento.id: 1})
+
+            movimiento = MovimientoFicha.objects.get(pk=movimiento.pk)
+            movimiento.estado_recepcion = 'RECIBIDO'
+            with self.captureOnCommitCallbacks(execute=True):
+                movimiento.save()
+            self.assertEqual(self.transito(), {ALCANCE_GLOBAL: 0, self.establecimiento.id: 0})
+        recontar.assert_not_called()
+
+    def test_paciente_ajusta_conteos_solo_si_cambia_su_estado(self):
+        paciente = Paciente.objects.get(pk=self.paciente.pk)
+        with mock.patch.object(ResumenDashboard, 'recalcular') as recontar:
+            paciente.direccion = 'CALLE 2'
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                paciente.save()
+            self.assertEqual(callbacks, [])
+
+            paciente.status = 'INACTIVE'
+            with self.captureOnCommitCallbacks(execute=True):
+                paciente.save()
+            self.assertEqual(self.conteos(), {ALCANCE_GLOBAL: (1, 1), self.establecimiento.id: (0, 0)})
+
+            paciente.status = 'ACTIVE'
+            with self.captureOnCommitCallbacks(execute=True):
+                paciente.save()
+            self.assertEqual(self.conteos(), {ALCANCE_GLOBAL: (1, 1), self.establecimiento.id: (1, 1)})
+        recontar.assert_not_called()
+
+    def test_fichas_ajustan_conteos_sin_recontar(self):
+        otro = Establecimiento.objects.create(nombre='OTRO', direccion='DIRECCION', telefono='1',
+                                              comuna=self.establecimiento.comuna)
+        ResumenDashboard.recalcular([otro.id])
+        ficha = Ficha.objects.get(pk=self.ficha.pk)
+        with mock.patch.object(ResumenDashboard, 'recalcular') as recontar:
+            ficha.observacion = 'OBSERVACION'
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                ficha.save()
+            self.assertEqual(callbacks, [])
+
+            # Segunda ficha del mismo paciente: suma fichas, no pacientes con ficha
+            with self.captureOnCommitCallbacks(execute=True):
+                segunda = Ficha.objects.create(numero_ficha_sistema=2, establecimiento=self.establecimiento,
+                                               paciente=self.paciente)
+            self.assertEqual(self.conteos(), {ALCANCE_GLOBAL: (1, 2), self.establecimiento.id: (1, 2),
+                                              otro.id: (0, 0)})
+
+            segunda.establecimiento = otro
+            with self.captureOnCommitCallbacks(execute=True):
+                segunda.save()
+            self.assertEqual(self.conteos(), {ALCANCE_GLOBAL: (1, 2), self.establecimiento.id: (1, 1),
+                                              otro.id: (1, 1)})
+
+            with self.captureOnCommitCallbacks(execute=True):
+                segunda.delete()
+                ficha.delete()
+            self.assertEqual(self.conteos(), {ALCANCE_GLOBAL: (0, 0), self.establecimiento.id: (0, 0),
+                                              otro.id: (0, 0)})
+        recontar.assert_not_called()
+        # Los ajustes coinciden con un recuento completo
+        self.assertEqual(self.conteos(), {r.pk: (r.total_ingresos, r.total_fichas)
+                                          for r in ResumenDashboard.recalcular([ALCANCE_GLOBAL, otro.id,
+                                                                                self.establecimiento.id])})
+
+class FichasEnTransitoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        comuna = Comuna.objects.create(nombre='COMUNA', codigo='1')
+        cls.establecimiento = Establecimiento.objects.create(nombre='ESTABLECIMIENTO', direccion='DIRECCION',
+                                                             telefono='1', comuna=comuna)
+        cls.ficha = Ficha.objects.create(numero_ficha_sistema=1, establecimiento=cls.establecimiento)
+
+    def test_movimiento_anterior_a_la_tabla_de_ubicaciones(self):
+        movimiento = MovimientoFicha.objects.create(ficha=self.ficha, establecimiento=self.establecimiento)
+        # Movimiento guardado antes de que existiera FichaUbicacion (0031)
+        FichaUbicacion.objects.all().delete()
+
+        import_module('kardex.migrations.0037_completar_fichaubicacion').completar_ubicaciones(apps, None)
+
+        self.assertIn(movimiento, MovimientoFichaTransitoListView().get_base_queryset())
+
+
+class CacheCatalogosTests(SimpleTestCase):
+    archivo = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                           'LOCATION': tempfile.gettempdir(), 'TIMEOUT': 300}}
+    locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'TIMEOUT': 300}}
+
+    def test_locmem_usa_el_timeout_de_la_cache(self):
+        with override_settings(CACHES=self.locmem, DEBUG=False):
+            self.assertEqual(timeout_catalogo(), 300)
+            self.assertEqual([w.id for w in revisar_cache_compartida()], ['kardex.W003'])
+        with override_settings(CACHES=self.archivo, DEBUG=False):
+            self.assertEqual(timeout_catalogo(), CATALOGO_TIMEOUT)
+            self.assertEqual(revisar_cache_compartida(), [])
@@ -1,10 +1,11 @@
 from rest_framework import viewsets, filters, serializers
 from rest_framework.permissions import IsAuthenticated
 
+from kardex.catalogos import CatalogoCacheMixin
 from kardex.models import ServicioClinico, Profesional
 
 
-class ServicioClinicoViewSet(viewsets.ReadOnlyModelViewSet):
+class ServicioClinicoViewSet(CatalogoCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = ServicioClinico.objects.filter(status='ACTIVE').order_by('nombre')
     permission_classes = [IsAuthenticated]
 
@@ -21,7 +22,7 @@ class ServicioClinicoViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ['nombre']
 
 
-class ProfesionalViewSet(viewsets.ReadOnlyModelViewSet):
+class ProfesionalViewSet(CatalogoCacheMixin, viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     class Serializer(serializers.ModelSerializer):
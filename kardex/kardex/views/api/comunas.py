@@ -1,6 +1,7 @@
 # serializers.py
 from rest_framework import serializers, viewsets
 
+from kardex.catalogos import CatalogoCacheMixin
 from kardex.models import Comuna
 
 
@@ -11,6 +12,6 @@ class ComunaSerializer(serializers.ModelSerializer):
 
 
 # views.py
-class ComunaViewSet(viewsets.ReadOnlyModelViewSet):
+class ComunaViewSet(CatalogoCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Comuna.objects.order_by("nombre")
     serializer_class = ComunaSerializer
@@ -7,6 +7,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.contrib import messages
 
+from config.validations import normalize_rut
 from kardex.models import Ficha
 from kardex.models import Paciente, Establecimiento
 
@@ -84,7 +85,7 @@ class FichaViewSet(viewsets.ReadOnlyModelViewSet):
         establecimiento = getattr(user, 'establecimiento', None)
 
         if tipo_busqueda == 'rut' and search_term:
-            paciente = Paciente.objects.filter(rut__iexact=search_term).first()
+            paciente = Paciente.objects.filter(rut_normalizado=normalize_rut(search_term)).first()
             if not paciente:
                 return Response({
                     'status': 'not_found',
@@ -132,7 +133,7 @@ class FichaViewSet(viewsets.ReadOnlyModelViewSet):
             except Paciente.DoesNotExist:
                 return Response({'detail': 'Paciente no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         elif rut:
-            paciente = Paciente.objects.filter(rut__iexact=rut).first()
+            paciente = Paciente.objects.filter(rut_normalizado=normalize_rut(rut)).first()
             if not paciente:
                 return Response({'detail': 'Paciente no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         else:
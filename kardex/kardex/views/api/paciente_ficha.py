@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 
+from config.validations import normalize_rut
 from kardex.models import Paciente, Ficha
 from kardex.models.paciente_ficha import VistaFichaPaciente
 
@@ -96,14 +97,17 @@ class PacienteFichaViewSet(ViewSet):
             return Response({"error": "Debe indicar RUT o número de ficha."}, status=400)
 
         vista = None
+        paciente = None
 
-        # Buscar por RUT
+        # Buscar por RUT: se resuelve el paciente por la columna indexada y luego su ficha en la vista
         if rut:
-            rut = rut.strip().lower()
-            vista = VistaFichaPaciente.objects.filter(
-                rut=rut,
-                establecimiento_id=establecimiento_id
-            ).first()
+            rut_normalizado = normalize_rut(rut)
+            paciente = Paciente.objects.filter(rut_normalizado=rut_normalizado).first() if rut_normalizado else None
+            if paciente:
+                vista = VistaFichaPaciente.objects.filter(
+                    paciente_id=paciente.id,
+                    establecimiento_id=establecimiento_id
+                ).first()
 
         # Buscar por número de ficha
         elif numero_ficha:
@@ -128,7 +132,6 @@ class PacienteFichaViewSet(ViewSet):
 
         # ============ CASO 2: EXISTE PACIENTE SIN FICHA ============
         if rut:
-            paciente = Paciente.objects.filter(rut=rut).first()
             if paciente:
                 data_paciente = {
                     "paciente_id": paciente.id,
@@ -205,8 +208,9 @@ class PacienteFichaViewSet(ViewSet):
             return Response({"error": "RUT requerido."}, status=400)
 
         paciente, creado = Paciente.objects.get_or_create(
-            rut=rut,
+            rut_normalizado=normalize_rut(rut),
             defaults={
+                "rut": rut,
                 "nombre": request.data.get("nombre"),
                 "apellido_paterno": request.data.get("apellido_paterno"),
                 "apellido_materno": request.data.get("apellido_materno"),
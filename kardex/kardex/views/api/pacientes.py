@@ -2,6 +2,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import serializers
 from rest_framework import viewsets, filters
 
+from kardex.busqueda import buscar_pacientes
 from kardex.models import Paciente
 
 
@@ -11,14 +12,26 @@ class PacienteSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class PacienteSearchFilter(filters.SearchFilter):
+    """
+    ?search=... sobre el índice PacienteBusqueda (mismos campos que search_fields, por prefijo y sin tildes).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        return buscar_pacientes(queryset, ' '.join(search_terms))
+
+
 class PacienteViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = PacienteSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, PacienteSearchFilter]
     # Permitir búsqueda por múltiples campos comunes de identificación
     search_fields = ['rut', 'codigo', 'nombre', 'apellido_paterno', 'apellido_materno']
     queryset = Paciente.objects.all()
 
     def get_queryset(self):
-        # Se deja que SearchFilter maneje el parámetro ?search=...
+        # Se deja que PacienteSearchFilter maneje el parámetro ?search=...
         # Solo definimos un orden por defecto estable.
         return Paciente.objects.all().order_by('-id')
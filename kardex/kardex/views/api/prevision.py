@@ -1,6 +1,7 @@
 # serializers.py
 from rest_framework import serializers, viewsets
 
+from kardex.catalogos import CatalogoCacheMixin
 from kardex.models import Prevision
 
 
@@ -11,6 +12,6 @@ class PrevisionSerializer(serializers.ModelSerializer):
 
 
 # views.py
-class PrevisionViewSet(viewsets.ReadOnlyModelViewSet):
+class PrevisionViewSet(CatalogoCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Prevision.objects.order_by("nombre")
     serializer_class = PrevisionSerializer
@@ -1,10 +1,19 @@
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from django.utils import timezone
 from rest_framework import serializers, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from kardex.models import MovimientoFicha, Ficha, Paciente, Establecimiento, ServicioClinico
+from kardex.historial import crear_historial_actualizacion
+from kardex.mixin import invalidate_datatable_counts
+from kardex.models import (
+    MovimientoFicha, Ficha, FichaUbicacion, Paciente, Establecimiento, Profesional, ServicioClinico,
+)
 
 
 class EstablecimientoSerializer(serializers.ModelSerializer):
@@ -86,7 +95,6 @@ class RecepcionFichaViewSet(viewsets.ModelViewSet):
         fecha_recepcion = request.data.get('fecha_recepcion')
         obs = request.data.get('observacion_recepcion')
         profesional_id = request.data.get('profesional_recepcion')
-        from datetime import datetime
 
         if fecha_recepcion:
             try:
@@ -101,7 +109,6 @@ class RecepcionFichaViewSet(viewsets.ModelViewSet):
             m.observacion_recepcion = obs
         if profesional_id:
             try:
-                from kardex.models import Profesional
                 m.profesional_recepcion = Profesional.objects.get(pk=profesional_id)
             except Exception:
                 pass
@@ -110,3 +117,108 @@ class RecepcionFichaViewSet(viewsets.ModelViewSet):
         m.save()
 
         return Response({'ok': True, 'id': m.id})
+
+    @action(detail=False, methods=['post'], url_path='mark_received_bulk')
+    def mark_received_bulk(self, request):
+        """
+        Recepción masiva. Acepta `movimientos` (ids) y/o `fichas` (números de ficha del sistema);
+        para cada ficha se toma su último movimiento por fecha de envío, como en la recepción individual.
+        Devuelve el resultado por elemento, indicando los que ya estaban RECIBIDO.
+        """
+        try:
+            movimiento_ids = [int(x) for x in request.data.get('movimientos') or []]
+            numeros_ficha = [int(x) for x in request.data.get('fichas') or []]
+        except (TypeError, ValueError):
+            return Response({'ok': False, 'error': 'Identificadores inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+        if not movimiento_ids and not numeros_ficha:
+            return Response({'ok': False, 'error': 'Debe indicar movimientos o fichas.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Se asigna por id en bulk_update: validar antes, un id inexistente fallaría dentro de la transacción
+        profesional_id = request.data.get('profesional_recepcion') or None
+        if profesional_id is not None:
+            try:
+                profesional_id = int(profesional_id)
+            except (TypeError, ValueError):
+                profesional_id = None
+            if profesional_id is None or not Profesional.objects.filter(pk=profesional_id).exists():
+                return Response({'ok': False, 'error': 'Profesional no encontrado'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        establecimiento = request.user.establecimiento
+        base = MovimientoFicha.objects.filter(ficha__establecimiento=establecimiento)
+
+        # Último movimiento de cada ficha en una sola consulta (ventana por ficha)
+        por_numero = {}
+        if numeros_ficha:
+            ultimos = base.filter(ficha__numero_ficha_sistema__in=numeros_ficha).annotate(
+                orden=Window(RowNumber(), partition_by=F('ficha_id'), order_by=F('fecha_envio').desc())
+            ).filter(orden=1).values_list('ficha__numero_ficha_sistema', 'id')
+            por_numero = dict(ultimos)
+
+        por_id = set(base.filter(id__in=movimiento_ids).values_list('id', flat=True)) if movimiento_ids else set()
+
+        fecha_recepcion = request.data.get('fecha_recepcion')
+        try:
+            dt = datetime.fromisoformat(fecha_recepcion) if fecha_recepcion else timezone.now()
+        except (TypeError, ValueError):
+            dt = timezone.now()
+        obs = request.data.get('observacion_recepcion')
+        servicio_clinico = getattr(request.user, 'servicio_clinico', None)
+
+        solicitados = set(por_numero.values()) | por_id
+        fields = ['fecha_recepcion', 'usuario_recepcion', 'estado_recepcion', 'updated_at']
+        if obs is not None:
+            fields.append('observacion_recepcion')
+        if profesional_id:
+            fields.append('profesional_recepcion')
+        if servicio_clinico is not None:
+            fields.append('servicio_clinico_recepcion')
+
+        with transaction.atomic():
+            # Releer con bloqueo: el estado puede haber cambiado desde la consulta anterior
+            movimientos = {m.id: m for m in MovimientoFicha.objects.select_for_update().filter(id__in=solicitados)}
+            ya_recibidos = {pk for pk, m in movimientos.items() if m.estado_recepcion == 'RECIBIDO'}
+            actualizar = []
+            anteriores = []
+            ahora = timezone.now()
+            for pk, m in movimientos.items():
+                if pk in ya_recibidos:
+                    continue
+                anteriores.append(dict(m._valores_cargados))
+                m.fecha_recepcion = dt
+                m.usuario_recepcion = request.user
+                m.estado_recepcion = 'RECIBIDO'
+                m.updated_at = ahora
+                if obs is not None:
+                    m.observacion_recepcion = obs
+                if profesional_id:
+                    m.profesional_recepcion_id = profesional_id
+                if servicio_clinico is not None:
+                    m.servicio_clinico_recepcion = servicio_clinico
+                actualizar.append(m)
+            if actualizar:
+                MovimientoFicha.objects.bulk_update(actualizar, fields)
+                # Con los valores leídos antes del cambio: el historial guarda sus cambios (history_cambios)
+                crear_historial_actualizacion(MovimientoFicha, actualizar, anteriores, default_user=request.user)
+                FichaUbicacion.registrar_lote(actualizar)
+
+        if actualizar:
+            # bulk_update no emite post_save
+            invalidate_datatable_counts(MovimientoFicha)
+
+        def resultado(pk, **extra):
+            if pk is None or pk not in movimientos:
+                return {**extra, 'ok': False, 'error': 'No encontrado'}
+            if pk in ya_recibidos:
+                return {**extra, 'id': pk, 'ok': False, 'error': 'El movimiento ya fue recepcionado.'}
+            return {**extra, 'id': pk, 'ok': True}
+
+        resultados = [resultado(pk, movimiento=pk) for pk in movimiento_ids]
+        resultados += [resultado(por_numero.get(numero), ficha=numero) for numero in numeros_ficha]
+
+        return Response({
+            'ok': True,
+            'recibidos': len(actualizar),
+            'ya_recibidos': sorted(ya_recibidos),
+            'resultados': resultados,
+        })
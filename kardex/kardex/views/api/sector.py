@@ -1,6 +1,7 @@
 # serializers.py
 from rest_framework import serializers, viewsets
 
+from kardex.catalogos import CatalogoCacheMixin
 from kardex.models import Sector
 
 
@@ -11,6 +12,6 @@ class SectorSerializer(serializers.ModelSerializer):
 
 
 # views.py
-class SectorViewSet(viewsets.ReadOnlyModelViewSet):
+class SectorViewSet(CatalogoCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Sector.objects.order_by("color")
     serializer_class = SectorSerializer
@@ -37,10 +37,20 @@ class FichaListView(PermissionRequiredMixin, DataTableMixin, TemplateView):
 
     permission_view = 'kardex.view_ficha'
 
+    # Tablas de millones de filas: paginación keyset en vez de OFFSET
+    datatable_keyset = True
+    datatable_count_strategy = 'cached'
+
     url_detail = 'kardex:ficha_detail'
     url_update = 'kardex:ficha_update'
     export_report_url_name = 'reports:export_ficha'
 
+    datatable_fields = [
+        'id', 'numero_ficha_sistema', 'numero_ficha_tarjeta', 'created_at', 'establecimiento__nombre',
+        'paciente__rut', 'paciente__codigo', 'paciente__nombre', 'paciente__apellido_paterno',
+        'paciente__apellido_materno'
+    ]
+
     def render_row(self, obj):
         pac = getattr(obj, 'paciente', None)
         est = getattr(obj, 'establecimiento', None)
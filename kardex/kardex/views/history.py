@@ -5,6 +5,7 @@ from django.http import HttpRequest
 from django.urls import reverse_lazy
 from django.views.generic import TemplateView
 
+from kardex.historial import describir_cambios
 from kardex.mixin import DataTableMixin
 
 
@@ -35,10 +36,10 @@ class GenericHistoryListView(PermissionRequiredMixin, DataTableMixin, TemplateVi
     base_model: Optional[Type] = None
 
     # Columnas por defecto para históricos
-    datatable_columns = ['ID', 'Fecha', 'Usuario', 'Acción', 'Motivo', 'Objeto']
+    datatable_columns = ['ID', 'Fecha', 'Usuario', 'Acción', 'Motivo', 'Objeto', 'Cambios']
     # Campos para ordenar (usamos nombres del modelo histórico)
     datatable_order_fields = ['history_id', None, 'history_date', 'history_user__username', 'history_type',
-                              'history_change_reason']
+                              'history_change_reason', None, None]
     # Campos para buscar
     datatable_search_fields = [
         'history_user__username__icontains',
@@ -116,6 +117,8 @@ class GenericHistoryListView(PermissionRequiredMixin, DataTableMixin, TemplateVi
             'Acción': self._history_type_verbose(getattr(obj, 'history_type', '')),
             'Motivo': getattr(obj, 'history_change_reason', '') or '',
             'Objeto': self.get_object_str(obj),
+            # Guardados al escribir el histórico (kardex.historial); vacío en creaciones y eliminaciones
+            'Cambios': describir_cambios(getattr(obj, 'history_cambios', None), limite=5),
         }
 
     def get_context_data(self, **kwargs):
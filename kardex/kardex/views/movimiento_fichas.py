@@ -12,7 +12,7 @@ from kardex.forms.movimiento_ficha import FormEntradaFicha, FiltroSalidaFichaFor
 from kardex.forms.movimiento_ficha import FormSalidaFicha
 from kardex.forms.movimiento_ficha import FormTraspasoFicha
 from kardex.mixin import DataTableMixin
-from kardex.models import MovimientoFicha, Ficha
+from kardex.models import MovimientoFicha, Ficha, FichaUbicacion
 from kardex.models import Profesional
 from kardex.views.history import GenericHistoryListView
 
@@ -61,9 +61,7 @@ class RecepcionFichaView(LoginRequiredMixin, PermissionRequiredMixin, DataTableM
                                                   establecimiento=user.establecimiento).first()
 
             try:
-                mov = MovimientoFicha.objects.filter(
-                    ficha=ficha_instance
-                ).order_by('-fecha_envio').first()
+                mov = FichaUbicacion.movimiento_actual(ficha_instance) if ficha_instance else None
             except Exception:
                 mov = None
 
@@ -167,6 +165,12 @@ class RecepcionFichaView(LoginRequiredMixin, PermissionRequiredMixin, DataTableM
 
         return qs
 
+    datatable_fields = [
+        'id', 'ficha__numero_ficha_sistema', 'ficha__paciente__rut', 'ficha__paciente__nombre',
+        'ficha__paciente__apellido_paterno', 'ficha__paciente__apellido_materno', 'servicio_clinico_envio__nombre',
+        'profesional_envio__nombres', 'fecha_envio', 'estado_recepcion'
+    ]
+
     def render_row(self, obj):
         pac = obj.ficha.paciente if obj.ficha else None
         nombre = f"{getattr(pac, 'nombre', '')} {getattr(pac, 'apellido_paterno', '')} {getattr(pac, 'apellido_materno', '')}" if pac else ''
@@ -305,6 +309,12 @@ class SalidaFichaView(LoginRequiredMixin, PermissionRequiredMixin, DataTableMixi
 
         return qs
 
+    datatable_fields = [
+        'id', 'ficha__numero_ficha_sistema', 'ficha__paciente__rut', 'ficha__paciente__nombre',
+        'ficha__paciente__apellido_paterno', 'ficha__paciente__apellido_materno', 'servicio_clinico_envio__nombre',
+        'usuario_envio__username', 'observacion_envio', 'fecha_envio', 'estado_envio'
+    ]
+
     def render_row(self, obj):
         pac = obj.ficha.paciente if obj.ficha else None
         nombre = f"{getattr(pac, 'nombre', '')} {getattr(pac, 'apellido_paterno', '')} {getattr(pac, 'apellido_materno', '')}" if pac else ''
@@ -339,10 +349,7 @@ class TraspasoFichaView(LoginRequiredMixin, PermissionRequiredMixin, TemplateVie
             fecha_traspaso = form.cleaned_data.get('fecha_traspaso')
 
             try:
-                mov = MovimientoFicha.objects.filter(
-                    ficha=ficha,
-                    fecha_envio__isnull=False
-                ).order_by('-updated_at').first()
+                mov = FichaUbicacion.movimiento_actual(ficha) if ficha else None
             except Exception:
                 mov = None
 
@@ -416,11 +423,22 @@ class MovimientoFichaListView(PermissionRequiredMixin, DataTableMixin, TemplateV
     raise_exception = True
 
     permission_view = 'kardex.view_movimiento_ficha'
+
+    # Tablas de millones de filas: paginación keyset en vez de OFFSET
+    datatable_keyset = True
+    datatable_count_strategy = 'cached'
     permission_update = 'kardex.change_movimiento_ficha'
 
     url_detail = 'kardex:movimiento_ficha_detail'
     url_update = 'kardex:movimiento_ficha_update'
 
+    datatable_fields = [
+        'id', 'ficha__numero_ficha_sistema', 'ficha__paciente__rut', 'ficha__paciente__nombre',
+        'ficha__paciente__apellido_paterno', 'ficha__paciente__apellido_materno', 'servicio_clinico_envio__nombre',
+        'servicio_clinico_recepcion__nombre', 'profesional_envio__nombres', 'observacion_envio', 'fecha_envio',
+        'estado_envio'
+    ]
+
     def render_row(self, obj):
         pac = obj.ficha.paciente if obj.ficha else None
         nombre = f"{getattr(pac, 'nombre', '')} {getattr(pac, 'apellido_paterno', '')} {getattr(pac, 'apellido_materno', '')}" if pac else ''
@@ -575,6 +593,12 @@ class MovimientoFichaTransitoListView(PermissionRequiredMixin, DataTableMixin, T
     url_detail = 'kardex:movimiento_ficha_detail'
     url_update = 'kardex:movimiento_ficha_update'
 
+    datatable_fields = [
+        'id', 'ficha__numero_ficha_sistema', 'ficha__paciente__rut', 'ficha__paciente__nombre',
+        'ficha__paciente__apellido_paterno', 'ficha__paciente__apellido_materno', 'servicio_clinico_envio__nombre',
+        'usuario_envio__username', 'observacion_envio', 'fecha_envio', 'estado_envio'
+    ]
+
     def render_row(self, obj):
         pac = obj.ficha.paciente if obj.ficha else None
         nombre = f"{getattr(pac, 'nombre', '')} {getattr(pac, 'apellido_paterno', '')} {getattr(pac, 'apellido_materno', '')}" if pac else ''
@@ -608,13 +632,14 @@ class MovimientoFichaTransitoListView(PermissionRequiredMixin, DataTableMixin, T
         return context
 
     def get_base_queryset(self):
-        # En tránsito: ENVIADO y no recepcionado aún, o TRASPASDO
+        # En tránsito: último movimiento de cada ficha pendiente de recepción o traspasado (tabla FichaUbicacion)
         from django.db.models import Q
+        actuales = FichaUbicacion.objects.filter(
+            Q(en_transito=True) | Q(estado='TRASPASADO')
+        ).values('movimiento_id')
         qs = MovimientoFicha.objects.select_related(
             'ficha__paciente', 'servicio_clinico_envio', 'usuario_envio'
-        ).filter(
-            Q(estado_envio='ENVIADO') & ~Q(estado_recepcion='RECIBIDO') | Q(estado_traspaso='TRASPASDO')
-        )
+        ).filter(id__in=actuales)
         return qs
 
 
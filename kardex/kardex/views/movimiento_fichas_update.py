@@ -1,20 +1,26 @@
 # views.py
 
 import json
+import logging
 
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
+from django.db import transaction
 from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.utils.decorators import method_decorator
+from django.utils.timezone import now
 from django.views.decorators.csrf import csrf_exempt
-from django.views.generic import CreateView
+from django.views.generic import CreateView, View
 from django.views.generic.base import TemplateView
+from simple_history.utils import bulk_create_with_history
 
 from kardex.forms.movimiento_ficha import FiltroSalidaFichaForm
 from kardex.forms.movimiento_ficha_update import FormSalidaFicha
-from kardex.mixin import DataTableMixin
-from kardex.models import MovimientoFicha, Profesional
+from kardex.mixin import DataTableMixin, invalidate_datatable_counts
+from kardex.models import Ficha, FichaUbicacion, MovimientoFicha, Profesional, ServicioClinico
+
+logger = logging.getLogger(__name__)
 
 
 class SalidaFicha2View(PermissionRequiredMixin, LoginRequiredMixin, CreateView):
@@ -77,11 +83,7 @@ class SalidaFicha2View(PermissionRequiredMixin, LoginRequiredMixin, CreateView):
                 # VALIDACIÓN CRÍTICA:
                 # No permitir salida si la ficha ya tiene un movimiento EN TRÁNSITO
                 # ------------------------------------------------------------------
-                movimiento_abierto = MovimientoFicha.objects.filter(
-                    ficha_id=ficha_id,
-                    estado_recepcion='EN ESPERA',
-                    establecimiento=request.user.establecimiento
-                ).exists()
+                movimiento_abierto = bool(FichaUbicacion.fichas_en_transito([ficha_id], request.user.establecimiento))
 
                 if movimiento_abierto:
                     return JsonResponse({
@@ -157,6 +159,141 @@ class SalidaFicha2View(PermissionRequiredMixin, LoginRequiredMixin, CreateView):
         return response
 
 
+class SalidaFichaLoteView(PermissionRequiredMixin, LoginRequiredMixin, View):
+    """
+    Registro de salida de un lote de fichas escaneadas en una sola petición AJAX.
+
+    Recibe JSON con la configuración común (servicios, profesional, observación) y la lista
+    `fichas` de ids. Valida todo el lote con una consulta y crea los movimientos con bulk_create
+    (incluido el historial). Devuelve el resultado por ficha en el mismo orden recibido.
+    """
+    permission_required = 'kardex.add_movimientoficha'
+    raise_exception = True
+
+    max_fichas = 1000
+
+    def post(self, request, *args, **kwargs):
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'success': False, 'error': 'Datos JSON inválidos'}, status=400)
+
+        for field in ['servicio_envio_id', 'servicio_recepcion_id', 'profesional_id', 'fichas']:
+            if field not in data or not data[field]:
+                return JsonResponse({
+                    'success': False,
+                    'error': f'Campo requerido faltante: {field}'
+                }, status=400)
+
+        if str(data['servicio_envio_id']) == str(data['servicio_recepcion_id']):
+            return JsonResponse({
+                'success': False,
+                'error': 'El servicio de recepción no puede ser igual al de envío.'
+            }, status=400)
+
+        fichas = data['fichas']
+        if not isinstance(fichas, list) or len(fichas) > self.max_fichas:
+            return JsonResponse({
+                'success': False,
+                'error': f'Debe enviar una lista de hasta {self.max_fichas} fichas.'
+            }, status=400)
+
+        try:
+            ficha_ids = [int(ficha_id) for ficha_id in fichas]
+        except (TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'Identificadores de ficha inválidos'}, status=400)
+
+        establecimiento = request.user.establecimiento
+
+        # Los ids se asignan directo a los movimientos: validar antes (como el formulario de salida), un id
+        # inexistente o de otro establecimiento fallaría recién al insertar
+        try:
+            servicio_ids = {int(data['servicio_envio_id']), int(data['servicio_recepcion_id'])}
+            profesional_id = int(data['profesional_id'])
+        except (TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'Identificadores de servicio o profesional inválidos'},
+                                status=400)
+        servicios_validos = ServicioClinico.objects.filter(
+            id__in=servicio_ids, status='ACTIVE', establecimiento=establecimiento
+        ).count()
+        if servicios_validos != len(servicio_ids):
+            return JsonResponse({
+                'success': False,
+                'error': 'Servicio clínico no encontrado en su establecimiento.'
+            }, status=400)
+        if not Profesional.objects.filter(id=profesional_id, status='ACTIVE', establecimiento=establecimiento).exists():
+            return JsonResponse({
+                'success': False,
+                'error': 'Profesional no encontrado en su establecimiento.'
+            }, status=400)
+
+        try:
+            with transaction.atomic():
+                # Bloquear las fichas del lote: dos lotes simultáneos no pueden enviar la misma ficha
+                numeros = dict(
+                    Ficha.objects.select_for_update()
+                    .filter(id__in=ficha_ids, establecimiento=establecimiento)
+                    .values_list('id', 'numero_ficha_sistema')
+                )
+                en_transito = FichaUbicacion.fichas_en_transito(numeros.keys(), establecimiento)
+
+                resultados = []
+                movimientos = []
+                vistos = set()
+                fecha_envio = now()
+                for ficha_id in ficha_ids:
+                    resultado = {'ficha_id': ficha_id, 'ficha_numero': numeros.get(ficha_id, '')}
+                    if ficha_id in vistos:
+                        resultado.update(success=False, error='Ficha repetida en el lote.')
+                    elif ficha_id not in numeros:
+                        resultado.update(success=False, error='Ficha no encontrada en su establecimiento.')
+                    elif ficha_id in en_transito:
+                        resultado.update(success=False, error=(
+                            'La ficha se encuentra actualmente en tránsito y no puede '
+                            'ser enviada nuevamente hasta ser recepcionada.'
+                        ))
+                    else:
+                        movimiento = MovimientoFicha(
+                            ficha_id=ficha_id,
+                            servicio_clinico_envio_id=int(data['servicio_envio_id']),
+                            servicio_clinico_recepcion_id=int(data['servicio_recepcion_id']),
+                            profesional_envio_id=profesional_id,
+                            observacion_envio=data.get('observacion', ''),
+                            usuario_envio=request.user,
+                            establecimiento=establecimiento,
+                            estado_envio='ENVIADO',
+                            estado_recepcion='EN ESPERA',
+                            fecha_envio=fecha_envio,
+                        )
+                        movimiento.aplicar_valores_creacion()
+                        movimientos.append(movimiento)
+                        resultado['success'] = True
+                    vistos.add(ficha_id)
+                    resultados.append(resultado)
+
+                creados = bulk_create_with_history(movimientos, MovimientoFicha, default_user=request.user)
+                FichaUbicacion.registrar_lote(creados)
+        except Exception:
+            logger.exception('Error al registrar la salida del lote de fichas')
+            return JsonResponse({'success': False, 'error': 'No se pudo registrar la salida del lote.'}, status=500)
+
+        # bulk_create no emite post_save: invalidar a mano los conteos cacheados de las tablas
+        invalidate_datatable_counts(MovimientoFicha)
+
+        ids_por_ficha = {movimiento.ficha_id: movimiento.pk for movimiento in creados}
+        for resultado in resultados:
+            if resultado['success']:
+                resultado['movimiento_id'] = ids_por_ficha.get(resultado['ficha_id'])
+
+        return JsonResponse({
+            'success': True,
+            'creados': len(creados),
+            'rechazados': len(resultados) - len(creados),
+            'timestamp': fecha_envio.strftime('%H:%M:%S'),
+            'resultados': resultados,
+        })
+
+
 class SalidaTablaFichaView(LoginRequiredMixin, DataTableMixin, TemplateView):
     template_name = 'kardex/movimiento_ficha/tabla_salida_ficha_update.html'
     model = MovimientoFicha
@@ -253,6 +390,12 @@ class SalidaTablaFichaView(LoginRequiredMixin, DataTableMixin, TemplateView):
 
         return qs
 
+    datatable_fields = [
+        'id', 'ficha__numero_ficha_sistema', 'ficha__paciente__rut', 'ficha__paciente__nombre',
+        'ficha__paciente__apellido_paterno', 'ficha__paciente__apellido_materno', 'servicio_clinico_envio__nombre',
+        'usuario_envio__username', 'observacion_envio', 'fecha_envio', 'estado_envio'
+    ]
+
     def render_row(self, obj):
         pac = obj.ficha.paciente if obj.ficha else None
         nombre = f"{getattr(pac, 'nombre', '')} {getattr(pac, 'apellido_paterno', '')} {getattr(pac, 'apellido_materno', '')}" if pac else ''
@@ -355,6 +498,12 @@ class RecepcionTablaFichaView(LoginRequiredMixin, DataTableMixin, TemplateView):
 
         return qs
 
+    datatable_fields = [
+        'id', 'ficha__numero_ficha_sistema', 'ficha__paciente__rut', 'ficha__paciente__nombre',
+        'ficha__paciente__apellido_paterno', 'ficha__paciente__apellido_materno', 'servicio_clinico_envio__nombre',
+        'usuario_envio__username', 'fecha_envio', 'estado_recepcion'
+    ]
+
     def render_row(self, obj):
         pac = obj.ficha.paciente if obj.ficha else None
         nombre = f"{getattr(pac, 'nombre', '')} {getattr(pac, 'apellido_paterno', '')} {getattr(pac, 'apellido_materno', '')}" if pac else ''
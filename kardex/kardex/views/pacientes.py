@@ -8,10 +8,13 @@ from django.views.generic import DetailView, UpdateView
 from django.views.generic import TemplateView
 from django.views.generic.edit import FormView
 
+from config.validations import normalize_rut
+from kardex.busqueda import buscar_pacientes
 from kardex.forms.pacientes import FormPacienteActualizarRut, FormPacienteSinRut
 from kardex.forms.pacientes import PacienteFechaRangoForm
 from kardex.forms.pacientes_fichas import PacienteForm
 from kardex.mixin import DataTableMixin
+from kardex.models import ContadorFicha
 from kardex.models import Ficha
 from kardex.models import Paciente
 from kardex.views.history import GenericHistoryListView
@@ -46,16 +49,29 @@ class PacienteListView(PermissionRequiredMixin, DataTableMixin, TemplateView):
 
     permission_view = 'kardex.view_paciente'
 
+    # Tablas de millones de filas: paginación keyset en vez de OFFSET
+    datatable_keyset = True
+    datatable_count_strategy = 'cached'
+
     permission_required = 'kardex.view_paciente'
     raise_exception = True
 
     url_detail = 'kardex:paciente_detail'
     url_update = 'kardex:paciente_update'
 
+    datatable_fields = [
+        'id', 'rut', 'nombre', 'apellido_paterno', 'apellido_materno', 'sexo', 'estado_civil', 'comuna__nombre',
+        'prevision__nombre'
+    ]
+
     def get_base_queryset(self):
         # Vista libre: no limitar por establecimiento, mostrar todos los pacientes
         return Paciente.objects.filter(status='ACTIVE')
 
+    def filter_queryset(self, qs, search_value):
+        # Búsqueda por el índice PacienteBusqueda (prefijo por palabra, sin tildes) en vez de icontains
+        return buscar_pacientes(qs, search_value, incluir_catalogos=True)
+
     def render_row(self, obj):
         nombre_completo = f"{(obj.nombre or '').upper()} {(obj.apellido_paterno or '').upper()} {(obj.apellido_materno or '').upper()}".strip()
         return {
@@ -188,6 +204,10 @@ class PacienteRecienNacidoListView(PacienteListView):
         'prevision__nombre__icontains'
     ]
 
+    datatable_fields = [
+        'id', 'codigo', 'nombre', 'sexo', 'rut_responsable_temporal', 'comuna__nombre', 'prevision__nombre'
+    ]
+
     def render_row(self, obj):
         return {
             'ID': obj.id,
@@ -244,6 +264,11 @@ class PacienteExtranjeroListView(PacienteListView):
         'prevision__nombre__icontains'
     ]
 
+    datatable_fields = [
+        'id', 'codigo', 'rut', 'nombre', 'nip', 'pasaporte', 'sexo', 'estado_civil', 'comuna__nombre',
+        'prevision__nombre'
+    ]
+
     def render_row(self, obj):
         return {
             'ID': obj.id,
@@ -297,6 +322,10 @@ class PacienteRutMadreListView(PacienteListView):
         'prevision__nombre__icontains'
     ]
 
+    datatable_fields = [
+        'id', 'codigo', 'nombre', 'sexo', 'rut_responsable_temporal', 'comuna__nombre', 'prevision__nombre'
+    ]
+
     def render_row(self, obj):
         return {
             'ID': obj.id,
@@ -469,7 +498,8 @@ class PacienteQueryView(PermissionRequiredMixin, FormView):
             # BUSCAR O CREAR PACIENTE
             # --------------------------------------------
             rut = datos.get('rut')
-            paciente = Paciente.objects.filter(rut=rut).first()
+            rut_normalizado = normalize_rut(rut)
+            paciente = Paciente.objects.filter(rut_normalizado=rut_normalizado).first() if rut_normalizado else None
 
             creating = False
             if not paciente:
@@ -648,16 +678,8 @@ class PacienteCreateSinRutView(PermissionRequiredMixin, FormView):
             establecimiento = getattr(self.request.user, 'establecimiento', None)
 
             if establecimiento:
-                # Obtener el máximo número de ficha para este establecimiento
-                from django.db.models import Max
-                max_ficha = Ficha.objects.filter(
-                    establecimiento=establecimiento
-                ).aggregate(
-                    max_numero=Max('numero_ficha_sistema')
-                )
-
-                siguiente_numero = (max_ficha['max_numero'] or 0) + 1
-                context['siguiente_numero_ficha'] = siguiente_numero
+                # Vista previa desde el contador del establecimiento (no reserva el número)
+                context['siguiente_numero_ficha'] = ContadorFicha.siguiente(establecimiento.pk)
             else:
                 context['siguiente_numero_ficha'] = "No disponible"
 
@@ -669,23 +691,10 @@ class PacienteCreateSinRutView(PermissionRequiredMixin, FormView):
         # ===================
 
         try:
-            ultimo_paciente = Paciente.objects.order_by('-id').first()
-
-            if ultimo_paciente and ultimo_paciente.codigo:
-
-                # Eliminar all excepto números
-                import re
-                numero = int(re.sub(r'\D', '', ultimo_paciente.codigo))
-
-                nuevo_codigo = f"PAC-{numero + 1:06d}"
-
-            else:
-                nuevo_codigo = "PAC-000001"
-
-            context['codigo_paciente_preview'] = nuevo_codigo
-
-        except:
-            context['codigo_paciente_preview'] = "PAC-000001"
+            # Vista previa desde la secuencia de códigos (no reserva el código)
+            context['codigo_paciente_preview'] = Paciente.siguiente_codigo()
+        except Exception:
+            context['codigo_paciente_preview'] = "No disponible"
 
         context['title'] = f'Formulario de Paciente Sin Rut'
         return context
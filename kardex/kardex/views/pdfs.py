@@ -8,6 +8,7 @@ from django.contrib.auth.decorators import permission_required
 from django.http import Http404
 from django.shortcuts import render, get_object_or_404
 
+from config.validations import normalize_rut
 from kardex.models import Ficha
 from kardex.models import Paciente
 
@@ -116,15 +117,8 @@ def pdf_stickers(request, ficha_id=None, paciente_id=None):
 
 
 def obtener_numero_rut(rut_str: str) -> str:
-    if not rut_str:
-        return ''
-    # Normalizar: quitar separadores y conservar todos los caracteres del RUT incluyendo DV
-    s = str(rut_str).strip()
-    # Eliminar separadores comunes (puntos, guiones y espacios), conservar alfanuméricos
-    cleaned = ''.join(ch for ch in s if ch.isalnum())
-    # En Chile el DV puede ser 'K' o 'k'; normalizamos a mayúscula
-    cleaned = cleaned.upper()
-    return cleaned
+    # Mismo formato canónico que rut_normalizado (sin separadores, DV en mayúscula)
+    return normalize_rut(rut_str)
 
 
 def generar_barcode_base64(codigo_paciente: str) -> str:
@@ -0,0 +1,62 @@
+from django.http import FileResponse
+from django.urls import reverse
+from rest_framework import mixins, serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from reports.exportaciones import EXPORTACIONES
+from reports.models import FORMATO_EXPORTACION, TrabajoExportacion
+
+
+class TrabajoExportacionSerializer(serializers.ModelSerializer):
+    progreso = serializers.IntegerField(read_only=True)
+    url_descarga = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrabajoExportacion
+        fields = ('id', 'tipo', 'formato', 'estado', 'progreso', 'filas_procesadas', 'total_filas', 'tamano',
+                  'error', 'created_at', 'iniciado_en', 'terminado_en', 'url_descarga')
+        read_only_fields = fields
+
+    def get_url_descarga(self, obj):
+        if obj.estado != 'COMPLETADO':
+            return None
+        return reverse('reports:exportacion-descargar', args=[obj.pk])
+
+
+class SolicitudExportacionSerializer(serializers.Serializer):
+    tipo = serializers.ChoiceField(choices=sorted(EXPORTACIONES))
+    formato = serializers.ChoiceField(choices=FORMATO_EXPORTACION, default='csv')
+
+
+class TrabajoExportacionViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    POST encola una exportación (o devuelve una equivalente reciente); GET consulta estado y avance;
+    descargar/ entrega el archivo cuando está COMPLETADO.
+    """
+    serializer_class = TrabajoExportacionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return TrabajoExportacion.visibles_para(self.request.user).order_by('-created_at')
+
+    def create(self, request):
+        solicitud = SolicitudExportacionSerializer(data=request.data)
+        if not solicitud.is_valid():
+            return Response({'ok': False, 'error': solicitud.errors}, status=status.HTTP_400_BAD_REQUEST)
+        trabajo, creado = TrabajoExportacion.solicitar(usuario=request.user, **solicitud.validated_data)
+        return Response(self.get_serializer(trabajo).data,
+                        status=status.HTTP_202_ACCEPTED if creado else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def tipos(self, request):
+        return Response(sorted(EXPORTACIONES))
+
+    @action(detail=True, methods=['get'])
+    def descargar(self, request, pk=None):
+        trabajo = self.get_object()
+        if trabajo.estado != 'COMPLETADO' or not trabajo.ruta.exists():
+            return Response({'ok': False, 'error': 'La exportación no está disponible.'},
+                            status=status.HTTP_409_CONFLICT)
+        return FileResponse(open(trabajo.ruta, 'rb'), as_attachment=True, filename=trabajo.nombre_descarga)
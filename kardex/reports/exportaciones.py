@@ -0,0 +1,68 @@
+"""
+Exportaciones disponibles: consulta, columnas y nombre de archivo de cada una. Las usan tanto las vistas de
+descarga directa (reports.views) como los trabajos en segundo plano (TrabajoExportacion).
+"""
+from kardex.models import Ficha, MovimientoFicha, Paciente
+from .fields_export_csv import fields_ficha_csv, fields_movimiento_ficha_csv, fields_paciente_csv
+
+
+class Exportacion:
+    """
+    `consulta(establecimiento)` arma el queryset. Con `por_establecimiento` el resultado depende del
+    establecimiento del usuario; si no, es el mismo para todos (y se comparte entre ellos).
+    """
+
+    def __init__(self, filename, fields, consulta, por_establecimiento=False):
+        self.filename = filename
+        self.fields = fields
+        self.consulta = consulta
+        self.por_establecimiento = por_establecimiento
+
+    def queryset(self, establecimiento=None):
+        return self.consulta(establecimiento)
+
+
+def _movimientos(establecimiento, **filtros):
+    return MovimientoFicha.objects.filter(ficha__establecimiento=establecimiento, **filtros).order_by('-updated_at')
+
+
+EXPORTACIONES = {
+    # FICHAS
+    'fichas': Exportacion(
+        'fichas', fields_ficha_csv,
+        lambda est: Ficha.objects.filter(establecimiento=est), por_establecimiento=True),
+    'fichas_pasivadas': Exportacion(
+        'fichas_pasivadas', fields_ficha_csv,
+        lambda est: Ficha.objects.filter(establecimiento=est, pasivado=True), por_establecimiento=True),
+
+    # MOVIMIENTOS FICHAS
+    'movimientos_ficha': Exportacion(
+        'movimientos_ficha', fields_movimiento_ficha_csv,
+        lambda est: _movimientos(est), por_establecimiento=True),
+    'movimientos_ficha_enviadas': Exportacion(
+        'movimientos_ficha_enviadas', fields_movimiento_ficha_csv,
+        lambda est: _movimientos(est, estado_envio='ENVIADO'), por_establecimiento=True),
+    'movimientos_ficha_recepcionadas': Exportacion(
+        'movimientos_ficha_recepcionadas', fields_movimiento_ficha_csv,
+        lambda est: _movimientos(est, estado_recepcion='RECIBIDO'), por_establecimiento=True),
+    'movimientos_ficha_traspasadas': Exportacion(
+        'movimientos_ficha_traspasadas', fields_movimiento_ficha_csv,
+        lambda est: _movimientos(est, estado_traspaso='TRASPASADO'), por_establecimiento=True),
+
+    # PACIENTES
+    'pacientes': Exportacion(
+        'pacientes', fields_paciente_csv,
+        lambda est: Paciente.objects.all()),
+    'pacientes_recien_nacidos': Exportacion(
+        'pacientes_recien_nacidos_csv', fields_paciente_csv,
+        lambda est: Paciente.objects.filter(recien_nacido=True)),
+    'pacientes_extranjeros': Exportacion(
+        'pacientes_extranjeros_csv', fields_paciente_csv,
+        lambda est: Paciente.objects.filter(extranjero=True)),
+    'pacientes_fallecidos': Exportacion(
+        'pacientes_fallecids_csv', fields_paciente_csv,
+        lambda est: Paciente.objects.filter(fallecido=True)),
+    'pacientes_pueblo_indigena': Exportacion(
+        'pacientes_pueblo_indigena_csv', fields_paciente_csv,
+        lambda est: Paciente.objects.filter(pueblo_indigena=True)),
+}
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from reports.models import TrabajoExportacion
+
+
+class Command(BaseCommand):
+    help = ('Worker de exportaciones: genera los TrabajoExportacion pendientes en orden de llegada. '
+            'Se puede ejecutar más de un worker a la vez')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa la cola hasta vaciarla y termina (para cron)')
+        parser.add_argument('--intervalo', type=float, default=5,
+                            help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--colgados', type=int, default=10,
+                            help='Minutos sin avance tras los cuales un trabajo EN PROCESO se reencola')
+
+    def handle(self, *args, **options):
+        self.stdout.write('📤 Worker de exportaciones iniciado')
+        while True:
+            # Igual que entre requests: descartar conexiones vencidas (CONN_MAX_AGE) o caídas
+            close_old_connections()
+            reencolados = TrabajoExportacion.reencolar_colgados(options['colgados'])
+            if reencolados:
+                self.stdout.write(self.style.WARNING(f'⚠️ Trabajos reencolados: {reencolados}'))
+            TrabajoExportacion.eliminar_vencidos()
+
+            trabajo = TrabajoExportacion.tomar_siguiente()
+            if trabajo is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            self.stdout.write(f'▶ {trabajo}')
+            inicio = time.monotonic()
+            try:
+                trabajo.ejecutar()
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'❌ {trabajo.pk}: {e}'))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {trabajo.pk}: {trabajo.filas_procesadas:,} filas en {time.monotonic() - inicio:.1f} s'))
+        self.stdout.write(self.style.SUCCESS('✅ Cola de exportaciones vacía'))
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('kardex', '0034_historial_cambios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoExportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50, verbose_name='Tipo')),
+                ('formato', models.CharField(choices=[('csv', 'CSV (comprimido .gz)'), ('xlsx', 'Excel')],
+                                             default='csv', max_length=10, verbose_name='Formato')),
+                ('huella', models.CharField(editable=False, max_length=64, verbose_name='Huella')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN PROCESO', 'En proceso'),
+                                                     ('COMPLETADO', 'Completado'), ('ERROR', 'Error')],
+                                            default='PENDIENTE', max_length=20, verbose_name='Estado')),
+                ('filas_procesadas', models.PositiveIntegerField(default=0, verbose_name='Filas procesadas')),
+                ('total_filas', models.PositiveIntegerField(blank=True, null=True, verbose_name='Total de filas')),
+                ('archivo', models.CharField(blank=True, default='', max_length=255, verbose_name='Archivo')),
+                ('tamano', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='Tamaño (bytes)')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado en')),
+                ('latido_en', models.DateTimeField(blank=True, null=True, verbose_name='Último avance')),
+                ('terminado_en', models.DateTimeField(blank=True, null=True, verbose_name='Terminado en')),
+                ('establecimiento', models.ForeignKey(blank=True, null=True,
+                                                      on_delete=django.db.models.deletion.CASCADE,
+                                                      related_name='exportaciones', to='kardex.establecimiento',
+                                                      verbose_name='Establecimiento')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                              related_name='exportaciones', to=settings.AUTH_USER_MODEL,
+                                              verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Exportación',
+                'verbose_name_plural': 'Trabajos de Exportación',
+                'indexes': [
+                    models.Index(fields=['estado', 'created_at'], name='exportacion_cola_idx'),
+                    models.Index(fields=['huella', 'estado', 'created_at'], name='exportacion_huella_idx'),
+                ],
+            },
+        ),
+    ]
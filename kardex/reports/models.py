@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+ESTADO_EXPORTACION = [
+    ('PENDIENTE', 'Pendiente'),
+    ('EN PROCESO', 'En proceso'),
+    ('COMPLETADO', 'Completado'),
+    ('ERROR', 'Error'),
+]
+
+FORMATO_EXPORTACION = [
+    ('csv', 'CSV (comprimido .gz)'),
+    ('xlsx', 'Excel'),
+]
+
+# Cada cuántas filas se registra el avance (también sirve de latido del worker)
+FILAS_POR_AVANCE = 5000
+
+
+def directorio_exportaciones():
+    return Path(getattr(settings, 'EXPORTACIONES_DIR', Path(settings.BASE_DIR) / 'exportaciones'))
+
+
+class TrabajoExportacion(models.Model):
+    """
+    Exportación encolada en la base de datos y generada por el worker (manage.py procesar_exportaciones)
+    fuera del request. El archivo queda en EXPORTACIONES_DIR hasta que vence.
+    """
+    tipo = models.CharField(max_length=50, verbose_name='Tipo')
+    formato = models.CharField(max_length=10, choices=FORMATO_EXPORTACION, default='csv', verbose_name='Formato')
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                verbose_name='Usuario', related_name='exportaciones')
+    # Alcance de los datos: vacío en exportaciones que no dependen del establecimiento
+    establecimiento = models.ForeignKey('kardex.Establecimiento', on_delete=models.CASCADE, null=True, blank=True,
+                                        verbose_name='Establecimiento', related_name='exportaciones')
+    # Identifica exportaciones equivalentes (tipo + formato + alcance) para reutilizarlas
+    huella = models.CharField(max_length=64, editable=False, verbose_name='Huella')
+    estado = models.CharField(max_length=20, choices=ESTADO_EXPORTACION, default='PENDIENTE', verbose_name='Estado')
+    filas_procesadas = models.PositiveIntegerField(default=0, verbose_name='Filas procesadas')
+    total_filas = models.PositiveIntegerField(null=True, blank=True, verbose_name='Total de filas')
+    archivo = models.CharField(max_length=255, blank=True, default='', verbose_name='Archivo')
+    tamano = models.PositiveBigIntegerField(null=True, blank=True, verbose_name='Tamaño (bytes)')
+    error = models.TextField(blank=True, default='', verbose_name='Error')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')
+    iniciado_en = models.DateTimeField(null=True, blank=True, verbose_name='Iniciado en')
+    latido_en = models.DateTimeField(null=True, blank=True, verbose_name='Último avance')
+    terminado_en = models.DateTimeField(null=True, blank=True, verbose_name='Terminado en')
+
+    def __str__(self):
+        return f"Exportación #{self.pk} {self.tipo}.{self.formato} ({self.estado})"
+
+    class Meta:
+        verbose_name = 'Trabajo de Exportación'
+        verbose_name_plural = 'Trabajos de Exportación'
+        indexes = [
+            models.Index(fields=['estado', 'created_at'], name='exportacion_cola_idx'),
+            models.Index(fields=['huella', 'estado', 'created_at'], name='exportacion_huella_idx'),
+        ]
+
+    @property
+    def exportacion(self):
+        from reports.exportaciones import EXPORTACIONES
+        return EXPORTACIONES[self.tipo]
+
+    @property
+    def ruta(self):
+        return directorio_exportaciones() / self.archivo if self.archivo else None
+
+    @property
+    def nombre_descarga(self):
+        return f"{self.exportacion.filename}.{'csv.gz' if self.formato == 'csv' else 'xlsx'}"
+
+    @property
+    def progreso(self):
+        if self.estado == 'COMPLETADO':
+            return 100
+        if not self.total_filas:
+            return 0
+        return min(99, int(self.filas_procesadas * 100 / self.total_filas))
+
+    @staticmethod
+    def calcular_huella(tipo, formato, establecimiento_id):
+        datos = json.dumps([tipo, formato, establecimiento_id])
+        return hashlib.sha256(datos.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def visibles_para(cls, user):
+        """
+        Trabajos que el usuario puede consultar y descargar: los suyos, los de su establecimiento y los que no
+        dependen del establecimiento (los mismos datos que ya puede descargar directamente).
+        """
+        if user.is_superuser:
+            return cls.objects.all()
+        return cls.objects.filter(
+            Q(usuario=user) | Q(establecimiento__isnull=True)
+            | Q(establecimiento_id=getattr(user, 'establecimiento_id', None))
+        )
+
+    @classmethod
+    def solicitar(cls, tipo, formato, usuario):
+        """
+        Encola la exportación, o devuelve una equivalente pendiente, en proceso o completada hace menos de
+        EXPORTACIONES_DEDUP_MINUTOS. Retorna (trabajo, creado).
+        """
+        from reports.exportaciones import EXPORTACIONES
+
+        exportacion = EXPORTACIONES[tipo]
+        establecimiento_id = getattr(usuario, 'establecimiento_id', None) if exportacion.por_establecimiento else None
+        huella = cls.calcular_huella(tipo, formato, establecimiento_id)
+        limite = timezone.now() - timedelta(minutes=getattr(settings, 'EXPORTACIONES_DEDUP_MINUTOS', 15))
+        existente = cls.objects.filter(huella=huella).filter(
+            Q(estado__in=['PENDIENTE', 'EN PROCESO']) | Q(estado='COMPLETADO', terminado_en__gte=limite)
+        ).order_by('-created_at').first()
+        if existente is not None and (existente.estado != 'COMPLETADO' or existente.ruta.exists()):
+            return existente, False
+        trabajo = cls.objects.create(tipo=tipo, formato=formato, usuario=usuario,
+                                     establecimiento_id=establecimiento_id, huella=huella)
+        return trabajo, True
+
+    @classmethod
+    def tomar_siguiente(cls):
+        """
+        Marca EN PROCESO el trabajo pendiente más antiguo y lo devuelve. SKIP LOCKED permite varios workers.
+        """
+        with transaction.atomic():
+            trabajo = cls.objects.select_for_update(skip_locked=True) \
+                .filter(estado='PENDIENTE').order_by('created_at').first()
+            if trabajo is None:
+                return None
+            ahora = timezone.now()
+            cls.objects.filter(pk=trabajo.pk).update(estado='EN PROCESO', iniciado_en=ahora, latido_en=ahora)
+            trabajo.estado, trabajo.iniciado_en, trabajo.latido_en = 'EN PROCESO', ahora, ahora
+        return trabajo
+
+    @classmethod
+    def reencolar_colgados(cls, minutos=10):
+        """
+        Vuelve a PENDIENTE los trabajos EN PROCESO sin avance hace `minutos` (worker detenido a la mitad).
+        """
+        limite = timezone.now() - timedelta(minutes=minutos)
+        return cls.objects.filter(estado='EN PROCESO', latido_en__lt=limite) \
+            .update(estado='PENDIENTE', filas_procesadas=0, iniciado_en=None, latido_en=None)
+
+    @classmethod
+    def eliminar_vencidos(cls):
+        """
+        Borra los archivos y registros de trabajos terminados hace más de EXPORTACIONES_RETENCION_HORAS.
+        """
+        limite = timezone.now() - timedelta(hours=getattr(settings, 'EXPORTACIONES_RETENCION_HORAS', 24))
+        vencidos = list(cls.objects.filter(estado__in=['COMPLETADO', 'ERROR'], terminado_en__lt=limite))
+        for trabajo in vencidos:
+            if trabajo.ruta is not None and trabajo.ruta.exists():
+                trabajo.ruta.unlink()
+        cls.objects.filter(pk__in=[t.pk for t in vencidos]).delete()
+        return len(vencidos)
+
+    def _avance(self, filas):
+        self.filas_procesadas = filas
+        type(self).objects.filter(pk=self.pk).update(filas_procesadas=filas, latido_en=timezone.now())
+
+    def ejecutar(self):
+        """
+        Genera el archivo (CSV comprimido con gzip o XLSX, que ya es un zip) en un temporal y lo renombra
+        al terminar, para que nunca se descargue un archivo a medias.
+        """
+        from reports.utils import csv_lines, excel_stream
+
+        exportacion = self.exportacion
+        queryset = exportacion.queryset(self.establecimiento)
+        type(self).objects.filter(pk=self.pk).update(total_filas=queryset.count())
+
+        directorio = directorio_exportaciones()
+        directorio.mkdir(parents=True, exist_ok=True)
+        nombre = f"{self.pk}_{self.nombre_descarga}"
+        temporal = directorio / f"{nombre}.part"
+        try:
+            if self.formato == 'csv':
+                with gzip.open(temporal, 'wt', encoding='utf-8', newline='') as salida:
+                    for linea in csv_lines(queryset, fields=exportacion.fields, progress=self._avance,
+                                           progress_every=FILAS_POR_AVANCE):
+                        salida.write(linea)
+            else:
+                with open(temporal, 'wb') as salida:
+                    for bloque in excel_stream(queryset, fields=exportacion.fields, progress=self._avance,
+                                               progress_every=FILAS_POR_AVANCE):
+                        salida.write(bloque)
+            os.replace(temporal, directorio / nombre)
+        except Exception as e:
+            if temporal.exists():
+                temporal.unlink()
+            type(self).objects.filter(pk=self.pk).update(estado='ERROR', error=str(e), terminado_en=timezone.now())
+            raise
+
+        type(self).objects.filter(pk=self.pk).update(
+            estado='COMPLETADO', archivo=nombre, tamano=(directorio / nombre).stat().st_size,
+            terminado_en=timezone.now(),
+        )
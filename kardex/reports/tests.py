@@ -1,3 +1,74 @@
-from django.test import TestCase
+import csv
+import gzip
+import tempfile
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from openpyxl import load_workbook
+
+from kardex.models import Comuna, Establecimiento, Ficha
+from reports.exportaciones import EXPORTACIONES
+from reports.models import TrabajoExportacion
+from usuarios.models import UsuarioPersonalizado
+
+
+class TrabajoExportacionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        comuna = Comuna.objects.create(nombre='COMUNA', codigo='1')
+        cls.establecimiento = Establecimiento.objects.create(nombre='ESTABLECIMIENTO', direccion='DIRECCION',
+                                                             telefono='1', comuna=comuna)
+        cls.usuario = UsuarioPersonalizado.objects.create(username='usuario', establecimiento=cls.establecimiento)
+        for numero in (1, 2):
+            Ficha.objects.create(numero_ficha_sistema=numero, establecimiento=cls.establecimiento)
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        configuracion = override_settings(EXPORTACIONES_DIR=directorio.name)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+
+    def test_consultas_validas(self):
+        # Cada exportación debe poder armar su consulta con sus columnas
+        for tipo, exportacion in EXPORTACIONES.items():
+            with self.subTest(tipo=tipo):
+                list(exportacion.queryset(self.establecimiento).values(*exportacion.fields)[:1])
+
+    def test_solicitar_reutiliza_trabajo_equivalente(self):
+        trabajo, creado = TrabajoExportacion.solicitar('fichas', 'csv', self.usuario)
+        repetido, repetido_creado = TrabajoExportacion.solicitar('fichas', 'csv', self.usuario)
+        _, otro_formato = TrabajoExportacion.solicitar('fichas', 'xlsx', self.usuario)
+
+        self.assertTrue(creado)
+        self.assertFalse(repetido_creado)
+        self.assertEqual(repetido.pk, trabajo.pk)
+        self.assertTrue(otro_formato)
+
+    def test_tomar_siguiente_toma_el_mas_antiguo(self):
+        primero, _ = TrabajoExportacion.solicitar('fichas', 'csv', self.usuario)
+        TrabajoExportacion.solicitar('fichas', 'xlsx', self.usuario)
+
+        tomado = TrabajoExportacion.tomar_siguiente()
+
+        self.assertEqual(tomado.pk, primero.pk)
+        self.assertEqual(TrabajoExportacion.objects.get(pk=primero.pk).estado, 'EN PROCESO')
+        self.assertNotEqual(TrabajoExportacion.tomar_siguiente().pk, primero.pk)
+        self.assertIsNone(TrabajoExportacion.tomar_siguiente())
+
+    def test_ejecutar_genera_archivo_legible(self):
+        for formato in ('csv', 'xlsx'):
+            with self.subTest(formato=formato):
+                trabajo, _ = TrabajoExportacion.solicitar('fichas', formato, self.usuario)
+                trabajo.ejecutar()
+                trabajo.refresh_from_db()
+
+                self.assertEqual(trabajo.estado, 'COMPLETADO')
+                if formato == 'csv':
+                    with gzip.open(trabajo.ruta, 'rt', encoding='utf-8-sig') as archivo:
+                        filas = list(csv.reader(archivo))
+                else:
+                    # El .xlsx lleva el título de la hoja y una fila en blanco antes del encabezado
+                    filas = list(load_workbook(trabajo.ruta, read_only=True).active.values)[2:]
+                columna = EXPORTACIONES['fichas'].fields.index('numero_ficha_sistema')
+                self.assertEqual(sorted(int(fila[columna]) for fila in filas[1:]), [1, 2])
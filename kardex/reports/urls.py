@@ -1,9 +1,15 @@
 from django.urls import path
+from rest_framework import routers
 
 from . import views
+from .api import TrabajoExportacionViewSet
 
 app_name = 'reports'
 
+# Exportaciones en segundo plano: /reportes/exportaciones/
+router = routers.SimpleRouter()
+router.register(r'exportaciones', TrabajoExportacionViewSet, basename='exportacion')
+
 urlpatterns = [
     # MANTENEDORES
     path('export/pais/', views.export_pais, name='export_pais'),
@@ -30,6 +36,7 @@ urlpatterns = [
 
     # === PACIENTES (EXPORTACIÓN CSV) ===
     path('export/paciente-csv/', views.export_paciente_csv, name='export_paciente_csv'),
+    path('export/paciente-xlsx/', views.export_paciente_xlsx, name='export_paciente_xlsx'),
     path('export/paciente_recien_nacido-csv/', views.export_paciente_recien_nacido_csv,
          name='export_paciente_recien_nacido_csv'),
     path('export/paciente_extranjero-csv/', views.export_paciente_extranjero_csv,
@@ -39,4 +46,4 @@ urlpatterns = [
     path('export/paciente_pueblo_indigena-csv/', views.export_paciente_pueblo_indigena_csv,
          name='export_paciente_pueblo_indigena_csv'),
 
-]
+] + router.urls
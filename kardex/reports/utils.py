@@ -1,80 +1,98 @@
-import io
-from time import timezone
+from itertools import islice
 
 import openpyxl
+from django.core.exceptions import FieldDoesNotExist
 from django.http import HttpResponse
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
-from openpyxl.utils import get_column_letter
+from django.utils import timezone
 
+from .xlsx_stream import stream_xlsx
 
-def export_queryset_to_excel(queryset, filename='reporte', excluded_fields=None):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Reporte"
 
+def queryset_rows(queryset, fields, chunk_size=5000):
+    """
+    Filas (listas) de un queryset proyectado con values_list(*fields), leídas con iterator().
+    - Campos con choices -> texto del choice.
+    - FK -> str() del objeto relacionado, resuelto por bloque con in_bulk (una consulta por FK y bloque).
+    - Fechas -> texto en hora local.
+    `fields` acepta nombres de campo o rutas ('comuna__nombre').
+    """
     model = queryset.model
-    opts = model._meta
-    fields = [
-        f for f in opts.concrete_fields
-        if f.name not in (excluded_fields or [])
-    ]
-
-    # === TÍTULO ===
-    title = opts.verbose_name_plural.title()
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(fields))
-    cell = ws.cell(row=1, column=1, value=title)
-    cell.font = Font(size=14, bold=True)
-    cell.alignment = Alignment(horizontal="center", vertical="center")
-
-    # === ENCABEZADOS ===
-    headers = [f.verbose_name.title() for f in fields]
-    ws.append([])  # fila vacía después del título
-    ws.append(headers)
+    model_fields = []
+    for name in fields:
+        try:
+            model_fields.append(model._meta.get_field(name) if '__' not in name else None)
+        except FieldDoesNotExist:
+            model_fields.append(None)
+    choices = {i: dict(f.flatchoices) for i, f in enumerate(model_fields) if f is not None and f.choices}
+    relations = {i: f.related_model for i, f in enumerate(model_fields) if f is not None and f.many_to_one}
+
+    def normalize(value):
+        if isinstance(value, datetime):
+            return (timezone.localtime(value) if timezone.is_aware(value) else value).strftime("%d-%m-%Y %H:%M")
+        if isinstance(value, date):
+            return value.strftime("%d-%m-%Y")
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        return str(value)
 
-    # === FILAS ===
-    for obj in queryset:
-        row = []
-        for field in fields:
-            # Si el campo tiene choices → usar display
-            if field.choices:
-                value = getattr(obj, f"get_{field.name}_display")()
-            else:
-                value = getattr(obj, field.name)
-
-            # Manejo de tipos
-            if value is None:
-                row.append('')
-            elif isinstance(value, str):
-                row.append(value)
-            elif isinstance(value, (int, float, bool)):
-                row.append(value)
-            elif isinstance(value, (date, datetime)):
-                fmt = "%d-%m-%Y %H:%M" if isinstance(value, datetime) else "%d-%m-%Y"
-                row.append(value.strftime(fmt))
-            else:
-                row.append(str(value))
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        labels = {
+            i: {pk: str(obj) for pk, obj in related.objects.in_bulk({r[i] for r in chunk if r[i] is not None}).items()}
+            for i, related in relations.items()
+        }
+        for row in chunk:
+            row = list(row)
+            for i, mapping in choices.items():
+                row[i] = mapping.get(row[i], row[i])
+            for i, mapping in labels.items():
+                row[i] = mapping.get(row[i], row[i])
+            yield [normalize(v) for v in row]
+
+
+def excel_stream(queryset, excluded_fields=None, fields=None, progress=None, progress_every=5000):
+    """
+    Bytes del .xlsx de un queryset (ver stream_xlsx). `progress(n)` se llama cada `progress_every` filas
+    y al terminar.
+    """
+    opts = queryset.model._meta
+    if fields is None:
+        fields = [f.name for f in opts.concrete_fields if f.name not in (excluded_fields or [])]
+    headers = []
+    for name in fields:
+        try:
+            headers.append(opts.get_field(name).verbose_name.title() if '__' not in name else name)
+        except FieldDoesNotExist:
+            headers.append(name)
+    rows = queryset_rows(queryset, fields)
+    if progress is not None:
+        rows = _count_rows(rows, progress, progress_every)
+    return stream_xlsx(headers=headers, rows=rows, title=opts.verbose_name_plural.title())
+
+
+def _count_rows(rows, progress, every):
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % every == 0:
+            progress(count)
+    progress(count)
 
-        ws.append(row)
 
-    # === AUTOAJUSTE DE ANCHO DE COLUMNAS ===
-    for i, col in enumerate(ws.columns, 1):
-        max_length = 0
-        col_letter = get_column_letter(i)  # más seguro que usar col[0]
-        for cell in col:
-            try:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-        ws.column_dimensions[col_letter].width = max_length + 2
-
-    # === RESPUESTA ===
+def export_queryset_to_excel(queryset, filename='reporte', excluded_fields=None):
+    """
+    Excel de un queryset chico (catálogos) en una respuesta normal, que cache_respuesta puede guardar.
+    Para volúmenes grandes usar export_queryset_to_excel_advance.
+    """
     response = HttpResponse(
+        b''.join(excel_stream(queryset, excluded_fields)),
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
     response['Content-Disposition'] = f'attachment; filename={filename}.xlsx'
-    wb.save(response)
     return response
 
 
@@ -170,68 +188,14 @@ def export_extended_queryset_to_excel(queryset, fields, filename='reporte', shee
     return response
 
 
-def export_queryset_to_excel_advance(queryset, filename='reporte', excluded_fields=None):
+def export_queryset_to_excel_advance(queryset, filename='reporte', excluded_fields=None, fields=None):
     """
-    Exporta un queryset grande a Excel (.xlsx) de forma eficiente usando openpyxl en modo write_only.
-    - Evita sobrecargar la RAM.
-    - Normaliza datetimes timezone-aware a timezone-naive.
+    Exporta un queryset grande a Excel (.xlsx) en streaming: las filas se leen con values_list + iterator()
+    y el zip se envía a medida que se genera (ver reports.xlsx_stream), sin armar el archivo en memoria.
+    `fields` (nombres o rutas como en export_queryset_to_csv_fast) limita las columnas consultadas.
     """
-    model = queryset.model
-    opts = model._meta
-    excluded_fields = excluded_fields or []
-
-    # === Crear workbook optimizado ===
-    wb = Workbook(write_only=True)
-    ws = wb.create_sheet(title="Reporte")
-
-    # === Título ===
-    title = opts.verbose_name_plural.title()
-    ws.append([title])
-    ws.append([])  # fila vacía
-
-    # === Encabezados ===
-    fields = [f for f in opts.concrete_fields if f.name not in excluded_fields]
-    headers = [f.verbose_name.title() for f in fields]
-    ws.append(headers)
-
-    # === Escribir filas (sin cargar all en memoria) ===
-    for obj in queryset.iterator(chunk_size=10000):
-        row = []
-        for field in fields:
-            # Si el campo tiene choices → usar display
-            if field.choices:
-                value = getattr(obj, f"get_{field.name}_display")()
-            else:
-                value = getattr(obj, field.name)
-
-            # Normalizar valores
-            if value is None:
-                row.append('')
-            elif isinstance(value, (str, int, float, bool)):
-                row.append(value)
-            elif isinstance(value, datetime):
-                # Convertir timezone-aware a naive de forma segura
-                if value.tzinfo is not None:
-                    try:
-                        value = value.astimezone(timezone.utc).replace(tzinfo=None)
-                    except Exception:
-                        # fallback seguro: ignorar tzinfo
-                        value = value.replace(tzinfo=None)
-                row.append(value.strftime("%d-%m-%Y %H:%M"))
-            elif isinstance(value, date):
-                row.append(value.strftime("%d-%m-%Y"))
-            else:
-                row.append(str(value))
-
-        ws.append(row)
-
-    # === Guardar en memoria y enviar ===
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-
     response = StreamingHttpResponse(
-        output,
+        excel_stream(queryset, excluded_fields, fields),
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
     response['Content-Disposition'] = f'attachment; filename={filename}.xlsx'
@@ -250,10 +214,10 @@ class Echo:
         return value
 
 
-def export_queryset_to_csv_fast(queryset, filename='reporte', fields=None, delimiter=','):
+def csv_lines(queryset, fields=None, delimiter=',', progress=None, progress_every=5000):
     """
-    Exporta cualquier queryset a CSV de forma ultrarrápida usando values().
-    Soporta caracteres especiales (UTF-8 con BOM para Excel).
+    Líneas de un CSV (BOM UTF-8 para Excel, encabezado y filas) leídas con values() + iterator().
+    `progress(n)` se llama cada `progress_every` filas y al terminar.
     """
     if fields is None:
         # Si no se especifican campos, tomar todos los del modelo
@@ -272,17 +236,28 @@ def export_queryset_to_csv_fast(queryset, filename='reporte', fields=None, delim
             return value.strftime("%Y-%m-%d")
         return str(value)
 
-    def csv_generator():
-        pseudo_buffer = Echo()
-        writer = csv.writer(pseudo_buffer, delimiter=delimiter)
-        # Agregar BOM UTF-8 (para Excel)
-        yield '\ufeff'
-        yield writer.writerow(fields)
-        for row in qs.iterator(chunk_size=20000):
-            yield writer.writerow([normalize_value(v) for v in row.values()])
+    pseudo_buffer = Echo()
+    writer = csv.writer(pseudo_buffer, delimiter=delimiter)
+    # Agregar BOM UTF-8 (para Excel)
+    yield '\ufeff'
+    yield writer.writerow(fields)
+    count = 0
+    for row in qs.iterator(chunk_size=20000):
+        yield writer.writerow([normalize_value(v) for v in row.values()])
+        count += 1
+        if progress is not None and count % progress_every == 0:
+            progress(count)
+    if progress is not None:
+        progress(count)
+
 
+def export_queryset_to_csv_fast(queryset, filename='reporte', fields=None, delimiter=','):
+    """
+    Exporta cualquier queryset a CSV de forma ultrarrápida usando values().
+    Soporta caracteres especiales (UTF-8 con BOM para Excel).
+    """
     response = StreamingHttpResponse(
-        csv_generator(),
+        csv_lines(queryset, fields=fields, delimiter=delimiter),
         content_type='text/csv; charset=utf-8'
     )
     response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
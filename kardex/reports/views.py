@@ -1,8 +1,11 @@
+from kardex.cache_vistas import cache_respuesta
 from kardex.models import *
-from .fields_export_csv import *
-from .utils import export_queryset_to_excel, export_queryset_to_csv_fast
+from .exportaciones import EXPORTACIONES
+from .utils import export_queryset_to_excel, export_queryset_to_csv_fast, export_queryset_to_excel_advance
 
 
+# Catálogo: el Excel se regenera solo cuando cambia la versión del modelo
+@cache_respuesta(timeout=60 * 60, modelos=[Comuna])
 def export_comuna(request):
     queryset = Comuna.objects.all().order_by('-updated_at')
     return export_queryset_to_excel(queryset, filename='comunas')
@@ -13,19 +16,20 @@ def export_establecimiento(request):
     return export_queryset_to_excel(queryset, filename='establecimientos')
 
 
+def _export_csv(request, tipo):
+    # Consultas y columnas definidas en reports.exportaciones (las mismas de los trabajos en segundo plano)
+    exportacion = EXPORTACIONES[tipo]
+    queryset = exportacion.queryset(request.user.establecimiento)
+    return export_queryset_to_csv_fast(queryset, filename=exportacion.filename, fields=exportacion.fields)
+
+
 ## CSV FICHAS
 def export_ficha_csv(request):
-    queryset = Ficha.objects.filter(
-        establecimiento=request.user.establecimiento
-    )
-    return export_queryset_to_csv_fast(queryset, filename='fichas', fields=fields_ficha_csv)
+    return _export_csv(request, 'fichas')
 
 
 def export_ficha_pasivadas_csv(request):
-    queryset = Ficha.objects.filter(
-        establecimiento=request.user.establecimiento, pasivado=True
-    )
-    return export_queryset_to_csv_fast(queryset, filename='fichas_pasivadas', fields=fields_ficha_csv)
+    return _export_csv(request, 'fichas_pasivadas')
 
 
 ## TERMINO FICHAS
@@ -33,50 +37,19 @@ def export_ficha_pasivadas_csv(request):
 ## CSV MOVIMIENTOS FICHAS
 
 def export_movimiento_ficha_csv(request):
-    queryset = MovimientoFicha.objects.filter(
-        ficha__establecimiento=request.user.establecimiento
-    ).order_by('-updated_at')
-    return export_queryset_to_csv_fast(
-        queryset,
-        filename='movimientos_ficha',
-        fields=fields_movimiento_ficha_csv
-    )
+    return _export_csv(request, 'movimientos_ficha')
 
 
 def export_movimiento_ficha_envio_csv(request):
-    queryset = MovimientoFicha.objects.filter(
-        ficha__establecimiento=request.user.establecimiento,
-        estado_envio='ENVIADO'
-    ).order_by('-updated_at')
-    return export_queryset_to_csv_fast(
-        queryset,
-        filename='movimientos_ficha_enviadas',
-        fields=fields_movimiento_ficha_csv
-    )
+    return _export_csv(request, 'movimientos_ficha_enviadas')
 
 
 def export_movimiento_ficha_recepcion_csv(request):
-    queryset = MovimientoFicha.objects.filter(
-        ficha__establecimiento=request.user.establecimiento,
-        estado_recepcion='RECIBIDO'
-    ).order_by('-updated_at')
-    return export_queryset_to_csv_fast(
-        queryset,
-        filename='movimientos_ficha_recepcionadas',
-        fields=fields_movimiento_ficha_csv
-    )
+    return _export_csv(request, 'movimientos_ficha_recepcionadas')
 
 
 def export_movimiento_ficha_traspaso_csv(request):
-    queryset = MovimientoFicha.objects.filter(
-        ficha__establecimiento=request.user.establecimiento,
-        estado_traspaso='TRASPASADO'
-    ).order_by('-updated_at')
-    return export_queryset_to_csv_fast(
-        queryset,
-        filename='movimientos_ficha_traspasadas',
-        fields=fields_movimiento_ficha_csv
-    )
+    return _export_csv(request, 'movimientos_ficha_traspasadas')
 
 
 ## TERMINO MOVIMIENTOS FICHAS
@@ -84,28 +57,29 @@ def export_movimiento_ficha_traspaso_csv(request):
 
 ## CSV PACIENTE
 def export_paciente_csv(request):
-    queryset = Paciente.objects.all()
-    return export_queryset_to_csv_fast(queryset, filename='pacientes', fields=fields_paciente_csv)
+    return _export_csv(request, 'pacientes')
+
+
+def export_paciente_xlsx(request):
+    exportacion = EXPORTACIONES['pacientes']
+    return export_queryset_to_excel_advance(exportacion.queryset(), filename=exportacion.filename,
+                                            fields=exportacion.fields)
 
 
 def export_paciente_recien_nacido_csv(request):
-    queryset = Paciente.objects.filter(recien_nacido=True)
-    return export_queryset_to_csv_fast(queryset, filename='pacientes_recien_nacidos_csv', fields=fields_paciente_csv)
+    return _export_csv(request, 'pacientes_recien_nacidos')
 
 
 def export_paciente_extranjero_csv(request):
-    queryset = Paciente.objects.filter(extranjero=True)
-    return export_queryset_to_csv_fast(queryset, filename='pacientes_extranjeros_csv', fields=fields_paciente_csv)
+    return _export_csv(request, 'pacientes_extranjeros')
 
 
 def export_paciente_fallecido_csv(request):
-    queryset = Paciente.objects.filter(fallecido=True)
-    return export_queryset_to_csv_fast(queryset, filename='pacientes_fallecids_csv', fields=fields_paciente_csv)
+    return _export_csv(request, 'pacientes_fallecidos')
 
 
 def export_paciente_pueblo_indigena_csv(request):
-    queryset = Paciente.objects.filter(pueblo_indigena=True)
-    return export_queryset_to_csv_fast(queryset, filename='pacientes_pueblo_indigena_csv', fields=fields_paciente_csv)
+    return _export_csv(request, 'pacientes_pueblo_indigena')
 
 
 ## TERMINO PACIENTE
@@ -115,6 +89,8 @@ def export_pais(request):
     return export_queryset_to_excel(queryset, filename='paises')
 
 
+# Catálogo: el Excel se regenera solo cuando cambia la versión del modelo
+@cache_respuesta(timeout=60 * 60, modelos=[Prevision])
 def export_prevision(request):
     queryset = Prevision.objects.all().order_by('-updated_at')
     return export_queryset_to_excel(queryset, filename='previsiones')
@@ -125,16 +101,22 @@ def export_profesion(request):
     return export_queryset_to_excel(queryset, filename='profesiones')
 
 
+# Catálogo: el Excel se regenera solo cuando cambia la versión del modelo
+@cache_respuesta(timeout=60 * 60, modelos=[Profesional])
 def export_profesional(request):
     queryset = Profesional.objects.all().order_by('-updated_at')
     return export_queryset_to_excel(queryset, filename='profesionales')
 
 
+# Catálogo: el Excel se regenera solo cuando cambia la versión del modelo
+@cache_respuesta(timeout=60 * 60, modelos=[Sector])
 def export_sector(request):
     queryset = Sector.objects.all().order_by('-updated_at')
     return export_queryset_to_excel(queryset, filename='sectores')
 
 
+# Catálogo: el Excel se regenera solo cuando cambia la versión del modelo
+@cache_respuesta(timeout=60 * 60, modelos=[ServicioClinico])
 def export_servicio_clinico(request):
     queryset = ServicioClinico.objects.all().order_by('-updated_at')
     return export_queryset_to_excel(queryset, filename='servicios_clinicos')
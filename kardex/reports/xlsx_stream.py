@@ -0,0 +1,201 @@
+"""
+Escritor XLSX en streaming (solo biblioteca estándar).
+
+Genera el .xlsx como una secuencia de bytes: el zip se escribe sobre un buffer sin seek (entradas con
+data descriptor) y cada bloque se entrega apenas sale del compresor, así la memoria usada no depende de la
+cantidad de filas. Las celdas de texto van como inlineStr (sin tabla de strings compartidos, que obligaría a
+retener todos los valores) y el ancho de las columnas se calcula con las primeras filas.
+"""
+import re
+import zipfile
+from itertools import chain, islice
+from xml.sax.saxutils import escape
+
+# Caracteres de control que no admite XML 1.0
+_ILEGALES = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Índices de estilo en styles.xml
+ESTILO_TITULO = 1
+ESTILO_ENCABEZADO = 2
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{nombre}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Estilos: 0 normal, 1 título (negrita 14, centrado), 2 encabezado (negrita)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="3">'
+    '<font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="14"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font>'
+    '</fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1" applyAlignment="1">'
+    '<alignment horizontal="center" vertical="center"/></xf>'
+    '<xf numFmtId="0" fontId="2" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_HOJA_INICIO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+)
+
+
+class _Buffer:
+    """
+    Destino del ZipFile: acumula lo escrito hasta que se vacía. Sin seek(), ZipFile escribe cada entrada
+    en orden (con data descriptor) y nunca vuelve atrás.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+        self.pendiente = 0
+
+    def write(self, data):
+        self._partes.append(bytes(data))
+        self._posicion += len(data)
+        self.pendiente += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        data = b''.join(self._partes)
+        self._partes = []
+        self.pendiente = 0
+        return data
+
+
+def _texto(valor):
+    return escape(_ILEGALES.sub('', valor))
+
+
+def _celda(valor, estilo=0):
+    s = f' s="{estilo}"' if estilo else ''
+    if valor is None or valor == '':
+        return f'<c{s}/>' if estilo else '<c/>'
+    if isinstance(valor, bool):
+        return f'<c t="b"{s}><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float)):
+        return f'<c{s}><v>{valor}</v></c>'
+    return f'<c t="inlineStr"{s}><is><t xml:space="preserve">{_texto(str(valor))}</t></is></c>'
+
+
+def _fila(valores, estilo=0):
+    return '<row>' + ''.join(_celda(v, estilo) for v in valores) + '</row>'
+
+
+def _columna(indice):
+    # 1 -> A, 27 -> AA
+    letras = ''
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _anchos(encabezados, muestra, ancho_maximo):
+    anchos = [len(str(h)) for h in encabezados]
+    for fila in muestra:
+        for i, valor in enumerate(fila[:len(anchos)]):
+            if valor is not None:
+                anchos[i] = max(anchos[i], len(str(valor)))
+    return [min(ancho + 2, ancho_maximo) for ancho in anchos]
+
+
+def stream_xlsx(headers, rows, sheet_title='Reporte', title=None, sample_rows=500, max_width=60,
+                chunk_bytes=64 * 1024):
+    """
+    Genera los bytes de un .xlsx con una hoja: `title` opcional (fila combinada), `headers` y `rows`
+    (iterable de listas). Consume `rows` una sola vez; solo retiene las primeras `sample_rows` filas para
+    calcular el ancho de las columnas.
+    """
+    buffer = _Buffer()
+    filas = iter(rows)
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        zf.writestr('_rels/.rels', _RELS)
+        zf.writestr('xl/workbook.xml', _WORKBOOK.format(nombre=_texto(sheet_title[:31])))
+        zf.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        zf.writestr('xl/styles.xml', _STYLES)
+        yield buffer.vaciar()
+
+        muestra = list(islice(filas, sample_rows))
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            cols = ''.join(
+                f'<col min="{i}" max="{i}" width="{ancho}" customWidth="1"/>'
+                for i, ancho in enumerate(_anchos(headers, muestra, max_width), 1)
+            )
+            partes = [_HOJA_INICIO, f'<cols>{cols}</cols>' if cols else '', '<sheetData>']
+            if title:
+                partes += [_fila([title], ESTILO_TITULO), '<row/>']
+            partes.append(_fila(headers, ESTILO_ENCABEZADO))
+
+            for fila in chain(muestra, filas):
+                partes.append(_fila(fila))
+                if len(partes) >= 1000:
+                    hoja.write(''.join(partes).encode('utf-8'))
+                    partes = []
+                    if buffer.pendiente >= chunk_bytes:
+                        yield buffer.vaciar()
+
+            partes.append('</sheetData>')
+            if title and len(headers) > 1:
+                partes.append(f'<mergeCells count="1"><mergeCell ref="A1:{_columna(len(headers))}1"/></mergeCells>')
+            partes.append('</worksheet>')
+            hoja.write(''.join(partes).encode('utf-8'))
+    yield buffer.vaciar()